@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from activity_logs.partitions import (
+    apply_retention,
+    ensure_partitions,
+    is_partitioned,
+    retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly activity log partitions and archive/drop the "
+        "ones older than the retention period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            help="Number of future months to create partitions for.",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            help="Keep logs from this many past months (plus the current one).",
+        )
+        parser.add_argument(
+            "--archive-dir", help="Directory the gzipped JSONL archives go to."
+        )
+        parser.add_argument(
+            "--no-archive",
+            action="store_true",
+            help="Drop expired logs without archiving them.",
+        )
+        parser.add_argument(
+            "--skip-retention",
+            action="store_true",
+            help="Only create partitions, do not archive or drop anything.",
+        )
+
+    def handle(self, *args, **options):
+        if is_partitioned():
+            for name in ensure_partitions(options["months_ahead"]):
+                self.stdout.write(f"Created partition {name}.")
+        else:
+            self.stdout.write(
+                "Activity logs are not partitioned on this database, "
+                "retention will delete rows instead."
+            )
+
+        if options["skip_retention"]:
+            return
+
+        cutoff = retention_cutoff(options["retention_months"])
+        try:
+            removed = apply_retention(
+                options["retention_months"],
+                archive_dir=options["archive_dir"],
+                archive=not options["no_archive"],
+            )
+        except FileExistsError as exc:
+            raise CommandError(str(exc))
+
+        for label, path in removed:
+            message = f"Removed activity logs {label}"
+            if path:
+                message += f", archived to {path}"
+            self.stdout.write(self.style.SUCCESS(message + "."))
+        self.stdout.write(f"Logs from {cutoff} onwards are kept.")
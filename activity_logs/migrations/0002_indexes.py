@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activity_logs", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="activitylog",
+            index=models.Index(
+                fields=["-timestamp", "-id"], name="activitylog_ts_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="activitylog",
+            index=models.Index(
+                fields=["user", "-timestamp", "-id"], name="activitylog_user_ts_id_idx"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="activitylog",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="activity_logs",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:02
+
+from datetime import date, datetime, time
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = "activity_logs_activitylog"
+OLD_TABLE = f"{TABLE}_unpartitioned"
+SEQUENCE = f"{TABLE}_id_seq"
+MONTHS_AHEAD = 3
+
+INDEXES = [
+    ("activitylog_ts_id_idx", '("timestamp" DESC, "id" DESC)'),
+    ("activitylog_user_ts_id_idx", '("user_id", "timestamp" DESC, "id" DESC)'),
+]
+USER_FK = (
+    f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_user_id_fk" '
+    'FOREIGN KEY ("user_id") REFERENCES "authentication_userprofile" ("id") '
+    "DEFERRABLE INITIALLY DEFERRED"
+)
+
+
+def add_months(day, offset):
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def as_datetime(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def partition_table(apps, schema_editor):
+    """
+    Rebuild the activity log table as a range-partitioned table on
+    ``timestamp``. PostgreSQL requires the partition key in the primary key, so
+    the key becomes (id, timestamp); ids keep coming from a sequence and stay
+    unique. Monthly partitions are created from the oldest log up to a few
+    months ahead, and the existing rows are copied across.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    execute = schema_editor.execute
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COALESCE(MAX("id"), 0) + 1, MIN("timestamp") FROM "{TABLE}"'
+        )
+        next_id, oldest = cursor.fetchone()
+
+    execute(f'ALTER TABLE "{TABLE}" RENAME TO "{OLD_TABLE}"')
+    execute(f'ALTER INDEX "{TABLE}_pkey" RENAME TO "{OLD_TABLE}_pkey"')
+    execute(f'ALTER TABLE "{OLD_TABLE}" ALTER COLUMN "id" DROP IDENTITY IF EXISTS')
+    for name, _ in INDEXES:
+        execute(f'DROP INDEX IF EXISTS "{name}"')
+
+    execute(
+        f'CREATE TABLE "{TABLE}" (LIKE "{OLD_TABLE}" INCLUDING DEFAULTS, '
+        'PRIMARY KEY ("id", "timestamp")) PARTITION BY RANGE ("timestamp")'
+    )
+    execute(f'CREATE SEQUENCE "{SEQUENCE}" START WITH {int(next_id)}')
+    execute(f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}"."id"')
+    execute(
+        f'ALTER TABLE "{TABLE}" ALTER COLUMN "id" SET DEFAULT nextval(\'{SEQUENCE}\')'
+    )
+
+    current = add_months(timezone.localdate(), 0)
+    month = add_months(timezone.localtime(oldest).date(), 0) if oldest else current
+    while month <= add_months(current, MONTHS_AHEAD):
+        execute(
+            f'CREATE TABLE "{TABLE}_p{month:%Y%m}" PARTITION OF "{TABLE}" '
+            "FOR VALUES FROM (%s) TO (%s)",
+            [as_datetime(month), as_datetime(add_months(month, 1))],
+        )
+        month = add_months(month, 1)
+    execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+
+    execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{OLD_TABLE}"')
+    execute(f'DROP TABLE "{OLD_TABLE}"')
+
+    for name, columns in INDEXES:
+        execute(f'CREATE INDEX "{name}" ON "{TABLE}" {columns}')
+    execute(USER_FK)
+
+
+def unpartition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    execute = schema_editor.execute
+    execute(f'ALTER TABLE "{TABLE}" RENAME TO "{OLD_TABLE}"')
+    execute(f'ALTER INDEX "{TABLE}_pkey" RENAME TO "{OLD_TABLE}_pkey"')
+    for name, _ in INDEXES:
+        execute(f'DROP INDEX IF EXISTS "{name}"')
+
+    execute(f'CREATE TABLE "{TABLE}" (LIKE "{OLD_TABLE}")')
+    execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{OLD_TABLE}"')
+    execute(f'DROP TABLE "{OLD_TABLE}" CASCADE')
+
+    execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY ("id")')
+    execute(
+        f'ALTER TABLE "{TABLE}" ALTER COLUMN "id" ADD GENERATED BY DEFAULT AS IDENTITY'
+    )
+    execute(
+        f"SELECT setval(pg_get_serial_sequence('\"{TABLE}\"', 'id'), "
+        f'COALESCE(MAX("id"), 0) + 1, false) FROM "{TABLE}"'
+    )
+    for name, columns in INDEXES:
+        execute(f'CREATE INDEX "{name}" ON "{TABLE}" {columns}')
+    execute(USER_FK)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activity_logs", "0002_indexes"),
+        ("authentication", "0003_alter_userprofile_user_type"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
@@ -12,6 +12,8 @@ class ActivityLog(models.Model):
         null=True,
         blank=True,
         related_name="activity_logs",
+        # Indexed through Meta.indexes, where it leads the (user, timestamp) index.
+        db_index=False,
     )
     username = models.CharField(max_length=150, null=True, blank=True)
     action = models.CharField(max_length=255)
@@ -25,6 +27,12 @@ class ActivityLog(models.Model):
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["-timestamp", "-id"], name="activitylog_ts_id_idx"),
+            models.Index(
+                fields=["user", "-timestamp", "-id"], name="activitylog_user_ts_id_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.username or 'Anonymous'} - {self.action} on {self.entity_type}:{self.entity_id} at {self.timestamp}"
@@ -0,0 +1,213 @@
+"""
+Monthly range partitioning of the activity log table on PostgreSQL.
+
+``activity_logs_activitylog`` is partitioned by ``timestamp`` into one table per
+month (``activity_logs_activitylog_pYYYYMM``) plus a default partition that
+catches rows outside the managed range. Partitions are created ahead of time by
+``ensure_partitions`` and old ones are archived to gzipped JSON Lines files and
+dropped by ``apply_retention``; both run from the ``activity_log_partitions``
+management command. On other databases partitioning is not available, so
+retention falls back to archiving and deleting rows in chunks.
+"""
+
+import gzip
+import json
+import logging
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from activity_logs.models import ActivityLog
+from utils.filters import start_of_day
+
+logger = logging.getLogger(__name__)
+
+TABLE = ActivityLog._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+ARCHIVE_CHUNK_SIZE = 5000
+
+
+def month_start(day, offset=0):
+    """First day of the month ``offset`` months after the one containing ``day``."""
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Return ``{month: table_name}`` for the monthly partitions that exist."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            """,
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    prefix = f"{TABLE}_p"
+    partitions = {}
+    for name in names:
+        if name.startswith(prefix):
+            suffix = name[len(prefix) :]
+            partitions[date(int(suffix[:4]), int(suffix[4:]), 1)] = name
+    return partitions
+
+
+def create_partition(month):
+    """
+    Create the partition for ``month``. Rows that already landed in the default
+    partition for that month are moved into it first, since PostgreSQL refuses
+    to attach a partition whose range overlaps rows in the default one.
+    """
+    name = partition_name(month)
+    lower = start_of_day(month)
+    upper = start_of_day(month_start(month, 1))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE "{name}" '
+            f'(LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM "{DEFAULT_PARTITION}"
+                WHERE "timestamp" >= %s AND "timestamp" < %s
+                RETURNING *
+            )
+            INSERT INTO "{name}" SELECT * FROM moved
+            """,
+            [lower, upper],
+        )
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" '
+            "FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+    logger.info("Created activity log partition %s.", name)
+    return name
+
+
+def ensure_partitions(months_ahead=None, since=None):
+    """
+    Make sure a partition exists for every month from ``since`` (default: the
+    current month) up to ``months_ahead`` months in the future. Returns the
+    names of the partitions that were created.
+    """
+    if months_ahead is None:
+        months_ahead = settings.ACTIVITY_LOG_PARTITIONS["MONTHS_AHEAD"]
+    current = month_start(timezone.localdate())
+    month = month_start(since) if since else current
+    last = month_start(current, months_ahead)
+
+    existing = list_partitions()
+    created = []
+    while month <= last:
+        if month not in existing:
+            created.append(create_partition(month))
+        month = month_start(month, 1)
+    return created
+
+
+def retention_cutoff(retention_months=None):
+    """Logs older than the returned month start are due for archival."""
+    if retention_months is None:
+        retention_months = settings.ACTIVITY_LOG_PARTITIONS["RETENTION_MONTHS"]
+    return month_start(timezone.localdate(), -retention_months)
+
+
+def apply_retention(retention_months=None, archive_dir=None, archive=True):
+    """
+    Archive and remove activity logs older than the retention period. On a
+    partitioned table whole partitions are detached and dropped; elsewhere rows
+    are deleted in chunks. Returns a list of ``(label, archive_path)`` pairs.
+    """
+    cutoff = retention_cutoff(retention_months)
+    if archive_dir is None:
+        archive_dir = settings.ACTIVITY_LOG_PARTITIONS["ARCHIVE_DIR"]
+    archive_dir = Path(archive_dir)
+    if archive:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+
+    if not is_partitioned():
+        return [_delete_rows_before(cutoff, archive_dir if archive else None)]
+
+    removed = []
+    for month, name in sorted(list_partitions().items()):
+        if month_start(month, 1) > cutoff:
+            break
+        path = None
+        if archive:
+            path = archive_dir / f"{name}.jsonl.gz"
+            _archive_partition(name, path)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+        logger.info("Dropped activity log partition %s.", name)
+        removed.append((name, path))
+    return removed
+
+
+def _archive_partition(name, path):
+    if path.exists():
+        raise FileExistsError(f"Archive {path} already exists.")
+    tmp_path = path.with_suffix(".tmp")
+    with gzip.open(tmp_path, "wb") as archive, connection.cursor() as cursor:
+        # COPY streams the partition straight from the server without
+        # materialising it in Python. CSV mode with quote and delimiter
+        # characters that never occur in JSON output writes each document
+        # verbatim, where text mode would escape its backslashes.
+        cursor.copy_expert(
+            f'COPY (SELECT row_to_json(t) FROM "{name}" t ORDER BY "timestamp", id) '
+            "TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')",
+            archive,
+        )
+    tmp_path.rename(path)
+
+
+def _delete_rows_before(cutoff, archive_dir):
+    cutoff = start_of_day(cutoff)
+    queryset = ActivityLog.objects.filter(timestamp__lt=cutoff).order_by("id")
+    label = f"before {cutoff:%Y-%m}"
+    path = None
+    archive = None
+    if archive_dir is not None:
+        path = archive_dir / f"{TABLE}_before_{cutoff:%Y%m}.jsonl.gz"
+        if path.exists():
+            raise FileExistsError(f"Archive {path} already exists.")
+        archive = gzip.open(path, "wt", encoding="utf-8")
+
+    try:
+        while True:
+            rows = list(queryset.values()[:ARCHIVE_CHUNK_SIZE])
+            if not rows:
+                break
+            if archive is not None:
+                for row in rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+            ActivityLog.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    finally:
+        if archive is not None:
+            archive.close()
+    return label, path
@@ -1,2 +1,336 @@
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from activity_logs.models import ActivityLog
+from activity_logs.partitions import (
+    apply_retention,
+    ensure_partitions,
+    list_partitions,
+    month_start,
+    partition_name,
+    retention_cutoff,
+)
+from activity_logs.writer import _STOP, ActivityLogWriter
+from authentication.choices import UserType
+from authentication.models import UserProfile
+from utils.filters import start_of_day
+from utils.testing import QueryBudgetMixin, QueryPlanAssertionsMixin
+
+
+class ActivityLogIndexTests(QueryPlanAssertionsMixin, APITestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        ActivityLog.objects.create(
+            user=self.admin, username="admin", action="user_logged_in"
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_log_list_uses_timestamp_index(self):
+        self.assertSelectUsesIndex(
+            "activity_logs_activitylog",
+            "activitylog_ts_id_idx",
+            self.client.get,
+            "/api/logs/",
+        )
+
+    def test_user_log_list_uses_user_timestamp_index(self):
+        self.assertSelectUsesIndex(
+            "activity_logs_activitylog",
+            "activitylog_user_ts_id_idx",
+            self.client.get,
+            f"/api/logs/user/{self.admin.id}/",
+        )
+
+
+class ActivityLogFilterTests(APITestCase):
+    def test_text_filters_match_substrings(self):
+        admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        ActivityLog.objects.create(
+            action="order_created", entity_type="Order", entity_id="1234"
+        )
+        ActivityLog.objects.create(action="user_logged_in", entity_type="user")
+        self.client.force_authenticate(admin)
+        for params in (
+            {"action": "CREATED"},
+            {"entity_type": "ord"},
+            {"entity_id": "23"},
+        ):
+            response = self.client.get("/api/logs/", params)
+            self.assertEqual(
+                [log["action"] for log in response.json()["data"]["results"]],
+                ["order_created"],
+            )
+
+
+class ActivityLogQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Query budgets per endpoint; lists hold enough rows to expose an N+1."""
+
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        ActivityLog.objects.bulk_create(
+            ActivityLog(user=self.admin, username="admin", action=action)
+            for action in ("user_logged_in", "order_created", "user_logged_out")
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_log_list(self):
+        self.assertQueryBudget(2, self.client.get, "/api/logs/")
+
+    def test_log_create(self):
+        response = self.assertQueryBudget(
+            1, self.client.post, "/api/logs/", {"action": "manual_entry"}
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_user_log_list(self):
+        self.assertQueryBudget(2, self.client.get, f"/api/logs/user/{self.admin.id}/")
+
+    def test_log_export(self):
+        self.assertQueryBudget(
+            1, lambda: b"".join(self.client.get("/api/logs/export/").streaming_content)
+        )
+
+
+WRITER_OPTIONS = {
+    "ASYNC": True,
+    "BATCH_SIZE": 100,
+    "FLUSH_INTERVAL": 60.0,
+    "MAX_QUEUE_SIZE": 100,
+    "OVERFLOW": "sync",
+    "BLOCK_TIMEOUT": 0.1,
+}
+
+
+class ActivityLogWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.writer = ActivityLogWriter()
+        self.addCleanup(self.writer.shutdown)
+
+    def submit(self, count=1):
+        for number in range(count):
+            self.writer.submit(ActivityLog(action=f"action_{number}"))
+
+    def written(self):
+        return ActivityLog.objects.count()
+
+    @override_settings(ACTIVITY_LOG_WRITER={**WRITER_OPTIONS, "ASYNC": False})
+    def test_writes_synchronously_when_async_is_off(self):
+        self.submit()
+        self.assertEqual(self.written(), 1)
+        self.assertIsNone(self.writer._thread)
+
+    @override_settings(ACTIVITY_LOG_WRITER=WRITER_OPTIONS)
+    def test_writes_synchronously_inside_a_transaction(self):
+        with transaction.atomic():
+            self.submit()
+            self.assertEqual(self.written(), 1)
+        self.assertIsNone(self.writer._thread)
+
+    @override_settings(ACTIVITY_LOG_WRITER={**WRITER_OPTIONS, "BATCH_SIZE": 3})
+    def test_flushes_a_full_batch(self):
+        self.submit(3)
+        # The interval is a minute away, only the batch size triggers the write.
+        self.writer.flush(timeout=5)
+        self.assertEqual(self.written(), 3)
+
+    @override_settings(ACTIVITY_LOG_WRITER={**WRITER_OPTIONS, "FLUSH_INTERVAL": 0.05})
+    def test_flushes_a_partial_batch_after_the_interval(self):
+        self.submit(2)
+        self.writer.flush(timeout=5)
+        self.assertEqual(self.written(), 2)
+
+    @override_settings(ACTIVITY_LOG_WRITER=WRITER_OPTIONS)
+    def test_shutdown_writes_the_queued_rows(self):
+        self.submit(5)
+        self.writer.shutdown()
+        self.assertEqual(self.written(), 5)
+        self.assertIsNone(self.writer._thread)
+
+    @override_settings(ACTIVITY_LOG_WRITER=WRITER_OPTIONS)
+    def test_replaces_a_dead_thread(self):
+        self.writer._ensure_started()
+        thread = self.writer._thread
+        self.writer._queue.put(_STOP)
+        thread.join(5)
+
+        self.submit()
+        self.assertIsNot(self.writer._thread, thread)
+        self.writer.shutdown()
+        self.assertEqual(self.written(), 1)
+
+    def fill_queue(self):
+        """Stall the writer on its first row and fill the one-row queue."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        write = self.writer._write
+        writing = threading.Event()
+
+        def stalled_write(batch):
+            writing.set()
+            release.wait(5)
+            write(batch)
+
+        self.writer._write = stalled_write
+        self.submit()
+        self.assertTrue(writing.wait(5))
+        self.submit()
+        return release
+
+    @override_settings(
+        ACTIVITY_LOG_WRITER={**WRITER_OPTIONS, "BATCH_SIZE": 1, "MAX_QUEUE_SIZE": 1}
+    )
+    def test_full_queue_writes_synchronously(self):
+        self.fill_queue()
+        self.writer.submit(ActivityLog(action="overflow"))
+        self.assertEqual(
+            list(ActivityLog.objects.values_list("action", flat=True)), ["overflow"]
+        )
+
+    @override_settings(
+        ACTIVITY_LOG_WRITER={
+            **WRITER_OPTIONS,
+            "BATCH_SIZE": 1,
+            "MAX_QUEUE_SIZE": 1,
+            "OVERFLOW": "drop",
+        }
+    )
+    def test_full_queue_drops_when_asked(self):
+        release = self.fill_queue()
+        self.submit()
+        self.assertEqual(self.writer.dropped, 1)
+
+        release.set()
+        self.writer.flush(timeout=5)
+        self.assertEqual(self.written(), 2)
+
+
+class PartitionMathTests(SimpleTestCase):
+    def test_month_start_crosses_year_boundaries(self):
+        self.assertEqual(month_start(date(2026, 12, 31)), date(2026, 12, 1))
+        self.assertEqual(month_start(date(2026, 12, 31), 1), date(2027, 1, 1))
+        self.assertEqual(month_start(date(2026, 1, 31), -1), date(2025, 12, 1))
+        self.assertEqual(month_start(date(2026, 3, 15), -14), date(2025, 1, 1))
+        self.assertEqual(month_start(date(2026, 1, 1), 24), date(2028, 1, 1))
+
+    def test_migration_months_match(self):
+        migration = import_module("activity_logs.migrations.0003_partition_activitylog")
+        day = date(2026, 11, 30)
+        for offset in range(-13, 14):
+            self.assertEqual(
+                migration.add_months(day, offset), month_start(day, offset)
+            )
+
+    def test_partition_names(self):
+        self.assertEqual(
+            partition_name(date(2026, 2, 1)), "activity_logs_activitylog_p202602"
+        )
+
+    def test_retention_cutoff_keeps_whole_months(self):
+        with mock.patch(
+            "activity_logs.partitions.timezone.localdate",
+            return_value=date(2026, 1, 31),
+        ):
+            self.assertEqual(retention_cutoff(12), date(2025, 1, 1))
+            self.assertEqual(retention_cutoff(0), date(2026, 1, 1))
+            self.assertEqual(retention_cutoff(1), date(2025, 12, 1))
+
+
+class ActivityLogRetentionTests(TestCase):
+    def setUp(self):
+        self.archive_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        cutoff = start_of_day(retention_cutoff(3))
+        ActivityLog.objects.bulk_create(
+            [
+                ActivityLog(action="old", timestamp=cutoff - timedelta(days=40)),
+                ActivityLog(
+                    action="last", timestamp=cutoff - timedelta(microseconds=1)
+                ),
+                ActivityLog(action="first_kept", timestamp=cutoff),
+                ActivityLog(action="recent", timestamp=timezone.now()),
+            ]
+        )
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command(
+            "activity_log_partitions",
+            "--retention-months=3",
+            f"--archive-dir={self.archive_dir}",
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def kept(self):
+        return set(ActivityLog.objects.values_list("action", flat=True))
+
+    def test_archives_and_deletes_logs_before_the_cutoff(self):
+        self.run_command()
+
+        self.assertEqual(self.kept(), {"first_kept", "recent"})
+        (archive,) = self.archive_dir.iterdir()
+        with gzip.open(archive, "rt") as lines:
+            archived = [json.loads(line)["action"] for line in lines]
+        self.assertEqual(sorted(archived), ["last", "old"])
+
+    def test_refuses_to_overwrite_an_archive(self):
+        self.run_command()
+        ActivityLog.objects.create(
+            action="old", timestamp=timezone.now() - timedelta(days=400)
+        )
+        with self.assertRaises(CommandError):
+            self.run_command()
+        self.assertIn("old", self.kept())
+
+    def test_no_archive_and_skip_retention(self):
+        self.run_command("--skip-retention")
+        self.assertEqual(len(self.kept()), 4)
+
+        self.run_command("--no-archive")
+        self.assertEqual(self.kept(), {"first_kept", "recent"})
+        self.assertEqual(list(self.archive_dir.iterdir()), [])
+
+
+@skipUnless(connection.vendor == "postgresql", "Partitioning needs PostgreSQL.")
+class ActivityLogPartitionTests(TestCase):
+    def test_creates_partitions_ahead_and_drops_expired_ones(self):
+        this_month = month_start(timezone.localdate())
+        old = month_start(this_month, -14)
+        ActivityLog.objects.create(action="old", timestamp=start_of_day(old))
+        # The old row sits in the default partition until its month exists.
+        ensure_partitions(months_ahead=2, since=old)
+        partitions = list_partitions()
+        self.assertIn(old, partitions)
+        self.assertIn(month_start(this_month, 2), partitions)
+
+        removed = apply_retention(12, archive=False)
+        self.assertIn((partition_name(old), None), removed)
+        self.assertNotIn(old, list_partitions())
+        self.assertFalse(ActivityLog.objects.filter(action="old").exists())
@@ -1,9 +1,14 @@
 from django.urls import path
 
-from activity_logs.views import ActivityLogListCreateAPIView, UserActivityLogListAPIView
+from activity_logs.views import (
+    ActivityLogExportAPIView,
+    ActivityLogListCreateAPIView,
+    UserActivityLogListAPIView,
+)
 
 urlpatterns = [
     path("", ActivityLogListCreateAPIView.as_view(), name="activity-log-list-create"),
+    path("export/", ActivityLogExportAPIView.as_view(), name="activity-log-export"),
     path(
         "user/<int:user_id>/",
         UserActivityLogListAPIView.as_view(),
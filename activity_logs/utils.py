@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 
 from activity_logs.models import ActivityLog
+from activity_logs.writer import writer
+from utils.filters import date_range_filter
 
 User = get_user_model()
 
@@ -32,14 +34,35 @@ def log_activity(
         if hasattr(request, "session"):
             session_id = request.session.session_key
 
-    ActivityLog.objects.create(
-        user=user,
-        username=username,
-        action=action,
-        entity_type=entity_type,
-        entity_id=entity_id,
-        details=details,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        session_id=session_id,
+    writer.submit(
+        ActivityLog(
+            user=user,
+            username=username,
+            action=action,
+            entity_type=entity_type,
+            entity_id=entity_id,
+            details=details,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            session_id=session_id,
+        )
     )
+
+
+def filter_activity_logs(queryset, params):
+    """
+    Apply the ``user_id``, ``action``, ``entity_type``, ``entity_id``,
+    ``start_date`` and ``end_date`` query parameters shared by the log list and
+    export endpoints.
+    """
+    for param, field in (
+        ("user_id", "user_id"),
+        ("action", "action__icontains"),
+        ("entity_type", "entity_type__icontains"),
+        ("entity_id", "entity_id__icontains"),
+    ):
+        value = params.get(param)
+        if value:
+            queryset = queryset.filter(**{field: value})
+    # A time range lets PostgreSQL skip the monthly partitions outside it.
+    return queryset.filter(**date_range_filter(params, "timestamp"))
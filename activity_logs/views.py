@@ -1,4 +1,3 @@
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -6,7 +5,29 @@ from rest_framework.views import APIView
 
 from activity_logs.models import ActivityLog
 from activity_logs.serializers import ActivityLogSerializer
+from activity_logs.utils import filter_activity_logs
 from authentication.choices import UserType
+from utils.exports import (
+    EXPORT_CHUNK_SIZE,
+    export_response,
+    get_file_format,
+)
+from utils.filters import date_range_filter
+from utils.pagination import paginate_queryset
+
+EXPORT_COLUMNS = (
+    "id",
+    "timestamp",
+    "user_id",
+    "username",
+    "action",
+    "entity_type",
+    "entity_id",
+    "details",
+    "ip_address",
+    "user_agent",
+    "session_id",
+)
 
 
 class ActivityLogListCreateAPIView(APIView):
@@ -21,41 +42,14 @@ class ActivityLogListCreateAPIView(APIView):
         queryset = ActivityLog.objects.all()
 
         # Filtering
-        user_id = request.query_params.get("user_id")
-        action = request.query_params.get("action")
-        entity_type = request.query_params.get("entity_type")
-        entity_id = request.query_params.get("entity_id")
-
-        if user_id:
-            queryset = queryset.filter(user__id=user_id)
-        if action:
-            queryset = queryset.filter(action__icontains=action)
-        if entity_type:
-            queryset = queryset.filter(entity_type__icontains=entity_type)
-        if entity_id:
-            queryset = queryset.filter(entity_id__icontains=entity_id)
+        queryset = filter_activity_logs(queryset, request.query_params)
 
         # Pagination
-        page = request.query_params.get("page", 1)
-        page_size = request.query_params.get("page_size", 10)
-        paginator = Paginator(queryset, page_size)
-
-        try:
-            logs = paginator.page(page)
-        except PageNotAnInteger:
-            logs = paginator.page(1)
-        except EmptyPage:
-            logs = paginator.page(paginator.num_pages)
-
-        serializer = ActivityLogSerializer(logs, many=True)
-        return Response(
-            {
-                "count": paginator.count,
-                "num_pages": paginator.num_pages,
-                "current_page": logs.number,
-                "results": serializer.data,
-            }
+        logs, pagination = paginate_queryset(
+            request, queryset, ordering=("-timestamp", "-id")
         )
+        serializer = ActivityLogSerializer(logs, many=True)
+        return Response({**pagination, "results": serializer.data})
 
     def post(self, request):
         # Internal use, so no permission check here, but ensure data integrity
@@ -90,26 +84,33 @@ class UserActivityLogListAPIView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        queryset = ActivityLog.objects.filter(user__id=user_id)
+        queryset = ActivityLog.objects.filter(
+            user__id=user_id, **date_range_filter(request.query_params, "timestamp")
+        )
 
         # Pagination
-        page = request.query_params.get("page", 1)
-        page_size = request.query_params.get("page_size", 10)
-        paginator = Paginator(queryset, page_size)
+        logs, pagination = paginate_queryset(
+            request, queryset, ordering=("-timestamp", "-id")
+        )
+        serializer = ActivityLogSerializer(logs, many=True)
+        return Response({**pagination, "results": serializer.data})
 
-        try:
-            logs = paginator.page(page)
-        except PageNotAnInteger:
-            logs = paginator.page(1)
-        except EmptyPage:
-            logs = paginator.page(paginator.num_pages)
 
-        serializer = ActivityLogSerializer(logs, many=True)
-        return Response(
-            {
-                "count": paginator.count,
-                "num_pages": paginator.num_pages,
-                "current_page": logs.number,
-                "results": serializer.data,
-            }
+class ActivityLogExportAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.user_type == UserType.ADMIN.value:
+            return Response(
+                {"detail": "You do not have permission to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        file_format = get_file_format(request.query_params)
+        queryset = filter_activity_logs(
+            ActivityLog.objects.all(), request.query_params
+        ).order_by("-timestamp", "-id")
+
+        rows = queryset.values_list(*EXPORT_COLUMNS).iterator(
+            chunk_size=EXPORT_CHUNK_SIZE
         )
+        return export_response(rows, EXPORT_COLUMNS, file_format, "activity_logs")
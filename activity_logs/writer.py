@@ -0,0 +1,169 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from activity_logs.models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class ActivityLogWriter:
+    """
+    Buffers ``ActivityLog`` rows in memory and writes them with ``bulk_create``
+    from a background thread, once ``BATCH_SIZE`` rows are queued or every
+    ``FLUSH_INTERVAL`` seconds, whichever comes first.
+
+    The queue holds at most ``MAX_QUEUE_SIZE`` rows. When it is full the
+    ``OVERFLOW`` policy applies: "sync" writes the row in the calling thread,
+    "block" waits for room (up to ``BLOCK_TIMEOUT`` seconds, then writes it
+    synchronously) and "drop" discards it. Rows submitted from inside a
+    transaction, or while ``ASYNC`` is off, are always written synchronously so
+    they commit or roll back together with the caller's work.
+    """
+
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def options(self):
+        return settings.ACTIVITY_LOG_WRITER
+
+    def submit(self, log):
+        if not self.options["ASYNC"] or connection.in_atomic_block:
+            log.save()
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(log)
+            return
+        except queue.Full:
+            pass
+
+        overflow = self.options["OVERFLOW"]
+        if overflow == "block":
+            try:
+                self._queue.put(log, timeout=self.options["BLOCK_TIMEOUT"])
+                return
+            except queue.Full:
+                pass
+        elif overflow == "drop":
+            self.dropped += 1
+            logger.warning(
+                "Activity log queue is full, dropped %s log(s) so far.", self.dropped
+            )
+            return
+        log.save()
+
+    def flush(self, timeout=None):
+        """Block until every row queued so far has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._queue.all_tasks_done.wait(remaining)
+
+    def shutdown(self, timeout=5):
+        """Write out whatever is still queued and stop the background thread."""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive() or self._pid != os.getpid():
+                return
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            self._thread = None
+
+    def _running(self):
+        return (
+            self._thread is not None
+            and self._pid == os.getpid()
+            and self._thread.is_alive()
+        )
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so a pre-forking server (e.g. gunicorn
+        # with --preload) needs a fresh writer thread in every worker. A thread
+        # that died in this process is replaced and keeps the rows queued.
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            if self._queue is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.options["MAX_QUEUE_SIZE"])
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="activity-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        batch_size = self.options["BATCH_SIZE"]
+        flush_interval = self.options["FLUSH_INTERVAL"]
+        batch = []
+        deadline = time.monotonic() + flush_interval
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+                self._queue.task_done()
+                batch.extend(self._drain())
+            elif item is not None:
+                batch.append(item)
+
+            if batch and (
+                stopping or len(batch) >= batch_size or time.monotonic() >= deadline
+            ):
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + flush_interval
+
+        connection.close()
+
+    def _drain(self):
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is _STOP:
+                self._queue.task_done()
+            else:
+                items.append(item)
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            ActivityLog.objects.bulk_create(batch)
+        except Exception:
+            logger.exception("Failed to write %s activity log(s).", len(batch))
+
+
+writer = ActivityLogWriter()
+atexit.register(writer.shutdown)
@@ -16,9 +16,13 @@ class AnalyticsConfig(AppConfig):
         from django_apscheduler.models import DjangoJobExecution
 
         from analytics.jobs import (
+            activity_log_partition_job,
             daily_sales_aggregation_job,
             low_stock_alert_job,
+            order_status_count_job,
             pending_order_reminder_job,
+            sales_rollup_job,
+            stock_reservation_job,
         )
 
         logger = logging.getLogger(__name__)
@@ -68,6 +72,52 @@ class AnalyticsConfig(AppConfig):
             )
             logger.info("Added job 'pending_order_reminder'.")
 
+            # Job 4: Activity Log Partitions
+            # Schedule: Every day at 1:00 AM, keeps upcoming months partitioned
+            scheduler.add_job(
+                activity_log_partition_job,
+                trigger=CronTrigger(hour="1", minute="0"),
+                id="activity_log_partitions",
+                max_instances=1,
+                replace_existing=True,
+            )
+            logger.info("Added job 'activity_log_partitions'.")
+
+            # Job 5: Sales Rollups
+            # Schedule: Every day at 0:10 AM, rolls up the day that just closed
+            scheduler.add_job(
+                sales_rollup_job,
+                trigger=CronTrigger(hour="0", minute="10"),
+                id="sales_rollups",
+                max_instances=1,
+                replace_existing=True,
+            )
+            logger.info("Added job 'sales_rollups'.")
+
+            # Job 6: Stock Reservations
+            # Schedule: Every minute, releases expired holds and refreshes the
+            # stock_quantity snapshots
+            scheduler.add_job(
+                stock_reservation_job,
+                trigger=CronTrigger(minute="*"),
+                id="stock_reservations",
+                max_instances=1,
+                replace_existing=True,
+            )
+            logger.info("Added job 'stock_reservations'.")
+
+            # Job 7: Order Status Counts
+            # Schedule: Every hour at :20, recounts the orders per status and
+            # corrects the counters that drifted
+            scheduler.add_job(
+                order_status_count_job,
+                trigger=CronTrigger(minute="20"),
+                id="order_status_counts",
+                max_instances=1,
+                replace_existing=True,
+            )
+            logger.info("Added job 'order_status_counts'.")
+
             try:
                 logger.info("Starting scheduler...")
                 scheduler.start()
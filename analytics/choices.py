@@ -0,0 +1,7 @@
+from django.db import models
+
+
+class RollupGrain(models.TextChoices):
+    DAY = "day", "Day"
+    WEEK = "week", "Week"
+    MONTH = "month", "Month"
@@ -0,0 +1,128 @@
+"""
+Backfill and catch-up for the ``DailySales`` table of delivered orders.
+
+Days are aggregated in one grouped query per range and written with a bulk
+upsert, so a range can be recomputed any number of times. The "daily_sales"
+watermark records the last aggregated day; the scheduled job processes every
+day after it up to yesterday, which fills in any nights the scheduler missed.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DateField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from analytics.models import DailySales
+from analytics.rollups import get_watermark, set_watermark
+from orders.choices import OrderStatusChoices
+from orders.models import Order, OrderItem
+from utils.filters import start_of_day
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "daily_sales"
+
+
+def aggregate_daily_sales(start, end):
+    """
+    Compute and store ``DailySales`` for every day from ``start`` to ``end``
+    (inclusive). Days without delivered orders get an all-zero row. Returns the
+    number of days written.
+    """
+    items_sold = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .values("order")
+        .annotate(quantity=Sum("quantity"))
+        .values("quantity")
+    )
+    days = (
+        Order.objects.filter(
+            status=OrderStatusChoices.DELIVERED,
+            ordered_at__gte=start_of_day(start),
+            ordered_at__lt=start_of_day(end + timedelta(days=1)),
+        )
+        .annotate(
+            day=Trunc("ordered_at", "day", output_field=DateField()),
+            items_sold=Coalesce(Subquery(items_sold), 0, output_field=IntegerField()),
+        )
+        .values("day")
+        .annotate(
+            total_orders=Count("id"),
+            total_revenue=Sum("total_amount"),
+            total_items_sold=Sum("items_sold"),
+        )
+        .order_by()
+    )
+    totals = {row["day"]: row for row in days}
+
+    rows = []
+    day = start
+    while day <= end:
+        row = totals.get(day, {})
+        total_orders = row.get("total_orders", 0)
+        total_revenue = row.get("total_revenue") or Decimal("0")
+        rows.append(
+            DailySales(
+                date=day,
+                total_orders=total_orders,
+                total_revenue=total_revenue,
+                total_items_sold=row.get("total_items_sold") or 0,
+                average_order_value=(
+                    total_revenue / total_orders if total_orders else 0
+                ),
+            )
+        )
+        day += timedelta(days=1)
+
+    DailySales.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=[
+            "total_orders",
+            "total_revenue",
+            "total_items_sold",
+            "average_order_value",
+        ],
+    )
+    return len(rows)
+
+
+def backfill_daily_sales(start, end):
+    """
+    Aggregate ``start``-``end`` and move the watermark forward past it, if
+    the range joins up with it. Today is never marked as done, it is still
+    collecting orders.
+    """
+    written = aggregate_daily_sales(start, end)
+    done = min(end, timezone.localdate() - timedelta(days=1))
+    watermark = get_watermark(WATERMARK)
+    # A range leaving a gap after the watermark does not move it, so the
+    # catch-up still fills the gap.
+    if watermark is None or (
+        start <= watermark + timedelta(days=1) and done > watermark
+    ):
+        set_watermark(done, WATERMARK)
+    return written
+
+
+def catch_up_daily_sales():
+    """
+    Aggregate every day after the watermark up to yesterday. Without a
+    watermark the run continues from the latest stored day, or starts with
+    yesterday. Returns the ``(start, end)`` range processed, or ``None``.
+    """
+    yesterday = timezone.localdate() - timedelta(days=1)
+    watermark = get_watermark(WATERMARK)
+    if watermark is None:
+        watermark = DailySales.objects.order_by("-date").values_list(
+            "date", flat=True
+        ).first() or yesterday - timedelta(days=1)
+    start = watermark + timedelta(days=1)
+    if start > yesterday:
+        return None
+    backfill_daily_sales(start, yesterday)
+    return start, yesterday
@@ -0,0 +1,79 @@
+"""
+Admin dashboard figures, computed with one conditional aggregate per table
+(the order counts are read from analytics.status_counts) and cached for
+``DASHBOARD_CACHE_TTL`` seconds. Views that change orders or stock call
+``invalidate_dashboard`` so the next request recomputes them; that reaches
+every process only with a shared cache (``REDIS_URL``), otherwise the other
+processes serve their figures until the TTL runs out.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from analytics.status_counts import status_counts
+from authentication.choices import UserType
+from authentication.models import UserProfile
+from orders.choices import OrderStatusChoices
+from orders.models import Order
+from products.models import Product
+from utils.filters import start_of_day
+
+CACHE_KEY = "analytics:dashboard:{day}"
+
+
+def get_dashboard():
+    today = timezone.localdate()
+    key = CACHE_KEY.format(day=today)
+    data = cache.get(key)
+    if data is None:
+        data = compute_dashboard(today)
+        cache.set(key, data, settings.DASHBOARD_CACHE_TTL)
+    return data
+
+
+def compute_dashboard(today):
+    delivered = Q(status=OrderStatusChoices.DELIVERED)
+    placed_today = Q(
+        ordered_at__gte=start_of_day(today),
+        ordered_at__lt=start_of_day(today + timedelta(days=1)),
+    )
+    counts = status_counts()
+    orders = Order.objects.aggregate(
+        total_revenue=Sum("total_amount", filter=delivered, default=0),
+        today_revenue=Sum("total_amount", filter=delivered & placed_today, default=0),
+        today_orders=Count("id", filter=placed_today),
+    )
+    products = Product.objects.aggregate(
+        active_products=Count("id", filter=Q(is_active=True)),
+        low_stock_products=Count(
+            "id", filter=Q(stock_quantity__lte=F("low_stock_threshold"))
+        ),
+    )
+    total_customers = UserProfile.objects.filter(user_type=UserType.CUSTOMER).count()
+
+    return {
+        "total_orders": sum(counts.values()),
+        "total_revenue": orders["total_revenue"],
+        "pending_orders": counts[OrderStatusChoices.PENDING],
+        "delivered_orders": counts[OrderStatusChoices.DELIVERED],
+        "total_customers": total_customers,
+        "active_products": products["active_products"],
+        "low_stock_products": products["low_stock_products"],
+        "today_revenue": orders["today_revenue"],
+        "today_orders": orders["today_orders"],
+    }
+
+
+def invalidate_dashboard():
+    """
+    Drop the cached figures once the current transaction commits, so a
+    concurrent request cannot cache them again from before the change.
+    """
+    transaction.on_commit(
+        lambda: cache.delete(CACHE_KEY.format(day=timezone.localdate()))
+    )
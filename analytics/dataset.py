@@ -0,0 +1,495 @@
+"""
+Deterministic synthetic dataset for benchmarks and local fixtures.
+
+``generate`` adds customers, categories, products (with their stock shards),
+orders with their items, and activity logs to the current database. The same
+parameters and seed always produce the same rows. Rows are written with
+``bulk_create`` in chunks of ``chunk_size`` with explicit ids, or streamed
+with COPY on PostgreSQL, so nothing goes through ``save()``. What ``save()`` would have done is done per chunk instead:
+slugs come from ``allocate_slugs``, order numbers continue the per-day
+``OrderNumberSequence``, item subtotals and order totals add up, and search
+vectors, stock shards and the analytics tables are brought up to date at the
+end.
+
+Product popularity and customer activity follow a Zipf distribution with
+exponent ``skew``: 0 is uniform, around 1 a few best sellers take most of
+the orders, and higher values concentrate them further.
+"""
+
+import csv
+import io
+import json
+import random
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from datetime import UTC, timedelta
+from decimal import Decimal
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import JSONField, Max
+from django.utils import timezone
+
+from activity_logs.models import ActivityLog
+from activity_logs.partitions import ensure_partitions, is_partitioned
+from analytics.daily_sales import backfill_daily_sales
+from analytics.product_sales import rebuild_product_sales
+from analytics.rollups import (
+    REBUILD_CHUNK_DAYS,
+    get_watermark,
+    rebuild_rollups,
+    roll_up_closed_days,
+)
+from analytics.status_counts import reconcile_status_counts
+from authentication.choices import UserType
+from authentication.models import UserProfile
+from orders.choices import OrderStatusChoices, PaymentStatusChoices
+from orders.models import Order, OrderItem, OrderNumberSequence
+from products.models import Category, Product, StockShard
+from products.search import update_search_vectors
+from products.slugs import allocate_slugs
+from products.stock import split_stock
+from utils.filters import start_of_day
+
+CHUNK_SIZE = 2000
+# Names per allocate_slugs() call: its prefix query ORs two lookups per name,
+# and SQLite rejects expressions more than 1000 deep.
+SLUG_BATCH_SIZE = 200
+PASSWORD = "benchmark"
+
+# Share of orders in each status, and the payment status that goes with it.
+STATUSES = {
+    OrderStatusChoices.DELIVERED: (0.6, PaymentStatusChoices.PAID),
+    OrderStatusChoices.SHIPPED: (0.08, PaymentStatusChoices.PAID),
+    OrderStatusChoices.PROCESSING: (0.05, PaymentStatusChoices.PAID),
+    OrderStatusChoices.CONFIRMED: (0.05, PaymentStatusChoices.PAID),
+    OrderStatusChoices.PENDING: (0.12, PaymentStatusChoices.PENDING),
+    OrderStatusChoices.CANCELLED: (0.1, PaymentStatusChoices.FAILED),
+}
+PAYMENT_METHODS = ("card", "upi", "net_banking", "cash_on_delivery")
+LOG_ACTIONS = (
+    ("user_login", "user"),
+    ("order_created", "order"),
+    ("order_status_updated", "order"),
+    ("product_updated", "product"),
+    ("user_logout", "user"),
+)
+
+
+@dataclass
+class DatasetSpec:
+    users: int = 1000
+    categories: int = 50
+    products: int = 10000
+    orders: int = 100000
+    items_per_order: int = 3
+    logs: int = 100000
+    days: int = 365
+    skew: float = 1.1
+    seed: int = 42
+
+    def as_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """Add a ``--users``, ``--orders``, ... option per field to ``parser``."""
+        for field in fields(cls):
+            parser.add_argument(
+                f"--{field.name.replace('_', '-')}",
+                type=type(field.default),
+                default=field.default,
+                help=f"Default {field.default}.",
+            )
+
+    @classmethod
+    def from_options(cls, options):
+        """The spec given by the ``add_arguments`` options (a dict)."""
+        return cls(**{field.name: options[field.name] for field in fields(cls)})
+
+
+def zipf_weights(count, skew):
+    """Cumulative Zipf weights of ``count`` ranks, for ``random.choices``."""
+    return list(accumulate(1 / rank**skew for rank in range(1, count + 1)))
+
+
+def generate(spec, end=None, chunk_size=CHUNK_SIZE, use_copy=None, progress=None):
+    """
+    Add the rows described by ``spec`` (a ``DatasetSpec``), with orders spread
+    over the ``spec.days`` days up to ``end`` (default: yesterday). Rows are
+    written with COPY when ``use_copy`` is true, by default on PostgreSQL.
+    Returns the number of rows written per table.
+    """
+    if use_copy is None:
+        use_copy = connection.vendor == "postgresql"
+    write = copy_rows if use_copy else bulk_write
+    rng = random.Random(spec.seed)
+    progress = progress or (lambda message: None)
+    end = end or timezone.localdate() - timedelta(days=1)
+    start = end - timedelta(days=spec.days - 1)
+    counts = {}
+
+    user_ids = _write_users(write, spec, rng, chunk_size)
+    counts["users"] = len(user_ids)
+    progress(f"{len(user_ids)} users")
+
+    category_ids = _write_categories(write, spec)
+    counts["categories"] = len(category_ids)
+    progress(f"{len(category_ids)} categories")
+
+    prices = _write_products(write, spec, rng, category_ids, chunk_size)
+    counts["products"] = len(prices)
+    progress(f"{len(prices)} products")
+
+    counts["orders"], counts["order_items"] = _write_orders(
+        write, spec, rng, start, end, user_ids, prices, chunk_size, progress
+    )
+    counts["activity_logs"] = _write_logs(
+        write, spec, rng, start, end, user_ids, chunk_size, progress
+    )
+
+    reset_sequences()
+    if prices:
+        update_search_vectors(Product.objects.filter(id__gte=min(prices)))
+    if counts["orders"]:
+        refresh_analytics(start, end)
+    progress("Search vectors and analytics refreshed")
+    return counts
+
+
+def refresh_analytics(start, end):
+    """
+    Recompute the sales rollups, daily sales and product sales of
+    ``start``-``end``, and recount the orders per status.
+    """
+    watermark = get_watermark()
+    if watermark is None:
+        roll_up_closed_days()
+    else:
+        # Days after the watermark are counted live, see rebuild_sales_rollups.
+        day = start
+        while day <= min(end, watermark):
+            chunk_end = min(
+                day + timedelta(days=REBUILD_CHUNK_DAYS - 1), end, watermark
+            )
+            rebuild_rollups(day, chunk_end)
+            day = chunk_end + timedelta(days=1)
+    backfill_daily_sales(start, end)
+    rebuild_product_sales(start, end)
+    reconcile_status_counts()
+
+
+def reset_sequences():
+    """Move the id sequences past the explicit ids (a no-op on SQLite)."""
+    models = [UserProfile, Category, Product, StockShard, Order, OrderItem, ActivityLog]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _slugs(model, names):
+    return [
+        slug
+        for batch in _chunks(names, SLUG_BATCH_SIZE)
+        for slug in allocate_slugs(model, batch)
+    ]
+
+
+def bulk_write(model, objs):
+    model.objects.bulk_create(objs)
+
+
+def copy_rows(model, objs):
+    """
+    Write ``objs`` with one COPY, which PostgreSQL parses and plans once for
+    the whole chunk instead of once per ``bulk_create`` batch.
+    """
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    # Only NULL is left unquoted, so empty strings stay empty strings.
+    rows = csv.writer(buffer, quoting=csv.QUOTE_NOTNULL)
+    for obj in objs:
+        rows.writerow(_copy_value(field, obj) for field in fields)
+    buffer.seek(0)
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+def _copy_value(field, obj):
+    """``obj``'s value for ``field`` as COPY's CSV format reads it."""
+    value = field.get_prep_value(field.pre_save(obj, add=True))
+    if value is None:
+        return None
+    if isinstance(field, JSONField):
+        return json.dumps(value, cls=field.encoder)
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value)
+
+
+@contextmanager
+def _explicit_timestamps(model):
+    """Let the writes keep the values of ``auto_now``/``auto_now_add`` fields."""
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _write_users(write, spec, rng, chunk_size):
+    # Hashing is deliberately slow; every generated customer shares one hash.
+    password = make_password(PASSWORD, salt=f"dataset{spec.seed}")
+    first_id = _next_id(UserProfile)
+    ids = range(first_id, first_id + spec.users)
+    for chunk in _chunks(ids, chunk_size):
+        write(
+            UserProfile,
+            [
+                UserProfile(
+                    id=user_id,
+                    username=f"customer{user_id}",
+                    email=f"customer{user_id}@example.com",
+                    password=password,
+                    first_name="Customer",
+                    last_name=str(user_id),
+                    phone=f"9{rng.randrange(10**9):09d}",
+                    address=f"{rng.randint(1, 999)} Market Road",
+                    city=f"City {rng.randint(1, 50)}",
+                    pincode=f"{rng.randrange(10**6):06d}",
+                    user_type=UserType.CUSTOMER.value,
+                )
+                for user_id in chunk
+            ],
+        )
+    return list(ids)
+
+
+@transaction.atomic
+def _write_categories(write, spec):
+    first_id = _next_id(Category)
+    ids = list(range(first_id, first_id + spec.categories))
+    names = [f"Category {category_id}" for category_id in ids]
+    write(
+        Category,
+        [
+            Category(
+                id=category_id,
+                name=name,
+                slug=slug,
+                description=f"Generated category {category_id}.",
+            )
+            for category_id, name, slug in zip(ids, names, _slugs(Category, names))
+        ],
+    )
+    return ids
+
+
+def _write_products(write, spec, rng, category_ids, chunk_size):
+    """Write the products and their stock shards; returns ``{id: price}``."""
+    first_id = _next_id(Product)
+    prices = {}
+    for chunk in _chunks(range(first_id, first_id + spec.products), chunk_size):
+        with transaction.atomic():
+            names = [f"Product {product_id}" for product_id in chunk]
+            products = []
+            for product_id, name, slug in zip(chunk, names, _slugs(Product, names)):
+                price = Decimal(rng.randint(100, 500000)) / 100
+                prices[product_id] = price
+                products.append(
+                    Product(
+                        id=product_id,
+                        name=name,
+                        slug=slug,
+                        description=f"Generated product {product_id}.",
+                        category_id=rng.choice(category_ids),
+                        price=price,
+                        discount_price=(price * Decimal("0.9")).quantize(
+                            Decimal("0.01")
+                        )
+                        if rng.random() < 0.2
+                        else None,
+                        stock_quantity=rng.randint(0, 500),
+                        sku=f"GEN-{product_id:08d}",
+                        is_active=rng.random() > 0.05,
+                    )
+                )
+            write(Product, products)
+            write(
+                StockShard,
+                [
+                    StockShard(product_id=product.id, shard=shard, quantity=quantity)
+                    for product in products
+                    for shard, quantity in enumerate(
+                        split_stock(product.stock_quantity, settings.STOCK_SHARDS)
+                    )
+                ],
+            )
+    return prices
+
+
+def _write_orders(write, spec, rng, start, end, user_ids, prices, chunk_size, progress):
+    """
+    Write the orders in time order with their items. Order numbers are
+    allocated per UTC day like ``allocate_order_number`` does.
+    """
+    if not spec.orders or not user_ids or not prices:
+        return 0, 0
+    first = start_of_day(start)
+    span = (start_of_day(end + timedelta(days=1)) - first).total_seconds()
+    product_ids = list(prices)
+    rng.shuffle(product_ids)
+    product_weights = zipf_weights(len(product_ids), spec.skew)
+    customers = list(user_ids)
+    rng.shuffle(customers)
+    customer_weights = zipf_weights(len(customers), spec.skew)
+    statuses = list(STATUSES)
+    status_weights = list(accumulate(share for share, _ in STATUSES.values()))
+
+    numbers = dict(
+        OrderNumberSequence.objects.filter(
+            date__range=(start - timedelta(days=1), end + timedelta(days=1))
+        ).values_list("date", "last_value")
+    )
+    order_id, item_id = _next_id(Order), _next_id(OrderItem)
+    written = items_written = 0
+
+    for chunk in _chunks(range(spec.orders), chunk_size):
+        orders, items = [], []
+        for index in chunk:
+            ordered_at = first + timedelta(
+                seconds=(index + rng.random()) * span / spec.orders
+            )
+            day = ordered_at.astimezone(UTC).date()
+            numbers[day] = numbers.get(day, 0) + 1
+
+            total = Decimal("0.00")
+            lines = rng.randint(1, 2 * spec.items_per_order - 1)
+            # A product picked twice becomes one line, as a cart would.
+            for product_id in dict.fromkeys(
+                rng.choices(product_ids, cum_weights=product_weights, k=lines)
+            ):
+                quantity = rng.choices((1, 2, 3, 5), (70, 20, 8, 2))[0]
+                subtotal = prices[product_id] * quantity
+                total += subtotal
+                items.append(
+                    OrderItem(
+                        id=item_id,
+                        order_id=order_id,
+                        product_id=product_id,
+                        quantity=quantity,
+                        price=prices[product_id],
+                        subtotal=subtotal,
+                    )
+                )
+                item_id += 1
+
+            order_status = rng.choices(statuses, cum_weights=status_weights)[0]
+            delivered_at = None
+            if order_status == OrderStatusChoices.DELIVERED:
+                delivered_at = ordered_at + timedelta(hours=rng.randint(24, 240))
+            orders.append(
+                Order(
+                    id=order_id,
+                    order_number=f"ORD-{day:%Y%m%d}-{numbers[day]:03d}",
+                    user_id=rng.choices(customers, cum_weights=customer_weights)[0],
+                    status=order_status,
+                    total_amount=total,
+                    shipping_address=f"{rng.randint(1, 999)} Market Road",
+                    payment_method=rng.choice(PAYMENT_METHODS),
+                    payment_status=STATUSES[order_status][1],
+                    ordered_at=ordered_at,
+                    updated_at=delivered_at or ordered_at,
+                    delivered_at=delivered_at,
+                )
+            )
+            order_id += 1
+
+        with transaction.atomic(), _explicit_timestamps(Order):
+            write(Order, orders)
+            write(OrderItem, items)
+        written += len(orders)
+        items_written += len(items)
+        progress(f"{written}/{spec.orders} orders")
+
+    OrderNumberSequence.objects.bulk_create(
+        [
+            OrderNumberSequence(date=day, last_value=last)
+            for day, last in numbers.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=["last_value"],
+    )
+    return written, items_written
+
+
+def _write_logs(write, spec, rng, start, end, user_ids, chunk_size, progress):
+    if not spec.logs:
+        return 0
+    if is_partitioned():
+        ensure_partitions(since=start)
+    first = start_of_day(start)
+    span = (start_of_day(end + timedelta(days=1)) - first).total_seconds()
+    customers = list(user_ids)
+    rng.shuffle(customers)
+    customer_weights = zipf_weights(len(customers), spec.skew)
+    log_id = _next_id(ActivityLog)
+    written = 0
+
+    for chunk in _chunks(range(spec.logs), chunk_size):
+        logs = []
+        for index in chunk:
+            action, entity_type = rng.choice(LOG_ACTIONS)
+            user_id = (
+                rng.choices(customers, cum_weights=customer_weights)[0]
+                if customers
+                else None
+            )
+            logs.append(
+                ActivityLog(
+                    id=log_id,
+                    user_id=user_id,
+                    username=f"customer{user_id}" if user_id else "Anonymous",
+                    action=action,
+                    entity_type=entity_type,
+                    entity_id=str(rng.randint(1, 10**6)),
+                    details={"generated": True},
+                    ip_address=f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randint(1, 254)}",
+                    user_agent="analytics.dataset",
+                    timestamp=first
+                    + timedelta(seconds=(index + rng.random()) * span / spec.logs),
+                )
+            )
+            log_id += 1
+        write(ActivityLog, logs)
+        written += len(logs)
+        progress(f"{written}/{spec.logs} activity logs")
+    return written
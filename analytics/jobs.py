@@ -1,54 +1,34 @@
 import logging
-from datetime import timedelta
 
-from django.db.models import Sum
-from django.utils import timezone
+from django.db.models import F
 
+from activity_logs.partitions import ensure_partitions, is_partitioned
 from activity_logs.utils import log_activity
-from analytics.models import DailySales
-from orders.models import Order
+from analytics.daily_sales import catch_up_daily_sales
+from analytics.product_sales import refresh_product_sales
+from analytics.rollups import roll_up_closed_days
+from analytics.status_counts import reconcile_status_counts
+from orders.utils import stale_pending_orders
 from products.models import Product
+from products.stock import refresh_stock_snapshots, release_expired_reservations
 
 logger = logging.getLogger(__name__)
 
 
 def daily_sales_aggregation_job():
     logger.info("Running daily_sales_aggregation_job...")
-    today = timezone.now().date()
-    yesterday = today - timedelta(days=1)
-
-    # Filter delivered orders for yesterday
-    orders_yesterday = Order.objects.filter(
-        ordered_at__date=yesterday, status="delivered"
-    )
-
-    total_orders = orders_yesterday.count()
-    total_revenue = (
-        orders_yesterday.aggregate(Sum("total_amount"))["total_amount__sum"] or 0
-    )
-    total_items_sold = (
-        orders_yesterday.aggregate(Sum("items__quantity"))["items__quantity__sum"] or 0
-    )
-    average_order_value = total_revenue / total_orders if total_orders > 0 else 0
-
-    daily_sales, created = DailySales.objects.update_or_create(
-        date=yesterday,
-        defaults={
-            "total_orders": total_orders,
-            "total_revenue": total_revenue,
-            "total_items_sold": total_items_sold,
-            "average_order_value": average_order_value,
-        },
-    )
-    logger.info(
-        f"Aggregated sales for {yesterday}: {daily_sales.total_revenue} (Orders: {daily_sales.total_orders})"
-    )
+    processed = catch_up_daily_sales()
+    if processed is None:
+        logger.info("Daily sales are already aggregated up to yesterday.")
+        return
+    start, end = processed
+    logger.info(f"Aggregated daily sales from {start} to {end}.")
 
 
 def low_stock_alert_job():
     logger.info("Running low_stock_alert_job...")
     low_stock_products = Product.objects.filter(
-        stock_quantity__lte=models.F("low_stock_threshold")
+        stock_quantity__lte=F("low_stock_threshold")
     )
     count = low_stock_products.count()
 
@@ -68,10 +48,7 @@ def low_stock_alert_job():
 
 def pending_order_reminder_job():
     logger.info("Running pending_order_reminder_job...")
-    twenty_four_hours_ago = timezone.now() - timedelta(hours=24)
-    pending_orders = Order.objects.filter(
-        status="pending", ordered_at__lte=twenty_four_hours_ago
-    )
+    pending_orders = stale_pending_orders()
     count = pending_orders.count()
 
     if count > 0:
@@ -86,3 +63,37 @@ def pending_order_reminder_job():
         logger.info(f"Found {count} pending orders older than 24 hours.")
     else:
         logger.info("No pending orders older than 24 hours found.")
+
+
+def activity_log_partition_job():
+    logger.info("Running activity_log_partition_job...")
+    if not is_partitioned():
+        logger.info("Activity logs are not partitioned, nothing to do.")
+        return
+    created = ensure_partitions()
+    logger.info(f"Created {len(created)} activity log partition(s).")
+
+
+def sales_rollup_job():
+    logger.info("Running sales_rollup_job...")
+    roll_up_closed_days()
+    start, end = refresh_product_sales()
+    logger.info(f"Recomputed product sales from {start} to {end}.")
+
+
+def stock_reservation_job():
+    logger.info("Running stock_reservation_job...")
+    released = release_expired_reservations()
+    if released:
+        logger.info(f"Released {released} expired stock reservation(s).")
+    refreshed = refresh_stock_snapshots()
+    logger.info(f"Refreshed the stock snapshot of {refreshed} product(s).")
+
+
+def order_status_count_job():
+    logger.info("Running order_status_count_job...")
+    corrections = reconcile_status_counts()
+    if corrections:
+        logger.warning(f"Corrected drifted order status counts: {corrections}")
+    else:
+        logger.info("Order status counts are accurate.")
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from analytics.daily_sales import backfill_daily_sales, catch_up_daily_sales
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Aggregate DailySales for a range of days, or for every day after the "
+        "last aggregated one when no range is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start", help="First day to aggregate (default: first order)."
+        )
+        parser.add_argument("--end", help="Last day to aggregate (default: yesterday).")
+
+    def handle(self, *args, **options):
+        if not options["start"] and not options["end"]:
+            processed = catch_up_daily_sales()
+            if processed is None:
+                self.stdout.write("Daily sales are already up to date.")
+            else:
+                start, end = processed
+                self.stdout.write(
+                    self.style.SUCCESS(f"Aggregated daily sales from {start} to {end}.")
+                )
+            return
+
+        end = (
+            self.parse_day(options["end"])
+            if options["end"]
+            else timezone.localdate() - timedelta(days=1)
+        )
+        if options["start"]:
+            start = self.parse_day(options["start"])
+        else:
+            first_order = Order.objects.aggregate(first=Min("ordered_at"))["first"]
+            if first_order is None:
+                self.stdout.write("There are no orders to aggregate.")
+                return
+            start = timezone.localtime(first_order).date()
+        if start > end:
+            raise CommandError("--start must not be after --end.")
+
+        written = backfill_daily_sales(start, end)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Aggregated daily sales for {written} day(s) from {start} to {end}."
+            )
+        )
+
+    def parse_day(self, value):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD.")
+        return day
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from analytics.rollups import (
+    REBUILD_CHUNK_DAYS,
+    get_watermark,
+    rebuild_rollups,
+    roll_up_closed_days,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the sales rollups up to date, or recompute them for a range of "
+        "days that are already rolled up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First day to recompute (YYYY-MM-DD).")
+        parser.add_argument("--end", help="Last day to recompute (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        if not options["start"] and not options["end"]:
+            roll_up_closed_days()
+            self.stdout.write(
+                self.style.SUCCESS(f"Sales rolled up until {get_watermark()}.")
+            )
+            return
+
+        watermark = get_watermark()
+        if watermark is None:
+            raise CommandError("Nothing is rolled up yet, run without a range first.")
+        start = self.parse_day(options["start"]) if options["start"] else None
+        end = self.parse_day(options["end"]) if options["end"] else watermark
+        if start is None or start > end:
+            raise CommandError("--start is required and must not be after --end.")
+        # Days after the watermark are counted live, rolling them up here
+        # would count them twice.
+        end = min(end, watermark)
+
+        while start <= end:
+            chunk_end = min(start + timedelta(days=REBUILD_CHUNK_DAYS - 1), end)
+            rebuild_rollups(start, chunk_end)
+            self.stdout.write(f"Recomputed sales from {start} to {chunk_end}.")
+            start = chunk_end + timedelta(days=1)
+
+    def parse_day(self, value):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD.")
+        return day
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.dateparse import parse_date
+
+from analytics.dataset import CHUNK_SIZE, DatasetSpec, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Add a synthetic dataset of customers, products, orders and activity "
+        "logs. The same options and seed give the same rows on an empty database."
+    )
+
+    def add_arguments(self, parser):
+        DatasetSpec.add_arguments(parser)
+        parser.add_argument(
+            "--end", help="Last day with orders (YYYY-MM-DD), yesterday by default."
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create rather than COPY on PostgreSQL.",
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Seed even with DEBUG off."
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("DEBUG is off, pass --force to seed this database.")
+        end = None
+        if options["end"]:
+            end = parse_date(options["end"])
+            if end is None:
+                raise CommandError(
+                    f"Invalid date {options['end']!r}, expected YYYY-MM-DD."
+                )
+        spec = DatasetSpec.from_options(options)
+        if spec.days < 1 or spec.items_per_order < 1 or options["chunk_size"] < 1:
+            raise CommandError(
+                "--days, --items-per-order and --chunk-size must be positive."
+            )
+
+        counts = generate(
+            spec,
+            end=end,
+            chunk_size=options["chunk_size"],
+            use_copy=connection.vendor == "postgresql" and not options["no_copy"],
+            progress=self.stdout.write,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Seeded "
+                + ", ".join(f"{count} {table}" for table, count in counts.items())
+                + "."
+            )
+        )
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_product_sales(apps, schema_editor):
+    """Count the items of every order that is not cancelled."""
+    from django.db.models import DateField, Sum
+    from django.db.models.functions import Trunc
+
+    OrderItem = apps.get_model("orders", "OrderItem")
+    ProductSales = apps.get_model("analytics", "ProductSales")
+    rows = (
+        OrderItem.objects.exclude(order__status="cancelled")
+        .annotate(day=Trunc("order__ordered_at", "day", output_field=DateField()))
+        .values("product_id", "day")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("subtotal"))
+        .order_by()
+    )
+    batch = []
+    for row in rows.iterator():
+        batch.append(
+            ProductSales(
+                product_id=row["product_id"],
+                date=row["day"],
+                quantity=row["quantity"],
+                revenue=row["revenue"],
+            )
+        )
+        if len(batch) >= 5000:
+            ProductSales.objects.bulk_create(batch)
+            batch = []
+    ProductSales.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analytics", "0002_sales_rollups"),
+        ("orders", "0004_order_list_indexes"),
+        ("products", "0005_stock_reservations"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["date"], name="product_sales_date_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "date"),
+                        name="product_sales_product_date_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_product_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+def count_orders(apps, schema_editor):
+    """
+    Create every shard and put the number of orders per status on shard 0.
+    """
+    from django.conf import settings
+    from django.db.models import Count
+
+    Order = apps.get_model("orders", "Order")
+    OrderStatusCount = apps.get_model("analytics", "OrderStatusCount")
+    counts = dict(
+        Order.objects.values("status")
+        .annotate(count=Count("id"))
+        .order_by()
+        .values_list("status", "count")
+    )
+    statuses = [
+        value for value, _ in OrderStatusCount._meta.get_field("status").choices
+    ]
+    OrderStatusCount.objects.bulk_create(
+        OrderStatusCount(
+            status=order_status,
+            shard=shard,
+            count=counts.get(order_status, 0) if shard == 0 else 0,
+        )
+        for order_status in statuses
+        for shard in range(settings.ORDER_STATUS_COUNT_SHARDS)
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analytics", "0003_product_sales"),
+        ("orders", "0004_order_list_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderStatusCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("confirmed", "Confirmed"),
+                            ("processing", "Processing"),
+                            ("shipped", "Shipped"),
+                            ("delivered", "Delivered"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("status", "shard"), name="order_status_count_shard_uniq"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(count_orders, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 
+from analytics.choices import RollupGrain
+from orders.choices import OrderStatusChoices
+
 
 class DailySales(models.Model):
     date = models.DateField(unique=True)
@@ -16,3 +19,92 @@ class DailySales(models.Model):
 
     def __str__(self):
         return f"Daily Sales - {self.date}"
+
+
+class SalesRollup(models.Model):
+    """
+    Orders placed in a day, week or month, per order status. Maintained by
+    analytics.rollups for every day up to the "sales_rollups" watermark.
+    """
+
+    grain = models.CharField(max_length=10, choices=RollupGrain)
+    period_start = models.DateField()
+    status = models.CharField(max_length=20, choices=OrderStatusChoices)
+
+    total_orders = models.IntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_items_sold = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["grain", "period_start", "status"],
+                name="sales_rollup_period_status_uniq",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.get_grain_display()} of {self.period_start} - {self.status}"
+
+
+class AggregationWatermark(models.Model):
+    """Last day an aggregation has been computed up to (inclusive)."""
+
+    name = models.CharField(max_length=100, unique=True)
+    last_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_date}"
+
+
+class ProductSales(models.Model):
+    """
+    Units and revenue of a product sold on a day, counting the orders that are
+    not cancelled. Maintained by analytics.product_sales.
+    """
+
+    product = models.ForeignKey(
+        "products.Product", on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    date = models.DateField()
+
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "date"], name="product_sales_product_date_uniq"
+            )
+        ]
+        indexes = [models.Index(fields=["date"], name="product_sales_date_idx")]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.date}: {self.quantity}"
+
+
+class OrderStatusCount(models.Model):
+    """
+    Number of orders in a status, split across ``ORDER_STATUS_COUNT_SHARDS``
+    rows per status so concurrent orders rarely update the same row. A
+    shard may go negative, only the sum per status is meaningful. Maintained
+    by analytics.status_counts.
+    """
+
+    status = models.CharField(max_length=20, choices=OrderStatusChoices)
+    shard = models.PositiveSmallIntegerField()
+
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["status", "shard"], name="order_status_count_shard_uniq"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.status} #{self.shard}: {self.count}"
@@ -0,0 +1,159 @@
+"""
+Per-product, per-day sales counters (``ProductSales``) for the top-selling
+leaderboard.
+
+Placing an order adds its items to the counters of the day it was placed on,
+cancelling it takes them off again, so the counters only count orders that
+are not cancelled. A leaderboard over any window of days then reads one row
+per product and day instead of scanning every order item. The nightly rollup
+job recomputes the last ``SALES_ROLLUP_REFRESH_DAYS`` days to correct drift.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateField, F, Q, Sum, Value, When
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from analytics.models import ProductSales
+from orders.choices import OrderStatusChoices
+from orders.models import OrderItem
+from utils.filters import start_of_day
+
+REBUILD_BATCH_SIZE = 5000
+
+
+def record_sales(orders):
+    """Count the items of the newly placed ``orders``."""
+    _apply(_order_deltas(orders, {order.id: 1 for order in orders}))
+
+
+def record_sales_changes(changes):
+    """
+    Apply status changes to the counters. ``changes`` is an iterable of
+    ``(order, old_status)`` pairs where ``order.status`` holds the new status;
+    only orders moving into or out of cancelled change the counts.
+    """
+    signs = {}
+    orders = []
+    for order, old_status in changes:
+        was_cancelled = old_status == OrderStatusChoices.CANCELLED
+        is_cancelled = order.status == OrderStatusChoices.CANCELLED
+        if was_cancelled != is_cancelled:
+            signs[order.id] = -1 if is_cancelled else 1
+            orders.append(order)
+    _apply(_order_deltas(orders, signs))
+
+
+def top_selling_products(limit=10, days=None, category=None):
+    """
+    The ``limit`` products with the most units sold, over the last ``days``
+    days (today included) or all time, optionally within one category.
+    """
+    queryset = ProductSales.objects.all()
+    if days is not None:
+        queryset = queryset.filter(date__gt=timezone.localdate() - timedelta(days=days))
+    if category is not None:
+        queryset = queryset.filter(product__category_id=category)
+    return (
+        queryset.values("product_id", "product__name")
+        .annotate(total_quantity_sold=Sum("quantity"), total_revenue=Sum("revenue"))
+        .filter(total_quantity_sold__gt=0)
+        .order_by("-total_quantity_sold", "product_id")[:limit]
+    )
+
+
+def rebuild_product_sales(start, end):
+    """Recompute the counters of the days ``start`` to ``end`` (inclusive)."""
+    rows = (
+        OrderItem.objects.filter(
+            order__ordered_at__gte=start_of_day(start),
+            order__ordered_at__lt=start_of_day(end + timedelta(days=1)),
+        )
+        .exclude(order__status=OrderStatusChoices.CANCELLED)
+        .annotate(day=Trunc("order__ordered_at", "day", output_field=DateField()))
+        .values("product_id", "day")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("subtotal"))
+        .order_by()
+    )
+    with transaction.atomic():
+        ProductSales.objects.filter(date__range=(start, end)).delete()
+        ProductSales.objects.bulk_create(
+            (
+                ProductSales(
+                    product_id=row["product_id"],
+                    date=row["day"],
+                    quantity=row["quantity"],
+                    revenue=row["revenue"],
+                )
+                for row in rows
+            ),
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+
+
+def refresh_product_sales():
+    """Recompute the last ``SALES_ROLLUP_REFRESH_DAYS`` days up to yesterday."""
+    yesterday = timezone.localdate() - timedelta(days=1)
+    start = yesterday - timedelta(days=settings.SALES_ROLLUP_REFRESH_DAYS - 1)
+    rebuild_product_sales(start, yesterday)
+    return start, yesterday
+
+
+def _order_deltas(orders, signs):
+    """``{(product_id, day): [quantity, revenue]}`` for ``orders``, signed."""
+    days = {order.id: timezone.localtime(order.ordered_at).date() for order in orders}
+    deltas = defaultdict(lambda: [0, Decimal("0")])
+    if not days:
+        return deltas
+    items = OrderItem.objects.filter(order_id__in=days).values_list(
+        "order_id", "product_id", "quantity", "subtotal"
+    )
+    for order_id, product_id, quantity, subtotal in items:
+        delta = deltas[product_id, days[order_id]]
+        delta[0] += signs[order_id] * quantity
+        delta[1] += signs[order_id] * subtotal
+    return deltas
+
+
+def _apply(deltas):
+    """
+    Add ``deltas`` to the counters with one INSERT, one lock and one UPDATE.
+    Call it inside the transaction that changes the orders.
+    """
+    deltas = {key: delta for key, delta in sorted(deltas.items()) if any(delta)}
+    if not deltas:
+        return
+    # The first sale of a product on a day creates its row.
+    ProductSales.objects.bulk_create(
+        [ProductSales(product_id=product_id, date=day) for product_id, day in deltas],
+        ignore_conflicts=True,
+    )
+    rows = reduce(
+        or_, (Q(product_id=product_id, date=day) for product_id, day in deltas)
+    )
+    # An UPDATE locks rows in no particular order; lock them in a fixed one
+    # so concurrent orders sharing products do not wait on each other in a
+    # cycle.
+    list(
+        ProductSales.objects.select_for_update()
+        .filter(rows)
+        .order_by("product_id", "date")
+        .values_list("id", flat=True)
+    )
+    keys = [
+        (Q(product_id=product_id, date=day), quantity, revenue)
+        for (product_id, day), (quantity, revenue) in deltas.items()
+    ]
+    ProductSales.objects.filter(rows).update(
+        quantity=F("quantity")
+        + Case(*[When(key, then=Value(quantity)) for key, quantity, _ in keys]),
+        revenue=F("revenue")
+        + Case(*[When(key, then=Value(revenue)) for key, _, revenue in keys]),
+    )
@@ -0,0 +1,297 @@
+"""
+Pre-aggregated sales per day, week and month (``SalesRollup``).
+
+Rollups cover every day up to the "sales_rollups" watermark, which the nightly
+``sales_rollup_job`` advances to yesterday. Readers combine them with a live
+query over the few orders placed after the watermark (normally just today), so
+analytics never scan the whole order table. Status changes of orders that are
+already rolled up are applied to the rollups as deltas, and the job recomputes
+the last ``SALES_ROLLUP_REFRESH_DAYS`` days on every run to correct any drift.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Min, Sum
+from django.db.models.functions import Trunc, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from analytics.choices import RollupGrain
+from analytics.models import AggregationWatermark, SalesRollup
+from orders.models import Order, OrderItem
+from utils.filters import start_of_day
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "sales_rollups"
+REBUILD_CHUNK_DAYS = 31
+
+
+def period_start(day, grain):
+    if grain == RollupGrain.WEEK:
+        return day - timedelta(days=day.weekday())
+    if grain == RollupGrain.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def next_period_start(day, grain):
+    start = period_start(day, grain)
+    if grain == RollupGrain.WEEK:
+        return start + timedelta(days=7)
+    if grain == RollupGrain.MONTH:
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def get_watermark(name=WATERMARK):
+    return (
+        AggregationWatermark.objects.filter(name=name)
+        .values_list("last_date", flat=True)
+        .first()
+    )
+
+
+def set_watermark(day, name=WATERMARK):
+    AggregationWatermark.objects.update_or_create(
+        name=name, defaults={"last_date": day}
+    )
+
+
+def rebuild_rollups(start, end):
+    """
+    Recompute the rollups of every grain for the days ``start`` to ``end``
+    (inclusive) from the orders table. Weeks and months overlapping the range
+    are re-derived from the day rollups.
+    """
+    lower = start_of_day(start)
+    upper = start_of_day(end + timedelta(days=1))
+    totals = defaultdict(lambda: [0, Decimal("0"), 0])
+
+    orders = (
+        Order.objects.filter(ordered_at__gte=lower, ordered_at__lt=upper)
+        .annotate(day=Trunc("ordered_at", "day", output_field=DateField()))
+        .values("day", "status")
+        .annotate(orders=Count("id"), revenue=Sum("total_amount"))
+        .order_by()
+    )
+    for row in orders:
+        totals[row["day"], row["status"]][:2] = [row["orders"], row["revenue"]]
+
+    items = (
+        OrderItem.objects.filter(
+            order__ordered_at__gte=lower, order__ordered_at__lt=upper
+        )
+        .annotate(day=Trunc("order__ordered_at", "day", output_field=DateField()))
+        .values("day", "order__status")
+        .annotate(items=Sum("quantity"))
+        .order_by()
+    )
+    for row in items:
+        totals[row["day"], row["order__status"]][2] = row["items"]
+
+    with transaction.atomic():
+        SalesRollup.objects.filter(
+            grain=RollupGrain.DAY, period_start__range=(start, end)
+        ).delete()
+        SalesRollup.objects.bulk_create(
+            SalesRollup(
+                grain=RollupGrain.DAY,
+                period_start=day,
+                status=order_status,
+                total_orders=total_orders,
+                total_revenue=total_revenue,
+                total_items_sold=total_items_sold,
+            )
+            for (day, order_status), (
+                total_orders,
+                total_revenue,
+                total_items_sold,
+            ) in totals.items()
+        )
+
+        for grain, trunc in (
+            (RollupGrain.WEEK, TruncWeek),
+            (RollupGrain.MONTH, TruncMonth),
+        ):
+            first = period_start(start, grain)
+            stop = next_period_start(end, grain)
+            periods = (
+                SalesRollup.objects.filter(
+                    grain=RollupGrain.DAY,
+                    period_start__gte=first,
+                    period_start__lt=stop,
+                )
+                .annotate(period=trunc("period_start"))
+                .values("period", "status")
+                .annotate(
+                    orders=Sum("total_orders"),
+                    revenue=Sum("total_revenue"),
+                    items=Sum("total_items_sold"),
+                )
+                .order_by()
+            )
+            SalesRollup.objects.filter(
+                grain=grain, period_start__gte=first, period_start__lt=stop
+            ).delete()
+            SalesRollup.objects.bulk_create(
+                SalesRollup(
+                    grain=grain,
+                    period_start=row["period"],
+                    status=row["status"],
+                    total_orders=row["orders"],
+                    total_revenue=row["revenue"],
+                    total_items_sold=row["items"],
+                )
+                for row in periods
+            )
+
+
+def roll_up_closed_days():
+    """
+    Bring the rollups up to date with yesterday, recomputing every day after
+    the watermark (all history on the first run) plus the refresh window.
+    """
+    yesterday = timezone.localdate() - timedelta(days=1)
+    watermark = get_watermark()
+    if watermark is None:
+        first_order = Order.objects.aggregate(first=Min("ordered_at"))["first"]
+        if first_order is None:
+            set_watermark(yesterday)
+            return
+        start = timezone.localtime(first_order).date()
+    else:
+        refresh_days = settings.SALES_ROLLUP_REFRESH_DAYS
+        start = min(
+            watermark + timedelta(days=1), yesterday - timedelta(days=refresh_days - 1)
+        )
+
+    while start <= yesterday:
+        end = min(start + timedelta(days=REBUILD_CHUNK_DAYS - 1), yesterday)
+        rebuild_rollups(start, end)
+        if watermark is None or end > watermark:
+            set_watermark(end)
+            watermark = end
+        logger.info(f"Rolled up sales from {start} to {end}.")
+        start = end + timedelta(days=1)
+
+
+def record_status_changes(changes):
+    """
+    Move already rolled-up orders between status buckets. ``changes`` is an
+    iterable of ``(order, old_status)`` pairs where ``order.status`` holds the
+    new status. Orders placed after the watermark are skipped, they are still
+    counted live.
+    """
+    watermark = get_watermark()
+    if watermark is None:
+        return
+    changes = [
+        (order, old_status)
+        for order, old_status in changes
+        if old_status != order.status
+        and timezone.localtime(order.ordered_at).date() <= watermark
+    ]
+    if not changes:
+        return
+
+    items = dict(
+        OrderItem.objects.filter(order_id__in=[order.id for order, _ in changes])
+        .values("order_id")
+        .annotate(items=Sum("quantity"))
+        .values_list("order_id", "items")
+    )
+    deltas = defaultdict(lambda: [0, Decimal("0"), 0])
+    for order, old_status in changes:
+        day = timezone.localtime(order.ordered_at).date()
+        for grain in RollupGrain.values:
+            start = period_start(day, grain)
+            for order_status, sign in ((old_status, -1), (order.status, 1)):
+                delta = deltas[grain, start, order_status]
+                delta[0] += sign
+                delta[1] += sign * order.total_amount
+                delta[2] += sign * items.get(order.id, 0)
+
+    # Sorted so concurrent writers lock rollup rows in the same order.
+    with transaction.atomic():
+        for (grain, start, order_status), delta in sorted(deltas.items()):
+            _add_to_rollup(grain, start, order_status, *delta)
+
+
+def _add_to_rollup(grain, start, order_status, orders, revenue, items):
+    rollup = SalesRollup.objects.filter(
+        grain=grain, period_start=start, status=order_status
+    )
+    values = {
+        "total_orders": F("total_orders") + orders,
+        "total_revenue": F("total_revenue") + revenue,
+        "total_items_sold": F("total_items_sold") + items,
+    }
+    if rollup.update(**values):
+        return
+    try:
+        with transaction.atomic():
+            SalesRollup.objects.create(
+                grain=grain,
+                period_start=start,
+                status=order_status,
+                total_orders=orders,
+                total_revenue=revenue,
+                total_items_sold=items,
+            )
+    except IntegrityError:
+        rollup.update(**values)
+
+
+def sales_by_period(grain, order_status=None, start=None, end=None):
+    """
+    Return ``[(period_start, total_orders, total_revenue)]`` in period order,
+    optionally limited to one order status and to the days ``start``-``end``.
+    """
+    totals = defaultdict(lambda: [0, Decimal("0")])
+    watermark = get_watermark()
+
+    rollups = SalesRollup.objects.filter(grain=grain)
+    live = Order.objects.all()
+    if watermark is not None:
+        rollups = rollups.filter(period_start__lte=watermark)
+        live = live.filter(ordered_at__gte=start_of_day(watermark + timedelta(days=1)))
+    else:
+        rollups = rollups.none()
+    if order_status:
+        rollups = rollups.filter(status=order_status)
+        live = live.filter(status=order_status)
+    if start:
+        rollups = rollups.filter(period_start__gte=period_start(start, grain))
+        live = live.filter(ordered_at__gte=start_of_day(start))
+    if end:
+        rollups = rollups.filter(period_start__lte=end)
+        live = live.filter(ordered_at__lt=start_of_day(end + timedelta(days=1)))
+
+    for row in (
+        rollups.values("period_start")
+        .annotate(orders=Sum("total_orders"), revenue=Sum("total_revenue"))
+        .order_by()
+    ):
+        totals[row["period_start"]][0] += row["orders"]
+        totals[row["period_start"]][1] += row["revenue"]
+
+    for row in (
+        live.annotate(period=Trunc("ordered_at", grain, output_field=DateField()))
+        .values("period")
+        .annotate(orders=Count("id"), revenue=Sum("total_amount"))
+        .order_by()
+    ):
+        totals[row["period"]][0] += row["orders"]
+        totals[row["period"]][1] += row["revenue"]
+
+    # Rollup rows emptied by status changes are left in place, skip them.
+    return [
+        (period, orders, revenue)
+        for period, (orders, revenue) in sorted(totals.items())
+        if orders
+    ]
@@ -0,0 +1,153 @@
+"""
+Number of orders per status (``OrderStatusCount``), for the status
+distribution and the dashboard.
+
+Placing an order counts it under its status and changing its status moves it
+to the new one, in the transaction that changes the order. Each change goes
+to one random shard of the statuses involved, so concurrent checkouts rarely
+wait on the same row. Reading the counts sums a few rows per status instead
+of scanning every order. ``reconcile_status_counts`` recounts the orders to
+correct drift, such as orders changed outside these code paths.
+"""
+
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+
+from analytics.models import OrderStatusCount
+from orders.choices import OrderStatusChoices
+from orders.models import Order
+
+
+def count_new_orders(orders):
+    """Count the newly placed ``orders`` under their status."""
+    _apply(Counter(order.status for order in orders))
+
+
+def count_status_changes(changes):
+    """
+    Move orders between statuses. ``changes`` is an iterable of
+    ``(order, old_status)`` pairs where ``order.status`` holds the new status.
+    """
+    deltas = Counter()
+    for order, old_status in changes:
+        deltas[old_status] -= 1
+        deltas[order.status] += 1
+    _apply(deltas)
+
+
+def status_counts():
+    """``{status: count}`` for every status, with one query."""
+    counts = dict.fromkeys(OrderStatusChoices.values, 0)
+    counts.update(
+        OrderStatusCount.objects.values("status")
+        .annotate(total=Sum("count"))
+        .order_by()
+        .values_list("status", "total")
+    )
+    return counts
+
+
+@transaction.atomic
+def reconcile_status_counts():
+    """
+    Recount the orders per status and correct the counters, returning the
+    ``{status: correction}`` of the statuses that had drifted.
+    """
+    shards = settings.ORDER_STATUS_COUNT_SHARDS
+    OrderStatusCount.objects.bulk_create(
+        [
+            OrderStatusCount(status=order_status, shard=shard)
+            for order_status in OrderStatusChoices.values
+            for shard in range(shards)
+        ],
+        ignore_conflicts=True,
+    )
+    # Writers update the counters in the transaction that changes the order:
+    # once every row is locked, an order change is either committed and
+    # recounted below, or waits to update the counters after this one.
+    counted = Counter()
+    rows = (
+        OrderStatusCount.objects.select_for_update()
+        .order_by("status", "shard")
+        .values_list("status", "count")
+    )
+    for order_status, count in rows:
+        counted[order_status] += count
+    actual = Counter(
+        dict(
+            Order.objects.values("status")
+            .annotate(total=Count("id"))
+            .order_by()
+            .values_list("status", "total")
+        )
+    )
+    # Keep each total on shard 0 and clear the others.
+    OrderStatusCount.objects.update(
+        count=Case(
+            *[
+                When(status=order_status, shard=0, then=Value(actual[order_status]))
+                for order_status in actual
+            ],
+            default=Value(0),
+        )
+    )
+    return {
+        order_status: actual[order_status] - counted[order_status]
+        for order_status in counted.keys() | actual.keys()
+        if actual[order_status] != counted[order_status]
+    }
+
+
+def _apply(deltas):
+    """
+    Add ``deltas`` ({status: count}) to one random shard of each status.
+    Call it inside the transaction that changes the orders.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    shard = random.randrange(settings.ORDER_STATUS_COUNT_SHARDS)
+    rows = OrderStatusCount.objects.filter(status__in=deltas, shard=shard)
+    if len(deltas) == 1:
+        # A checkout: one row, nothing to lock in order.
+        ((order_status, delta),) = deltas.items()
+        if not rows.update(count=F("count") + delta):
+            _create(order_status, shard, delta)
+        return
+    # An UPDATE locks rows in no particular order; lock them in the order
+    # reconcile_status_counts uses first.
+    existing = set(
+        rows.select_for_update().order_by("status").values_list("status", flat=True)
+    )
+    for order_status, delta in deltas.items():
+        if order_status not in existing:
+            _create(order_status, shard, delta)
+    if not existing:
+        return
+    rows.filter(status__in=existing).update(
+        count=F("count")
+        + Case(
+            *[
+                When(status=order_status, then=Value(deltas[order_status]))
+                for order_status in existing
+            ],
+            default=Value(0),
+        )
+    )
+
+
+def _create(order_status, shard, delta):
+    """Create a shard missing until now, or add to it if a concurrent order did."""
+    try:
+        with transaction.atomic():
+            OrderStatusCount.objects.create(
+                status=order_status, shard=shard, count=delta
+            )
+    except IntegrityError:
+        OrderStatusCount.objects.filter(status=order_status, shard=shard).update(
+            count=F("count") + delta
+        )
@@ -1,2 +1,581 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, F, Sum
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from analytics.choices import RollupGrain
+from analytics.daily_sales import WATERMARK as DAILY_SALES_WATERMARK
+from analytics.daily_sales import backfill_daily_sales, catch_up_daily_sales
+from analytics.dashboard import invalidate_dashboard
+from analytics.models import (
+    AggregationWatermark,
+    DailySales,
+    ProductSales,
+    SalesRollup,
+)
+from analytics.product_sales import rebuild_product_sales
+from analytics.rollups import (
+    get_watermark,
+    period_start,
+    rebuild_rollups,
+    record_status_changes,
+    roll_up_closed_days,
+    sales_by_period,
+)
+from analytics.status_counts import reconcile_status_counts, status_counts
+from authentication.choices import UserType
+from authentication.models import UserProfile
+from orders.models import Order, OrderItem, OrderNumberSequence
+from products.models import Category, Product
+from products.stock import stock_total
+from utils.filters import start_of_day
+from utils.testing import QueryBudgetMixin, QueryPlanAssertionsMixin
+
+
+class AnalyticsIndexTests(QueryPlanAssertionsMixin, APITestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_revenue_trends_use_status_ordered_index(self):
+        self.assertSelectUsesIndex(
+            "orders_order",
+            "order_status_ordered_idx",
+            self.client.get,
+            "/api/analytics/revenue/",
+        )
+
+
+class AnalyticsQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Query budgets per endpoint; lists hold enough rows to expose an N+1."""
+
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        customer = UserProfile.objects.create_user("customer", password="secret")
+        category = Category.objects.create(name="Books")
+        products = [
+            Product.objects.create(
+                name=f"Book {number}",
+                description="A book.",
+                category=category,
+                price=10,
+                sku=f"BOOK-{number}",
+            )
+            for number in range(3)
+        ]
+        for order_status in ("pending", "shipped", "delivered"):
+            order = Order.objects.create(
+                user=customer,
+                status=order_status,
+                total_amount=30,
+                shipping_address="Somewhere",
+                payment_method="cod",
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(
+                    order=order, product=product, quantity=1, price=10, subtotal=10
+                )
+                for product in products
+            )
+        # The dashboard is cached, measure it uncached.
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def test_dashboard(self):
+        self.assertQueryBudget(4, self.client.get, "/api/analytics/dashboard/")
+
+    def test_dashboard_is_cached_until_invalidated(self):
+        self.client.get("/api/analytics/dashboard/")
+        self.assertQueryBudget(0, self.client.get, "/api/analytics/dashboard/")
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_dashboard()
+        self.assertQueryBudget(4, self.client.get, "/api/analytics/dashboard/")
+
+    def test_sales_analytics(self):
+        for period in ("daily", "weekly", "monthly"):
+            self.assertQueryBudget(
+                2, self.client.get, "/api/analytics/sales/", {"period": period}
+            )
+
+    def test_top_selling_products(self):
+        self.assertQueryBudget(
+            1, self.client.get, "/api/analytics/products/top-selling/"
+        )
+
+    def test_revenue_trends(self):
+        self.assertQueryBudget(2, self.client.get, "/api/analytics/revenue/")
+
+    def test_order_status_distribution(self):
+        self.assertQueryBudget(
+            1, self.client.get, "/api/analytics/orders/status-distribution/"
+        )
+
+
+class SeedDataTests(APITestCase):
+    def seed(self, **options):
+        options = {"users": 20, "products": 50, "orders": 300, "logs": 50, **options}
+        call_command("seed_data", days=10, force=True, stdout=StringIO(), **options)
+
+    def test_seeded_rows_are_consistent(self):
+        self.seed()
+        self.seed(seed=7)
+
+        self.assertEqual(Order.objects.count(), 600)
+        # Summed in Python, SQLite adds decimals up as floats.
+        totals = defaultdict(Decimal)
+        items = OrderItem.objects.values_list("order", "price", "quantity", "subtotal")
+        for order_id, price, quantity, subtotal in items:
+            self.assertEqual(subtotal, price * quantity)
+            totals[order_id] += subtotal
+        self.assertEqual(
+            dict(Order.objects.values_list("id", "total_amount")), dict(totals)
+        )
+
+        # Numbers continue the per-day sequence, the second run included.
+        for sequence in OrderNumberSequence.objects.all():
+            numbers = Order.objects.filter(
+                order_number__startswith=f"ORD-{sequence.date:%Y%m%d}-"
+            ).values_list("order_number", flat=True)
+            self.assertEqual(
+                sorted(int(number.rsplit("-", 1)[1]) for number in numbers),
+                list(range(1, sequence.last_value + 1)),
+            )
+        self.assertEqual(Product.objects.values("slug").distinct().count(), 100)
+        self.assertFalse(
+            Product.objects.alias(available=stock_total())
+            .exclude(stock_quantity=F("available"))
+            .exists()
+        )
+        self.assertEqual(
+            SalesRollup.objects.filter(grain=RollupGrain.DAY).aggregate(
+                orders=Sum("total_orders")
+            )["orders"],
+            600,
+        )
+        self.assertEqual(
+            sum(ProductSales.objects.values_list("quantity", flat=True)),
+            sum(
+                OrderItem.objects.exclude(order__status="cancelled").values_list(
+                    "quantity", flat=True
+                )
+            ),
+        )
+
+    def test_same_seed_gives_same_orders(self):
+        self.seed()
+        first = list(Order.objects.order_by("id").values_list("total_amount", "status"))
+        Order.objects.all().delete()
+        OrderNumberSequence.objects.all().delete()
+        self.seed()
+        second = list(
+            Order.objects.order_by("id").values_list("total_amount", "status")
+        )
+        self.assertEqual(first, second)
+
+
+class TopSellingProductsTests(APITestCase):
+    def setUp(self):
+        self.customer = UserProfile.objects.create_user("customer", password="secret")
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        books = Category.objects.create(name="Books")
+        games = Category.objects.create(name="Games")
+        self.book, self.game = (
+            Product.objects.create(
+                name=name,
+                description="A product.",
+                category=category,
+                price=10,
+                sku=name.upper(),
+                stock_quantity=100,
+            )
+            for name, category in (("Book", books), ("Game", games))
+        )
+
+    def place(self, product, quantity):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post(
+            "/api/orders/",
+            {
+                "shipping_address": "Somewhere",
+                "payment_method": "cod",
+                "items": [{"product": product.id, "quantity": quantity}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["data"]["id"]
+
+    def leaderboard(self, **params):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get("/api/analytics/products/top-selling/", params)
+        self.assertEqual(response.status_code, 200)
+        return [
+            (row["product__name"], row["total_quantity_sold"])
+            for row in response.json()["data"]
+        ]
+
+    def test_placing_and_cancelling_orders_update_the_counters(self):
+        self.place(self.book, 2)
+        self.place(self.game, 1)
+        cancelled = self.place(self.game, 3)
+        self.assertEqual(self.leaderboard(), [("Game", 4), ("Book", 2)])
+
+        self.client.force_authenticate(self.customer)
+        response = self.client.delete(f"/api/orders/{cancelled}/cancel/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.leaderboard(), [("Book", 2), ("Game", 1)])
+        self.assertEqual(self.leaderboard(limit=1), [("Book", 2)])
+        self.assertEqual(
+            self.leaderboard(category=self.game.category_id), [("Game", 1)]
+        )
+
+    def test_days_limit_the_window(self):
+        self.place(self.book, 2)
+        ProductSales.objects.create(
+            product=self.game,
+            date=timezone.localdate() - timedelta(days=10),
+            quantity=5,
+            revenue=50,
+        )
+        self.assertEqual(self.leaderboard(), [("Game", 5), ("Book", 2)])
+        self.assertEqual(self.leaderboard(days=7), [("Book", 2)])
+
+    def test_rebuild_matches_the_counters(self):
+        self.place(self.book, 2)
+        cancelled = self.place(self.game, 3)
+        self.client.force_authenticate(self.customer)
+        response = self.client.delete(f"/api/orders/{cancelled}/cancel/")
+        self.assertEqual(response.status_code, 204)
+        counters = self.leaderboard()
+
+        today = timezone.localdate()
+        ProductSales.objects.all().delete()
+        rebuild_product_sales(today, today)
+        self.assertEqual(self.leaderboard(), counters)
+
+    def test_rejects_invalid_parameters(self):
+        self.client.force_authenticate(self.admin)
+        for params in ({"limit": "0"}, {"days": "x"}, {"category": "-1"}):
+            response = self.client.get("/api/analytics/products/top-selling/", params)
+            self.assertEqual(response.status_code, 400)
+
+
+class OrderStatusCountTests(APITestCase):
+    def setUp(self):
+        self.customer = UserProfile.objects.create_user("customer", password="secret")
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        self.product = Product.objects.create(
+            name="Book",
+            description="A book.",
+            category=Category.objects.create(name="Books"),
+            price=10,
+            sku="BOOK",
+            stock_quantity=100,
+        )
+
+    def place(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post(
+            "/api/orders/",
+            {
+                "shipping_address": "Somewhere",
+                "payment_method": "cod",
+                "items": [{"product": self.product.id, "quantity": 1}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["data"]["id"]
+
+    def assertCountsMatchOrders(self):
+        actual = {
+            row["status"]: row["count"]
+            for row in Order.objects.values("status").annotate(count=Count("id"))
+        }
+        self.assertEqual(
+            {key: count for key, count in status_counts().items() if count}, actual
+        )
+
+    def test_order_changes_update_the_counts(self):
+        confirmed, cancelled, stale = self.place(), self.place(), self.place()
+        self.place()
+        self.client.force_authenticate(self.admin)
+        self.client.patch(f"/api/orders/{confirmed}/status/", {"status": "confirmed"})
+        self.client.force_authenticate(self.customer)
+        self.client.delete(f"/api/orders/{cancelled}/cancel/")
+        Order.objects.filter(id=stale).update(
+            ordered_at=timezone.now() - timedelta(days=2)
+        )
+        self.client.force_authenticate(self.admin)
+        self.client.post("/api/orders/admin/bulk-cancel/")
+        self.assertCountsMatchOrders()
+
+        response = self.client.get("/api/analytics/orders/status-distribution/")
+        self.assertEqual(
+            response.json()["data"],
+            [
+                {"status": "cancelled", "count": 2},
+                {"status": "confirmed", "count": 1},
+                {"status": "pending", "count": 1},
+            ],
+        )
+        cache.clear()
+        dashboard = self.client.get("/api/analytics/dashboard/").json()["data"]
+        self.assertEqual(
+            (dashboard["total_orders"], dashboard["pending_orders"]), (4, 1)
+        )
+
+    def test_reconcile_corrects_drift(self):
+        self.place()
+        delivered = self.place()
+        # Bypasses the counters.
+        Order.objects.filter(id=delivered).update(status="delivered")
+
+        self.assertEqual(reconcile_status_counts(), {"pending": -1, "delivered": 1})
+        self.assertCountsMatchOrders()
+        self.assertEqual(reconcile_status_counts(), {})
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.customer = UserProfile.objects.create_user("customer", password="secret")
+        self.product = Product.objects.create(
+            name="Book",
+            description="A book.",
+            category=Category.objects.create(name="Books"),
+            price=10,
+            sku="BOOK",
+        )
+        self.today = timezone.localdate()
+
+    def order(self, days_ago, order_status="pending", quantity=1):
+        order = Order.objects.create(
+            user=self.customer,
+            status=order_status,
+            total_amount=10 * quantity,
+            shipping_address="Somewhere",
+            payment_method="cod",
+        )
+        order.ordered_at = start_of_day(self.today - timedelta(days=days_ago))
+        Order.objects.filter(id=order.id).update(ordered_at=order.ordered_at)
+        OrderItem.objects.create(
+            order=order,
+            product=self.product,
+            quantity=quantity,
+            price=10,
+            subtotal=10 * quantity,
+        )
+        return order
+
+    def rollup(self, grain, day, order_status):
+        return (
+            SalesRollup.objects.filter(
+                grain=grain, period_start=period_start(day, grain), status=order_status
+            )
+            .values_list("total_orders", "total_items_sold")
+            .first()
+        )
+
+    def live_totals(self, grain):
+        """What sales_by_period returns, computed from the orders alone."""
+        totals = defaultdict(lambda: [0, 0])
+        for ordered_at, amount in Order.objects.values_list(
+            "ordered_at", "total_amount"
+        ):
+            day = period_start(timezone.localtime(ordered_at).date(), grain)
+            totals[day][0] += 1
+            totals[day][1] += amount
+        return [
+            (day, orders, revenue) for day, (orders, revenue) in sorted(totals.items())
+        ]
+
+    def assertMatchesOrders(self):
+        for grain in RollupGrain.values:
+            self.assertEqual(
+                [
+                    (day, orders, Decimal(revenue))
+                    for day, orders, revenue in sales_by_period(grain)
+                ],
+                self.live_totals(grain),
+            )
+
+    def test_rolls_up_every_grain(self):
+        self.order(40, "delivered", quantity=3)
+        self.order(10, quantity=2)
+        self.order(10, "delivered")
+        self.order(0)
+        roll_up_closed_days()
+
+        self.assertEqual(get_watermark(), self.today - timedelta(days=1))
+        day = self.today - timedelta(days=10)
+        self.assertEqual(self.rollup(RollupGrain.DAY, day, "pending"), (1, 2))
+        self.assertEqual(self.rollup(RollupGrain.DAY, day, "delivered"), (1, 1))
+        # Today is still counted live.
+        self.assertFalse(
+            SalesRollup.objects.filter(grain=RollupGrain.DAY, period_start=self.today)
+        )
+        self.assertMatchesOrders()
+
+    def test_later_runs_only_add_the_new_days(self):
+        self.order(10)
+        with mock.patch(
+            "analytics.rollups.timezone.localdate",
+            return_value=self.today - timedelta(days=4),
+        ):
+            roll_up_closed_days()
+        self.assertEqual(get_watermark(), self.today - timedelta(days=5))
+
+        self.order(3, quantity=4)
+        self.assertMatchesOrders()
+        roll_up_closed_days()
+        self.assertEqual(
+            self.rollup(RollupGrain.DAY, self.today - timedelta(days=3), "pending"),
+            (1, 4),
+        )
+        self.assertMatchesOrders()
+
+    def test_status_changes_move_rolled_up_orders(self):
+        cancelled = self.order(10, quantity=2)
+        self.order(10)
+        roll_up_closed_days()
+
+        Order.objects.filter(id=cancelled.id).update(status="cancelled")
+        cancelled.status = "cancelled"
+        record_status_changes([(cancelled, "pending")])
+
+        day = self.today - timedelta(days=10)
+        for grain in RollupGrain.values:
+            self.assertEqual(self.rollup(grain, day, "pending"), (1, 1))
+            self.assertEqual(self.rollup(grain, day, "cancelled"), (1, 2))
+        self.assertMatchesOrders()
+
+        # The deltas leave the rollups where a full rebuild puts them.
+        corrected = set(
+            SalesRollup.objects.values_list(
+                "grain", "period_start", "status", "total_orders", "total_items_sold"
+            ).filter(total_orders__gt=0)
+        )
+        rebuild_rollups(day, day)
+        self.assertEqual(
+            set(
+                SalesRollup.objects.values_list(
+                    "grain",
+                    "period_start",
+                    "status",
+                    "total_orders",
+                    "total_items_sold",
+                ).filter(total_orders__gt=0)
+            ),
+            corrected,
+        )
+
+    def test_changes_after_the_watermark_are_left_to_the_live_query(self):
+        roll_up_closed_days()
+        order = self.order(0)
+        order.status = "cancelled"
+        record_status_changes([(order, "pending")])
+        self.assertFalse(SalesRollup.objects.filter(status="cancelled").exists())
+
+
+class DailySalesTests(TestCase):
+    def setUp(self):
+        self.customer = UserProfile.objects.create_user("customer", password="secret")
+        self.today = timezone.localdate()
+
+    def day(self, days_ago):
+        return self.today - timedelta(days=days_ago)
+
+    def order(self, days_ago, order_status="delivered"):
+        order = Order.objects.create(
+            user=self.customer,
+            status=order_status,
+            total_amount=20,
+            shipping_address="Somewhere",
+            payment_method="cod",
+        )
+        Order.objects.filter(id=order.id).update(
+            ordered_at=start_of_day(self.day(days_ago))
+        )
+
+    def sales(self):
+        return dict(DailySales.objects.values_list("date", "total_orders"))
+
+    def test_backfill_writes_every_day_of_the_range(self):
+        self.order(5)
+        self.order(5)
+        self.order(5, "pending")
+        self.assertEqual(backfill_daily_sales(self.day(6), self.day(4)), 3)
+        self.assertEqual(self.sales(), {self.day(6): 0, self.day(5): 2, self.day(4): 0})
+        self.assertEqual(get_watermark(DAILY_SALES_WATERMARK), self.day(4))
+
+        # Recomputing a range overwrites it.
+        self.order(5)
+        backfill_daily_sales(self.day(5), self.day(5))
+        self.assertEqual(self.sales()[self.day(5)], 3)
+
+    def test_backfill_never_marks_today_done(self):
+        backfill_daily_sales(self.day(2), self.today)
+        self.assertEqual(get_watermark(DAILY_SALES_WATERMARK), self.day(1))
+
+    def test_backfill_past_a_gap_keeps_the_watermark(self):
+        backfill_daily_sales(self.day(10), self.day(8))
+        backfill_daily_sales(self.day(4), self.day(3))
+        self.assertEqual(get_watermark(DAILY_SALES_WATERMARK), self.day(8))
+
+        self.assertEqual(catch_up_daily_sales(), (self.day(7), self.day(1)))
+        self.assertEqual(
+            sorted(self.sales()), [self.day(days) for days in range(10, 0, -1)]
+        )
+        self.assertEqual(get_watermark(DAILY_SALES_WATERMARK), self.day(1))
+
+    def test_catch_up_starts_after_the_latest_row_or_yesterday(self):
+        self.assertEqual(catch_up_daily_sales(), (self.day(1), self.day(1)))
+        self.assertIsNone(catch_up_daily_sales())
+
+        DailySales.objects.all().delete()
+        AggregationWatermark.objects.all().delete()
+        DailySales.objects.create(date=self.day(4))
+        self.assertEqual(catch_up_daily_sales(), (self.day(3), self.day(1)))
+
+    def test_command(self):
+        self.order(3)
+        out = StringIO()
+        # Without --start the range begins with the first order.
+        call_command("backfill_daily_sales", end=str(self.day(1)), stdout=out)
+        self.assertEqual(self.sales(), {self.day(3): 1, self.day(2): 0, self.day(1): 0})
+        self.assertIn("Aggregated daily sales for 3 day(s)", out.getvalue())
+
+        call_command("backfill_daily_sales", stdout=out)
+        self.assertIn("already up to date", out.getvalue())
+
+        call_command(
+            "backfill_daily_sales",
+            start=str(self.day(6)),
+            end=str(self.day(5)),
+            stdout=out,
+        )
+        self.assertIn(self.day(6), self.sales())
+        for options in (
+            {"start": "yesterday"},
+            {"end": "2024-02-30"},
+            {"start": str(self.day(1)), "end": str(self.day(2))},
+        ):
+            with self.assertRaises(CommandError):
+                call_command("backfill_daily_sales", stdout=out, **options)
@@ -1,18 +1,21 @@
 from datetime import timedelta
 
-from django.db import models
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from analytics.choices import RollupGrain
+from analytics.dashboard import get_dashboard
+from analytics.product_sales import top_selling_products
+from analytics.rollups import sales_by_period
+from analytics.status_counts import status_counts
 from authentication.choices import UserType
-from authentication.models import UserProfile
-from orders.models import Order, OrderItem
-from products.models import Product
+from orders.choices import OrderStatusChoices
+from utils.filters import start_of_day
+
+MAX_TOP_SELLING = 100
 
 
 class DashboardOverviewAPIView(APIView):
@@ -24,42 +27,7 @@ class DashboardOverviewAPIView(APIView):
                 {"detail": "You do not have permission to perform this action."},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        today = timezone.now().date()
-
-        total_orders = Order.objects.count()
-        total_revenue = (
-            Order.objects.filter(status="delivered").aggregate(Sum("total_amount"))[
-                "total_amount__sum"
-            ]
-            or 0
-        )
-        pending_orders = Order.objects.filter(status="pending").count()
-        delivered_orders = Order.objects.filter(status="delivered").count()
-        total_customers = UserProfile.objects.filter(user_type="CUSTOMER").count()
-        active_products = Product.objects.filter(is_active=True).count()
-        low_stock_products = Product.objects.filter(
-            stock_quantity__lte=models.F("low_stock_threshold")
-        ).count()
-        today_revenue = (
-            Order.objects.filter(ordered_at__date=today, status="delivered").aggregate(
-                Sum("total_amount")
-            )["total_amount__sum"]
-            or 0
-        )
-        today_orders = Order.objects.filter(ordered_at__date=today).count()
-
-        data = {
-            "total_orders": total_orders,
-            "total_revenue": total_revenue,
-            "pending_orders": pending_orders,
-            "delivered_orders": delivered_orders,
-            "total_customers": total_customers,
-            "active_products": active_products,
-            "low_stock_products": low_stock_products,
-            "today_revenue": today_revenue,
-            "today_orders": today_orders,
-        }
-        return Response(data)
+        return Response(get_dashboard())
 
 
 class SalesAnalyticsAPIView(APIView):
@@ -72,34 +40,34 @@ class SalesAnalyticsAPIView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
         period = request.query_params.get("period", "daily")  # daily, weekly, monthly
-
-        if period == "daily":
-            sales_data = (
-                Order.objects.annotate(day=TruncDay("ordered_at"))
-                .values("day")
-                .annotate(total_orders=Count("id"), total_revenue=Sum("total_amount"))
-                .order_by("day")
-            )
-        elif period == "weekly":
-            sales_data = (
-                Order.objects.annotate(week=TruncWeek("ordered_at"))
-                .values("week")
-                .annotate(total_orders=Count("id"), total_revenue=Sum("total_amount"))
-                .order_by("week")
-            )
-        elif period == "monthly":
-            sales_data = (
-                Order.objects.annotate(month=TruncMonth("ordered_at"))
-                .values("month")
-                .annotate(total_orders=Count("id"), total_revenue=Sum("total_amount"))
-                .order_by("month")
-            )
-        else:
+        grains = {
+            "daily": RollupGrain.DAY,
+            "weekly": RollupGrain.WEEK,
+            "monthly": RollupGrain.MONTH,
+        }
+        if period not in grains:
             return Response(
                 {"detail": "Invalid period. Choose from 'daily', 'weekly', 'monthly'."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        order_status = request.query_params.get("status")
+        if order_status and order_status not in OrderStatusChoices.values:
+            return Response(
+                {"detail": "Invalid status."}, status=status.HTTP_400_BAD_REQUEST
+            )
 
+        # Closed days come from the rollups, only today's orders are scanned.
+        grain = grains[period]
+        sales_data = [
+            {
+                grain.value: start_of_day(period_start),
+                "total_orders": total_orders,
+                "total_revenue": total_revenue,
+            }
+            for period_start, total_orders, total_revenue in sales_by_period(
+                grain, order_status
+            )
+        ]
         return Response(sales_data)
 
 
@@ -107,17 +75,30 @@ class TopSellingProductsAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        """
+        The best sellers by units sold in orders that are not cancelled.
+        ``days`` limits them to the last N days, ``category`` to a category
+        and ``limit`` (at most 100) sets how many are listed.
+        """
         if not request.user.user_type == UserType.ADMIN.value:
             return Response(
                 {"detail": "You do not have permission to perform this action."},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        top_products = (
-            OrderItem.objects.values("product__name")
-            .annotate(total_quantity_sold=Sum("quantity"))
-            .order_by("-total_quantity_sold")[:10]
-        )
-        return Response(top_products)
+        params = {}
+        for param, default in (("limit", 10), ("days", None), ("category", None)):
+            value = request.query_params.get(param)
+            if value is None:
+                params[param] = default
+            elif value.isdigit() and int(value) > 0:
+                params[param] = int(value)
+            else:
+                return Response(
+                    {"detail": f"{param} must be a positive integer."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        params["limit"] = min(params["limit"], MAX_TOP_SELLING)
+        return Response(top_selling_products(**params))
 
 
 class RevenueTrendsAPIView(APIView):
@@ -133,15 +114,12 @@ class RevenueTrendsAPIView(APIView):
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=30)
 
-        revenue_trend = (
-            Order.objects.filter(
-                ordered_at__date__range=[start_date, end_date], status="delivered"
+        revenue_trend = [
+            {"day": start_of_day(day), "daily_revenue": daily_revenue}
+            for day, _, daily_revenue in sales_by_period(
+                RollupGrain.DAY, OrderStatusChoices.DELIVERED, start_date, end_date
             )
-            .annotate(day=TruncDay("ordered_at"))
-            .values("day")
-            .annotate(daily_revenue=Sum("total_amount"))
-            .order_by("day")
-        )
+        ]
         return Response(revenue_trend)
 
 
@@ -154,9 +132,9 @@ class OrderStatusDistributionAPIView(APIView):
                 {"detail": "You do not have permission to perform this action."},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        status_distribution = (
-            Order.objects.values("status")
-            .annotate(count=Count("status"))
-            .order_by("status")
-        )
+        status_distribution = [
+            {"status": order_status, "count": count}
+            for order_status, count in sorted(status_counts().items())
+            if count
+        ]
         return Response(status_distribution)
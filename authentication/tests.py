@@ -1,2 +1,53 @@
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from authentication.models import UserProfile
+from utils.testing import QueryBudgetMixin
+
+
+class AuthenticationQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user("customer", password="secret")
+
+    def login(self):
+        return self.assertQueryBudget(
+            3,
+            self.client.post,
+            "/api/auth/login/",
+            {"username": "customer", "password": "secret"},
+        )
+
+    def test_register(self):
+        response = self.assertQueryBudget(
+            3,
+            self.client.post,
+            "/api/auth/register/",
+            {
+                "username": "newcomer",
+                "email": "newcomer@example.com",
+                "password": "Secret123!x",
+                "password2": "Secret123!x",
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_login(self):
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_profile(self):
+        self.client.force_authenticate(self.user)
+        self.assertQueryBudget(0, self.client.get, "/api/auth/profile/")
+
+    def test_profile_update(self):
+        self.client.force_authenticate(self.user)
+        response = self.assertQueryBudget(
+            2, self.client.patch, "/api/auth/profile/", {"first_name": "Ada"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout(self):
+        refresh = self.login().json()["data"]["refresh"]
+        self.client.force_authenticate(self.user)
+        response = self.assertQueryBudget(
+            8, self.client.post, "/api/auth/logout/", {"refresh": refresh}
+        )
+        self.assertEqual(response.status_code, 205)
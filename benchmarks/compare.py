@@ -0,0 +1,94 @@
+"""
+Compare two ``benchmarks.suite`` result files.
+
+    python -m benchmarks.compare BASELINE.json RESULTS.json [--threshold 10]
+
+A benchmark regresses when its median time grows, or its throughput drops,
+by more than ``--threshold`` percent, or when it runs more queries than in
+the baseline. Exits with status 1 if anything regressed.
+"""
+
+import argparse
+import json
+import sys
+
+# (metric, unit, True when higher is better)
+METRICS = (
+    ("median_ms", "ms", False),
+    ("p95_ms", "ms", False),
+    ("throughput", "/s", True),
+)
+
+
+def compare(baseline, current, threshold):
+    """
+    Return ``(rows, regressions)``: one row per benchmark and metric found in
+    both files, and the descriptions of the regressions.
+    """
+    rows, regressions = [], []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name], current[name]
+        for metric, unit, higher_is_better in METRICS:
+            if metric not in before or metric not in after:
+                continue
+            old, new = before[metric], after[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            worse = -change if higher_is_better else change
+            regressed = worse > threshold
+            rows.append((name, metric, old, new, change, unit, regressed))
+            # The p95 is reported but too noisy to fail on.
+            if regressed and metric != "p95_ms":
+                regressions.append(f"{name}: {metric} {old} -> {new}{unit}")
+        if "queries" in before and after.get("queries", 0) > before["queries"]:
+            regressions.append(
+                f"{name}: queries {before['queries']} -> {after['queries']}"
+            )
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="Percent (default 10)."
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.results) as file:
+        current = json.load(file)
+
+    for key in ("dataset", "database", "repeat"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(
+                f"Warning: {key} differs ({baseline['meta'].get(key)} vs "
+                f"{current['meta'].get(key)}), the figures may not be comparable.",
+                file=sys.stderr,
+            )
+
+    rows, regressions = compare(baseline["results"], current["results"], args.threshold)
+    print(
+        f"{'benchmark':<40} {'metric':<10} {'baseline':>10} {'current':>10} "
+        f"{'change':>8}"
+    )
+    for name, metric, old, new, change, unit, regressed in rows:
+        print(
+            f"{name:<40} {metric:<10} {old:>10.2f} {new:>10.2f} "
+            f"{change:>+7.1f}%{'  <-' if regressed else ''}"
+        )
+    for name in sorted(baseline["results"].keys() ^ current["results"].keys()):
+        side = "baseline" if name in baseline["results"] else "current run"
+        print(f"{name}: only in the {side}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
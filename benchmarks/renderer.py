@@ -0,0 +1,178 @@
+"""
+Time FastJSONRenderer against the stdlib CustomJSONRenderer on large product
+and order lists. That both render the same bytes is checked by the products
+tests (FastJSONRendererTests).
+
+    python -m benchmarks.renderer [--products 5000] [--orders 1000] [--repeat 20]
+
+Payloads are built from in-memory model instances through the API
+serializers, so no database is needed.
+"""
+
+import argparse
+import os
+import statistics
+import timeit
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import django
+from django.conf import settings
+
+# The benchmark must not start the job scheduler.
+os.environ.setdefault("RUN_MAIN", "true")
+
+
+def setup():
+    if not settings.configured:
+        settings.configure(
+            INSTALLED_APPS=[
+                "django.contrib.contenttypes",
+                "django.contrib.auth",
+                "rest_framework",
+                "django_apscheduler",
+                "authentication",
+                "products",
+                "orders",
+                "activity_logs",
+                "analytics",
+            ],
+            AUTH_USER_MODEL="authentication.UserProfile",
+            DEBUG=True,
+            USE_TZ=True,
+            TIME_ZONE="UTC",
+        )
+    django.setup()
+
+
+def product_list(count):
+    from products.models import Category, Product
+    from products.serializers import ProductSerializer
+
+    categories = [Category(id=i, name=f"Category {i}") for i in range(1, 21)]
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    products = [
+        Product(
+            id=i,
+            name=f"Product {i} – “deluxe” édition",
+            slug=f"product-{i}",
+            description=f"Line one\nLine two with ünïcode and emoji 🚀 #{i}",
+            category=categories[i % len(categories)],
+            price=Decimal(i % 500) + Decimal("0.99"),
+            discount_price=Decimal(i % 400) + Decimal("0.49") if i % 3 == 0 else None,
+            stock_quantity=i % 120,
+            low_stock_threshold=10,
+            sku=f"SKU-{i:06d}",
+            image_url=f"https://cdn.example.com/products/{i}.jpg" if i % 2 else None,
+            is_active=i % 7 != 0,
+            created_at=start + timedelta(minutes=i, microseconds=i),
+            updated_at=start + timedelta(hours=i, microseconds=i * 7),
+        )
+        for i in range(1, count + 1)
+    ]
+    results = ProductSerializer(products, many=True).data
+    return {"count": count, "num_pages": 1, "current_page": 1, "results": results}
+
+
+def order_list(count, items_per_order=4):
+    from orders.models import Order, OrderItem
+    from orders.serializers import OrderSerializer
+    from products.models import Product
+
+    products = [
+        Product(id=i, name=f"Product {i}", price=Decimal(i) + Decimal("0.5"))
+        for i in range(1, 101)
+    ]
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    orders = []
+    for i in range(1, count + 1):
+        items = [
+            OrderItem(
+                id=i * items_per_order + n,
+                product=products[(i + n) % len(products)],
+                quantity=n + 1,
+                price=products[(i + n) % len(products)].price,
+                subtotal=products[(i + n) % len(products)].price * (n + 1),
+            )
+            for n in range(items_per_order)
+        ]
+        order = Order(
+            id=i,
+            order_number=f"ORD-20250101-{i:03d}",
+            user_id=i % 50 + 1,
+            status="delivered" if i % 2 else "pending",
+            total_amount=sum(item.subtotal for item in items),
+            shipping_address=f"{i} Main Street\nSpringfield",
+            payment_method="card",
+            payment_status="paid",
+            ordered_at=start + timedelta(minutes=i, microseconds=i),
+            updated_at=start + timedelta(minutes=i + 5),
+            delivered_at=start + timedelta(days=2) if i % 2 else None,
+        )
+        # Stands in for prefetch_related("items__product").
+        order._prefetched_objects_cache = {"items": items}
+        orders.append(order)
+    results = OrderSerializer(orders, many=True).data
+    return {"count": count, "next": None, "previous": None, "results": results}
+
+
+def sales_rows(count):
+    """Raw aggregate rows as the analytics views return them."""
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    return [
+        {
+            "day": start + timedelta(days=i),
+            "total_orders": i % 97,
+            "total_revenue": Decimal(i * 13 % 10000) + Decimal("0.25"),
+        }
+        for i in range(count)
+    ]
+
+
+def render(renderer, payload):
+    context = {"response": SimpleNamespace(status_code=200, status_text="OK")}
+    return renderer.render(payload, "application/json", context)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    setup()
+    from utils.custom_renderer import CustomJSONRenderer, FastJSONRenderer, orjson
+
+    if orjson is None:
+        print("orjson is not installed, FastJSONRenderer uses the stdlib encoder.")
+
+    payloads = [
+        (f"{args.products} products", product_list(args.products)),
+        (f"{args.orders} orders", order_list(args.orders)),
+        (f"{args.products} sales rows", sales_rows(args.products)),
+    ]
+    baseline, fast = CustomJSONRenderer(), FastJSONRenderer()
+
+    print(
+        f"{'payload':<20} {'bytes':>10} {'stdlib ms':>10} {'fast ms':>10} {'speedup':>8}"
+    )
+    for label, payload in payloads:
+        size = len(render(baseline, payload))
+        timings = {}
+        for name, renderer in (("stdlib", baseline), ("fast", fast)):
+            runs = timeit.repeat(
+                lambda renderer=renderer, payload=payload: render(renderer, payload),
+                number=1,
+                repeat=args.repeat,
+            )
+            timings[name] = statistics.median(runs) * 1000
+        print(
+            f"{label:<20} {size:>10} {timings['stdlib']:>10.2f} "
+            f"{timings['fast']:>10.2f} {timings['stdlib'] / timings['fast']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
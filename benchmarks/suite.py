@@ -0,0 +1,540 @@
+"""
+Benchmark the catalog, checkout and analytics paths on a synthetic dataset.
+
+    python -m benchmarks.suite [--orders 100000] [--skew 1.1] [--output FILE]
+    python -m benchmarks.compare BASELINE.json RESULTS.json
+
+A throwaway test database is created from the project settings (so PostgreSQL
+when it is configured) and filled by ``analytics.dataset``; ``--keepdb``
+keeps it, and its data, for the next run. Every benchmark reports the min,
+median, mean, p95 and standard deviation of its runs in milliseconds and the
+number of queries per run. Contention scenarios place orders from concurrent
+threads and report throughput, latency percentiles, rejected checkouts and
+whether stock was oversold. The results, with the commit, versions and
+dataset they were measured on, are written as JSON for ``benchmarks.compare``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import UTC, datetime
+
+# The benchmarks must not start the job scheduler.
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ.setdefault("RUN_MAIN", "true")
+
+GROUPS = ("serializers", "catalog", "checkout", "analytics", "contention")
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def summarize(seconds):
+    """Summary statistics of the run times ``seconds``, in milliseconds."""
+    runs = sorted(seconds)
+    return {
+        "runs": len(runs),
+        "min_ms": round(runs[0] * 1000, 3),
+        "median_ms": round(statistics.median(runs) * 1000, 3),
+        "mean_ms": round(statistics.fmean(runs) * 1000, 3),
+        "p95_ms": round(percentile(runs, 95) * 1000, 3),
+        "stdev_ms": round(statistics.pstdev(runs) * 1000, 3),
+    }
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of the sorted list ``ordered``."""
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Runner:
+    def __init__(self, repeat, warmup):
+        self.repeat = repeat
+        self.warmup = warmup
+        self.results = {}
+
+    def measure(self, name, func, setup=None):
+        """
+        Time ``func`` ``repeat`` times after ``warmup`` untimed runs. ``setup``,
+        if given, runs untimed before each call and its result is passed to
+        ``func``.
+        """
+        from utils.query_budget import QueryRecorder
+
+        for _ in range(self.warmup):
+            func(*([setup()] if setup else []))
+        seconds, queries = [], []
+        for _ in range(self.repeat):
+            args = [setup()] if setup else []
+            with QueryRecorder() as recorder:
+                start = time.perf_counter()
+                func(*args)
+                seconds.append(time.perf_counter() - start)
+            queries.append(recorder.count)
+        self.results[name] = {**summarize(seconds), "queries": max(queries)}
+        result = self.results[name]
+        print(
+            f"{name:<40} {result['median_ms']:>10.2f} ms  "
+            f"p95 {result['p95_ms']:>9.2f} ms  {result['queries']:>4} queries"
+        )
+
+
+def check(response, expected=200):
+    if response.status_code != expected:
+        raise BenchmarkError(
+            f"{response.request['REQUEST_METHOD']} {response.request['PATH_INFO']} "
+            f"returned {response.status_code}: {response.content[:200]!r}"
+        )
+    return response
+
+
+def run_serializers(runner, context):
+    from benchmarks.renderer import render
+    from orders.models import Order
+    from orders.serializers import OrderSerializer
+    from products.models import Product
+    from products.serializers import ProductSerializer
+    from utils.custom_renderer import CustomJSONRenderer, FastJSONRenderer
+
+    products = list(Product.objects.order_by("id")[:1000])
+    orders = list(
+        Order.objects.prefetch_related("items__product").order_by("-id")[:200]
+    )
+    runner.measure(
+        "serializers.product_list_1000",
+        lambda: ProductSerializer(products, many=True).data,
+    )
+    runner.measure(
+        "serializers.order_list_200",
+        lambda: OrderSerializer(orders, many=True).data,
+    )
+    request = context["customer_request"]
+    payload = {
+        "shipping_address": "1 Market Road",
+        "payment_method": "card",
+        "items": [
+            {"product": product_id, "quantity": 1} for product_id in context["hot"][:5]
+        ],
+    }
+    runner.measure(
+        "serializers.order_validate_5_items",
+        lambda: OrderSerializer(data=payload, context={"request": request}).is_valid(
+            raise_exception=True
+        ),
+    )
+
+    product_payload = {"results": ProductSerializer(products, many=True).data}
+    order_payload = {"results": OrderSerializer(orders, many=True).data}
+    for label, renderer in (
+        ("stdlib", CustomJSONRenderer()),
+        ("fast", FastJSONRenderer()),
+    ):
+        runner.measure(
+            f"renderer.{label}.product_list_1000",
+            lambda renderer=renderer: render(renderer, product_payload),
+        )
+        runner.measure(
+            f"renderer.{label}.order_list_200",
+            lambda renderer=renderer: render(renderer, order_payload),
+        )
+
+
+def run_catalog(runner, context):
+    from products.cache import product_cache
+
+    client = context["admin_client"]
+    category = context["hot_category"]
+    product_id = context["hot"][0]
+    endpoints = {
+        "catalog.product_list": "/api/products/",
+        "catalog.product_list_page_50": "/api/products/?page=50",
+        "catalog.product_list_cursor": "/api/products/?pagination=cursor",
+        "catalog.product_list_category": f"/api/products/?category={category}",
+        "catalog.product_search": "/api/products/search/?q=product",
+        "catalog.categories": "/api/products/categories/",
+        "catalog.low_stock": "/api/products/low-stock/",
+        "catalog.product_detail": f"/api/products/{product_id}/",
+    }
+    for name, url in endpoints.items():
+        runner.measure(name, lambda url=url: check(client.get(url)))
+    runner.measure(
+        "catalog.product_detail_uncached",
+        lambda _: check(client.get(f"/api/products/{product_id}/")),
+        setup=lambda: product_cache.invalidate([product_id]),
+    )
+
+
+def run_checkout(runner, context):
+    from orders.models import Order
+
+    client = context["customer_client"]
+    hot = context["hot"]
+    rng = random.Random(0)
+
+    def place_order():
+        items = [
+            {"product": product_id, "quantity": 1}
+            for product_id in rng.sample(hot[:50], 3)
+        ]
+        return check(
+            client.post(
+                "/api/orders/",
+                {
+                    "shipping_address": "1 Market Road",
+                    "payment_method": "card",
+                    "items": items,
+                },
+                format="json",
+            ),
+            201,
+        )
+
+    def placed_order_id():
+        return Order.objects.get(order_number=place_order().data["order_number"]).id
+
+    runner.measure("checkout.place_order_3_items", place_order)
+    runner.measure(
+        "checkout.cancel_order",
+        lambda order_id: check(client.delete(f"/api/orders/{order_id}/cancel/"), 204),
+        setup=placed_order_id,
+    )
+    runner.measure("checkout.order_list", lambda: check(client.get("/api/orders/")))
+
+
+def run_analytics(runner, context):
+    from analytics.dashboard import invalidate_dashboard
+
+    client = context["admin_client"]
+    runner.measure(
+        "analytics.dashboard_uncached",
+        lambda _: check(client.get("/api/analytics/dashboard/")),
+        setup=invalidate_dashboard,
+    )
+    endpoints = {
+        "analytics.dashboard_cached": "/api/analytics/dashboard/",
+        "analytics.sales_daily": "/api/analytics/sales/",
+        "analytics.sales_monthly": "/api/analytics/sales/?period=monthly",
+        "analytics.top_selling": "/api/analytics/products/top-selling/",
+        "analytics.revenue": "/api/analytics/revenue/",
+        "analytics.status_distribution": "/api/analytics/orders/status-distribution/",
+    }
+    for name, url in endpoints.items():
+        runner.measure(name, lambda url=url: check(client.get(url)))
+
+
+def run_contention(runner, context, threads, checkouts):
+    """
+    ``threads`` customers place ``checkouts`` one-unit orders each, at once.
+    "hot_product" has them all buy one product stocked for half the demand,
+    so it also exercises the sold-out path; "spread" spreads them over the
+    best sellers, all amply stocked.
+    """
+    from django.db import connection
+
+    from orders.models import OrderItem
+    from products.stock import available_stock, set_stock
+
+    if connection.vendor == "sqlite":
+        # Concurrent writers fail with "database table is locked" at once.
+        print("SQLite does not allow concurrent writers, running one thread.")
+        threads = 1
+    hot = context["hot"]
+    demand = threads * checkouts
+    scenarios = {
+        "contention.hot_product": (
+            {hot[0]: demand // 2},
+            lambda rng: hot[0],
+        ),
+        "contention.spread": (
+            {product_id: demand for product_id in hot[:50]},
+            lambda rng: rng.choice(hot[:50]),
+        ),
+    }
+
+    for name, (stock, pick) in scenarios.items():
+        set_stock(stock)
+        sold_before = _units_sold(OrderItem, stock)
+        barrier = threading.Barrier(threads)
+        latencies, outcomes = [], {"placed": 0, "rejected": 0, "errors": 0}
+        lock = threading.Lock()
+
+        workers = [
+            threading.Thread(
+                target=_place_orders,
+                args=(
+                    customer,
+                    seed,
+                    checkouts,
+                    pick,
+                    barrier,
+                    lock,
+                    latencies,
+                    outcomes,
+                ),
+            )
+            for seed, customer in enumerate(context["customers"][:threads])
+        ]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        remaining = available_stock(list(stock))
+        sold = _units_sold(OrderItem, stock) - sold_before
+        oversold = sold > sum(stock.values()) or any(
+            quantity < 0 for quantity in remaining.values()
+        )
+        result = {
+            **summarize(latencies),
+            **outcomes,
+            "p99_ms": round(percentile(sorted(latencies), 99) * 1000, 3),
+            "threads": threads,
+            "throughput": round(outcomes["placed"] / elapsed, 2),
+            "consistent": sold + sum(remaining.values()) == sum(stock.values()),
+            "oversold": oversold,
+        }
+        runner.results[name] = result
+        print(
+            f"{name:<40} {result['throughput']:>10.2f} orders/s  "
+            f"p99 {result['p99_ms']:>8.2f} ms  "
+            f"{result['rejected']} rejected, {result['errors']} errors"
+            f"{', OVERSOLD' if oversold else ''}"
+        )
+
+
+def _place_orders(customer, seed, checkouts, pick, barrier, lock, latencies, outcomes):
+    """
+    One contention worker: once every worker is ready, place ``checkouts``
+    orders of the product ``pick(rng)`` returns, recording their latencies
+    and outcomes under ``lock``.
+    """
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    rng = random.Random(seed)
+    client = APIClient()
+    client.force_authenticate(customer)
+    try:
+        barrier.wait()
+        for _ in range(checkouts):
+            start = time.perf_counter()
+            try:
+                response = client.post(
+                    "/api/orders/",
+                    {
+                        "shipping_address": "1 Market Road",
+                        "payment_method": "card",
+                        "items": [{"product": pick(rng), "quantity": 1}],
+                    },
+                    format="json",
+                )
+                outcome = {201: "placed", 400: "rejected"}.get(
+                    response.status_code, "errors"
+                )
+            except Exception:
+                outcome = "errors"
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                outcomes[outcome] += 1
+    finally:
+        connection.close()
+
+
+def _units_sold(model, stock):
+    from django.db.models import Sum
+
+    return (
+        model.objects.filter(product_id__in=list(stock)).aggregate(
+            units=Sum("quantity")
+        )["units"]
+        or 0
+    )
+
+
+def prepare(spec, keepdb):
+    """Fill the database unless a kept one already holds a dataset."""
+    from analytics import dataset
+    from products.models import Product
+
+    if keepdb and Product.objects.exists():
+        print("Reusing the kept database.")
+        return None
+    start = time.perf_counter()
+    counts = dataset.generate(spec, progress=lambda message: print(f"  {message}"))
+    return {"rows": counts, "seconds": round(time.perf_counter() - start, 1)}
+
+
+def make_context():
+    from django.db.models import Count
+    from rest_framework.test import APIClient, APIRequestFactory
+
+    from authentication.choices import UserType
+    from authentication.models import UserProfile
+    from orders.models import OrderItem
+    from products.models import Product
+    from products.stock import set_stock
+
+    admin, _ = UserProfile.objects.get_or_create(
+        username="benchmark-admin",
+        defaults={"user_type": UserType.ADMIN.value, "phone": "", "pincode": ""},
+    )
+    customers = list(
+        UserProfile.objects.filter(user_type=UserType.CUSTOMER.value).order_by("id")[
+            :64
+        ]
+    )
+    if not customers:
+        raise BenchmarkError("The dataset has no customers.")
+    hot = list(
+        OrderItem.objects.values("product")
+        .annotate(lines=Count("id"))
+        .order_by("-lines", "product")
+        .values_list("product", flat=True)[:100]
+    ) or list(Product.objects.order_by("id").values_list("id", flat=True)[:100])
+    # Stock for the checkout benchmarks, whatever the dataset drew.
+    Product.objects.filter(id__in=hot).update(is_active=True)
+    set_stock({product_id: 10**6 for product_id in hot})
+
+    admin_client = APIClient()
+    admin_client.force_authenticate(admin)
+    customer_client = APIClient()
+    customer_client.force_authenticate(customers[0])
+    customer_request = APIRequestFactory().post("/api/orders/")
+    customer_request.user = customers[0]
+    return {
+        "admin_client": admin_client,
+        "customer_client": customer_client,
+        "customer_request": customer_request,
+        "customers": customers,
+        "hot": hot,
+        "hot_category": Product.objects.get(id=hot[0]).category_id,
+    }
+
+
+def metadata(args, spec):
+    import django
+    from django.db import connection
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    with connection.cursor():
+        database_version = getattr(connection, "pg_version", None) or getattr(
+            connection.Database, "sqlite_version", None
+        )
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": {"vendor": connection.vendor, "version": database_version},
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "dataset": spec.as_dict(),
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "groups": args.groups,
+    }
+
+
+def parse_args(argv):
+    from analytics.dataset import DatasetSpec
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    DatasetSpec.add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--checkouts", type=int, default=20, help="Per thread.")
+    parser.add_argument(
+        "--groups", nargs="+", choices=GROUPS, default=list(GROUPS), metavar="GROUP"
+    )
+    parser.add_argument("--keepdb", action="store_true")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+    return args, DatasetSpec.from_options(vars(args))
+
+
+def main(argv=None):
+    import django
+
+    django.setup()
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    from activity_logs.writer import writer
+
+    args, spec = parse_args(argv)
+    setup_test_environment(debug=False)
+    databases = setup_databases(verbosity=1, interactive=False, keepdb=args.keepdb)
+    try:
+        print("Preparing the dataset...")
+        generated = prepare(spec, args.keepdb)
+        context = make_context()
+        runner = Runner(args.repeat, args.warmup)
+        runs = {
+            "serializers": run_serializers,
+            "catalog": run_catalog,
+            "checkout": run_checkout,
+            "analytics": run_analytics,
+            "contention": lambda runner, context: run_contention(
+                runner, context, args.threads, args.checkouts
+            ),
+        }
+        for group in GROUPS:
+            if group in args.groups:
+                print(f"Running the {group} benchmarks...")
+                runs[group](runner, context)
+        results = {
+            "meta": {**metadata(args, spec), "generated": generated},
+            "results": runner.results,
+        }
+    finally:
+        writer.shutdown()
+        teardown_databases(databases, verbosity=1, keepdb=args.keepdb)
+        teardown_test_environment()
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f"Results written to {args.output}.")
+    broken = [
+        name
+        for name, result in runner.results.items()
+        if result.get("oversold") or result.get("consistent") is False
+    ]
+    for name in broken:
+        print(f"{name}: stock and orders do not add up.", file=sys.stderr)
+    return 1 if broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
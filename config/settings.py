@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "rest_framework_simplejwt.token_blacklist",
@@ -55,11 +56,70 @@ INSTALLED_APPS = [
     "analytics",
 ]
 
+# Order number allocation (see orders/numbering.py). Use
+# "orders.numbering.BlockAllocator" to reserve ORDER_NUMBER_BLOCK_SIZE numbers
+# per round trip when many workers place orders concurrently.
+ORDER_NUMBER_ALLOCATOR = "orders.numbering.SequenceTableAllocator"
+ORDER_NUMBER_BLOCK_SIZE = 20
+
+# Activity logs are buffered in memory and written in batches by a background
+# thread (see activity_logs/writer.py). OVERFLOW is "sync", "block" or "drop".
+ACTIVITY_LOG_WRITER = {
+    "ASYNC": os.getenv("ACTIVITY_LOG_ASYNC", "true").lower() == "true",
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 1.0,  # Seconds
+    "MAX_QUEUE_SIZE": 10000,
+    "OVERFLOW": "sync",
+    "BLOCK_TIMEOUT": 0.5,  # Seconds
+}
+
+# Monthly activity log partitions (PostgreSQL) and their retention, managed by
+# the activity_log_partitions command (see activity_logs/partitions.py).
+ACTIVITY_LOG_PARTITIONS = {
+    "MONTHS_AHEAD": 3,
+    "RETENTION_MONTHS": 12,
+    "ARCHIVE_DIR": BASE_DIR / "archive" / "activity_logs",
+}
+
+# Days before the sales rollup watermark recomputed on every rollup run
+SALES_ROLLUP_REFRESH_DAYS = 7
+
+# Seconds the admin dashboard figures are cached for
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", 30))
+
+# Text search configuration used for product search vectors (PostgreSQL)
+PRODUCT_SEARCH_CONFIG = "english"
+
+# Product detail cache (see products/cache.py): entries kept per process and
+# seconds a payload is served from a cache, locally or shared
+PRODUCT_CACHE = {
+    "LOCAL_SIZE": 1024,
+    "TIMEOUT": 300,
+}
+
+# Rows each product's stock is split across, so concurrent checkouts of one
+# product rarely wait on the same row, and seconds a checkout holds its stock
+# before an unconfirmed reservation is released (see products/stock.py)
+STOCK_SHARDS = int(os.getenv("STOCK_SHARDS", 8))
+STOCK_HOLD_TTL = 900
+
+# Rows each order status count is split across (see analytics/status_counts.py)
+ORDER_STATUS_COUNT_SHARDS = int(os.getenv("ORDER_STATUS_COUNT_SHARDS", 8))
+
+# Per-request query count, database time and query shapes repeated at least
+# DUPLICATE_THRESHOLD times, reported as X-Query-* headers and log fields
+# (see utils/query_budget.py). ENABLED None follows DEBUG.
+QUERY_BUDGET = {
+    "ENABLED": None,
+    "DUPLICATE_THRESHOLD": 3,
+}
+
 # APScheduler settings
 APSCHEDULER_DATETIME_FORMAT = "N j, Y, f:s a"  # Default
 APSCHEDULER_RUN_NOW_TIMEOUT = 25  # Seconds
 
 MIDDLEWARE = [
+    "utils.query_budget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -103,6 +163,23 @@ DATABASES = {
     }
 }
 
+# Set REDIS_URL so every process shares one cache: product and dashboard cache
+# invalidations only reach other processes through it. Without it each process
+# has its own cache and serves stale entries until they time out.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,7 +227,7 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_RENDERER_CLASSES": [
-        "utils.custom_renderer.CustomJSONRenderer",
+        "utils.custom_renderer.FastJSONRenderer",
         "rest_framework.renderers.BrowsableAPIRenderer",
     ],
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
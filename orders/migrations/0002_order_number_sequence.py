@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:14
+
+from datetime import datetime
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    # Continue numbering after the highest number already issued on each day,
+    # so orders placed right after the deploy do not collide with old ones.
+    Order = apps.get_model("orders", "Order")
+    OrderNumberSequence = apps.get_model("orders", "OrderNumberSequence")
+
+    last_values = {}
+    for order_number in Order.objects.values_list("order_number", flat=True).iterator():
+        try:
+            _, day, number = order_number.split("-")
+            day = datetime.strptime(day, "%Y%m%d").date()
+            number = int(number)
+        except ValueError:
+            continue
+        last_values[day] = max(last_values.get(day, 0), number)
+
+    OrderNumberSequence.objects.bulk_create(
+        OrderNumberSequence(date=day, last_value=last_value)
+        for day, last_value in last_values.items()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderNumberSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(unique=True)),
+                ("last_value", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
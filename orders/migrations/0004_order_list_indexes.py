@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0003_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["-ordered_at", "-id"], name="order_ordered_id_idx"
+            ),
+        ),
+    ]
@@ -1,7 +1,5 @@
-
 from django.contrib.auth import get_user_model
 from django.db import models
-from django.utils import timezone
 
 from orders.choices import OrderStatusChoices, PaymentStatusChoices
 
@@ -10,7 +8,10 @@ User = get_user_model()
 
 class Order(models.Model):
     order_number = models.CharField(max_length=50, unique=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
+    # Indexed through Meta.indexes, where it leads the (user, ordered_at, id) index.
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="orders", db_index=False
+    )
 
     status = models.CharField(
         max_length=20, choices=OrderStatusChoices, default="pending"
@@ -29,17 +30,30 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-ordered_at", "-id"], name="order_ordered_id_idx"),
+            models.Index(
+                fields=["user", "-ordered_at", "-id"], name="order_user_ordered_id_idx"
+            ),
+            models.Index(
+                fields=["status", "ordered_at"], name="order_status_ordered_idx"
+            ),
+            models.Index(
+                fields=["ordered_at"],
+                condition=models.Q(status="pending"),
+                name="order_pending_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Order #{self.order_number}"
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            today = timezone.now().strftime("%Y%m%d")
-            # Get the count of orders for today
-            today_orders_count = (
-                Order.objects.filter(ordered_at__date=timezone.now().date()).count() + 1
-            )
-            self.order_number = f"ORD-{today}-{today_orders_count:03d}"
+            from orders.numbering import allocate_order_number
+
+            self.order_number = allocate_order_number()
         super().save(*args, **kwargs)
 
 
@@ -53,3 +67,13 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
+
+
+class OrderNumberSequence(models.Model):
+    """Last order number handed out for a given day (see orders.numbering)."""
+
+    date = models.DateField(unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.last_value}"
@@ -0,0 +1,87 @@
+import threading
+from functools import cache
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from orders.models import OrderNumberSequence
+
+
+class SequenceTableAllocator:
+    """
+    Hands out per-day order numbers from the ``OrderNumberSequence`` table.
+
+    Each reservation is a single-row ``UPDATE ... SET last_value = last_value + n``
+    so it costs the same no matter how many orders were placed that day, and the
+    row lock serialises concurrent workers instead of letting them collide on
+    ``Order.order_number``.
+    """
+
+    def reserve(self, day, count=1):
+        """Reserve ``count`` consecutive numbers for ``day``; returns the first."""
+        with transaction.atomic():
+            updated = OrderNumberSequence.objects.filter(date=day).update(
+                last_value=F("last_value") + count
+            )
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        OrderNumberSequence.objects.create(date=day, last_value=count)
+                    return 1
+                except IntegrityError:
+                    # Another worker created the row first.
+                    OrderNumberSequence.objects.filter(date=day).update(
+                        last_value=F("last_value") + count
+                    )
+            last_value = OrderNumberSequence.objects.values_list(
+                "last_value", flat=True
+            ).get(date=day)
+        return last_value - count + 1
+
+    def allocate(self, day):
+        return self.reserve(day)
+
+
+class BlockAllocator(SequenceTableAllocator):
+    """
+    Reserves numbers in blocks of ``block_size`` and serves them from memory, so
+    only one in ``block_size`` orders touches the sequence row. Numbers are
+    unique but not gapless: unused numbers are lost when the process exits.
+    """
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size or settings.ORDER_NUMBER_BLOCK_SIZE
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = 0
+        self._end = 0
+
+    def allocate(self, day):
+        if connection.in_atomic_block:
+            # A block reserved here would be rolled back together with the
+            # caller's transaction while staying cached in memory, so other
+            # workers could be handed the same numbers. Take a single one.
+            return self.reserve(day)
+
+        with self._lock:
+            if self._day != day or self._next > self._end:
+                self._next = self.reserve(day, self.block_size)
+                self._end = self._next + self.block_size - 1
+                self._day = day
+            number = self._next
+            self._next += 1
+        return number
+
+
+@cache
+def get_order_number_allocator():
+    return import_string(settings.ORDER_NUMBER_ALLOCATOR)()
+
+
+def allocate_order_number():
+    now = timezone.now()
+    number = get_order_number_allocator().allocate(now.date())
+    return f"ORD-{now:%Y%m%d}-{number:03d}"
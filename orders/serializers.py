@@ -1,15 +1,51 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
+from analytics.product_sales import record_sales
+from analytics.status_counts import count_new_orders
+from orders.choices import OrderStatusChoices
 from orders.models import Order, OrderItem
+from orders.numbering import allocate_order_number
+from orders.utils import STALE_PENDING_HOURS
+from products.models import Product
+from products.stock import (
+    InsufficientStock,
+    ReservationExpired,
+    confirm_reservation,
+    release_reservation,
+    reserve_stock,
+)
+
+MAX_BULK_STATUS_ORDERS = 5000
+
+
+class ProductReferenceField(serializers.PrimaryKeyRelatedField):
+    """
+    A product id that is not looked up on its own: ``OrderSerializer``
+    fetches the products of all the items with one query.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    product = ProductReferenceField(queryset=Product.objects.all())
     product_name = serializers.ReadOnlyField(source="product.name")
 
     class Meta:
         model = OrderItem
         fields = ["id", "product", "product_name", "quantity", "price", "subtotal"]
         read_only_fields = ["price", "subtotal"]
+        extra_kwargs = {"quantity": {"min_value": 1}}
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -42,27 +78,70 @@ class OrderSerializer(serializers.ModelSerializer):
             "delivered_at",
         ]
 
+    def validate_items(self, items):
+        products = Product.objects.in_bulk({item["product"] for item in items})
+        message = ProductReferenceField.default_error_messages["does_not_exist"]
+        errors = {}
+        for index, item in enumerate(items):
+            product = products.get(item["product"])
+            if product is None:
+                errors[index] = {"product": [message.format(pk_value=item["product"])]}
+            else:
+                item["product"] = product
+        if errors:
+            raise serializers.ValidationError(errors)
+        return items
+
     def create(self, validated_data):
         items_data = validated_data.pop("items")
+
+        # The same product may appear on several lines; stock is taken per product.
+        quantities = defaultdict(int)
+        for item_data in items_data:
+            quantities[item_data["product"].id] += item_data["quantity"]
+
+        # Allocated outside the transaction so the per-day sequence row is not
+        # locked for the lifetime of the order; a failed order leaves a gap.
+        validated_data["order_number"] = allocate_order_number()
+
+        # Stock is reserved in a transaction of its own, so the stock rows are
+        # not locked for as long as the order takes to write.
+        try:
+            hold = reserve_stock(quantities)
+        except InsufficientStock as exc:
+            raise serializers.ValidationError({"items": str(exc)})
+
+        try:
+            with transaction.atomic():
+                order = self._create_order(validated_data, items_data)
+                confirm_reservation(hold, quantities)
+                # Last, so the counter rows are locked only briefly.
+                record_sales([order])
+                count_new_orders([order])
+        except Exception as exc:
+            # Give the stock back now rather than when the hold expires.
+            release_reservation(hold)
+            if isinstance(exc, ReservationExpired):
+                raise serializers.ValidationError({"items": str(exc)})
+            raise
+        return order
+
+    def _create_order(self, validated_data, items_data):
         total_amount = 0
         order_items = []
-
         for item_data in items_data:
             product = item_data["product"]
             quantity = item_data["quantity"]
-
-            if product.stock_quantity < quantity:
-                raise serializers.ValidationError(
-                    f"Not enough stock for product {product.name}. Available: {product.stock_quantity}"
-                )
-
             price = product.price
             subtotal = price * quantity
             total_amount += subtotal
 
             order_items.append(
                 OrderItem(
-                    product=product, quantity=quantity, price=price, subtotal=subtotal
+                    product=product,
+                    quantity=quantity,
+                    price=price,
+                    subtotal=subtotal,
                 )
             )
 
@@ -72,9 +151,32 @@ class OrderSerializer(serializers.ModelSerializer):
 
         for order_item in order_items:
             order_item.order = order
-            order_item.save()
-            # Decrease stock quantity
-            order_item.product.stock_quantity -= order_item.quantity
-            order_item.product.save()
-
+        OrderItem.objects.bulk_create(order_items)
+        # The response lists the items with their product names.
+        prefetch_related_objects([order], "items__product")
         return order
+
+
+class BulkCancelSerializer(serializers.Serializer):
+    """Either explicit ``order_ids`` or every order pending for ``older_than_hours``."""
+
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=MAX_BULK_STATUS_ORDERS,
+    )
+    older_than_hours = serializers.IntegerField(
+        min_value=0, default=STALE_PENDING_HOURS
+    )
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    """Up to ``MAX_BULK_STATUS_ORDERS`` ``order_ids`` to move to ``status``."""
+
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_STATUS_ORDERS,
+    )
+    status = serializers.ChoiceField(choices=OrderStatusChoices.choices)
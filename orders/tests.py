@@ -1,2 +1,719 @@
+import base64
+import csv
+import json
+import threading
+from datetime import UTC, date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from activity_logs.models import ActivityLog
+from analytics.status_counts import status_counts
+from authentication.choices import UserType
+from authentication.models import UserProfile
+from orders.models import Order, OrderItem, OrderNumberSequence
+from orders.numbering import (
+    BlockAllocator,
+    SequenceTableAllocator,
+    allocate_order_number,
+)
+from orders.serializers import MAX_BULK_STATUS_ORDERS
+from orders.views import EXPORT_COLUMNS
+from products.models import Category, Product
+from products.stock import available_stock
+from utils.exports import _csv_lines, _ndjson_lines
+from utils.pagination import _decode_cursor, _encode_cursor
+from utils.testing import QueryBudgetMixin, QueryPlanAssertionsMixin
+
+
+def place_order(user, product, quantity=2):
+    """A pending order of ``quantity`` ``product``, placed through the API."""
+    client = APIClient()
+    client.force_authenticate(user)
+    response = client.post(
+        "/api/orders/",
+        {
+            "shipping_address": "Somewhere",
+            "payment_method": "cod",
+            "items": [{"product": product.id, "quantity": quantity}],
+        },
+        format="json",
+    )
+    return Order.objects.get(id=response.json()["data"]["id"])
+
+
+class OrderPlacementTests(APITestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user("customer", password="secret")
+        self.product = Product.objects.create(
+            name="Book",
+            category=Category.objects.create(name="Books"),
+            price=10,
+            stock_quantity=20,
+            sku="BOOK",
+        )
+        self.client.force_authenticate(self.user)
+
+    def place(self, *quantities):
+        return self.client.post(
+            "/api/orders/",
+            {
+                "shipping_address": "Somewhere",
+                "payment_method": "cod",
+                "items": [
+                    {"product": self.product.id, "quantity": quantity}
+                    for quantity in quantities
+                ],
+            },
+            format="json",
+        )
+
+    def stock(self):
+        return available_stock([self.product.id])[self.product.id]
+
+    def test_takes_the_ordered_quantity_from_stock(self):
+        response = self.place(3)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["data"]["total_amount"], "30.00")
+        self.assertEqual(self.stock(), 17)
+
+    def test_lines_of_one_product_take_stock_together(self):
+        response = self.place(2, 3)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [item["quantity"] for item in response.json()["data"]["items"]], [2, 3]
+        )
+        self.assertEqual(self.stock(), 15)
+
+    def test_insufficient_stock_leaves_stock_unchanged(self):
+        # Each line fits on its own, the two together do not.
+        response = self.place(15, 6)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("items", response.json()["errors"])
+        self.assertEqual(self.stock(), 20)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderIndexTests(QueryPlanAssertionsMixin, APITestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user("customer", password="secret")
+        Order.objects.create(
+            user=self.user,
+            total_amount=10,
+            shipping_address="Somewhere",
+            payment_method="cod",
+        )
+
+    def test_user_order_list_uses_user_ordered_index(self):
+        self.client.force_authenticate(self.user)
+        self.assertSelectUsesIndex(
+            "orders_order", "order_user_ordered_id_idx", self.client.get, "/api/orders/"
+        )
+
+
+class OrderQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Query budgets per endpoint; lists hold enough rows to expose an N+1."""
+
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        self.user = UserProfile.objects.create_user("customer", password="secret")
+        category = Category.objects.create(name="Books")
+        self.products = [
+            Product.objects.create(
+                name=f"Book {number}",
+                description="A book.",
+                category=category,
+                price=10,
+                stock_quantity=20,
+                sku=f"BOOK-{number}",
+            )
+            for number in range(3)
+        ]
+        self.orders = []
+        for _ in range(3):
+            order = Order.objects.create(
+                user=self.user,
+                total_amount=30,
+                shipping_address="Somewhere",
+                payment_method="cod",
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(
+                    order=order, product=product, quantity=1, price=10, subtotal=10
+                )
+                for product in self.products
+            )
+            self.orders.append(order)
+
+    def test_order_create(self):
+        self.client.force_authenticate(self.user)
+        response = self.assertQueryBudget(
+            28,
+            self.client.post,
+            "/api/orders/",
+            {
+                "shipping_address": "Somewhere",
+                "payment_method": "cod",
+                "items": [
+                    {"product": product.id, "quantity": 2} for product in self.products
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_order_list(self):
+        self.client.force_authenticate(self.user)
+        self.assertQueryBudget(4, self.client.get, "/api/orders/")
+
+    def test_order_detail(self):
+        self.client.force_authenticate(self.user)
+        self.assertQueryBudget(3, self.client.get, f"/api/orders/{self.orders[0].id}/")
+
+    def test_order_status_update(self):
+        self.client.force_authenticate(self.admin)
+        response = self.assertQueryBudget(
+            11,
+            self.client.patch,
+            f"/api/orders/{self.orders[0].id}/status/",
+            {"status": "confirmed"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_order_cancel(self):
+        self.client.force_authenticate(self.user)
+        response = self.assertQueryBudget(
+            18, self.client.delete, f"/api/orders/{self.orders[0].id}/cancel/"
+        )
+        self.assertEqual(response.status_code, 204)
+
+    def test_admin_order_list(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(4, self.client.get, "/api/orders/admin/all/")
+
+    def test_admin_order_export(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(
+            3,
+            lambda: b"".join(
+                self.client.get("/api/orders/admin/export/").streaming_content
+            ),
+        )
+
+    def test_admin_bulk_cancel(self):
+        Order.objects.update(ordered_at=timezone.now() - timedelta(days=2))
+        self.client.force_authenticate(self.admin)
+        response = self.assertQueryBudget(
+            20, self.client.post, "/api/orders/admin/bulk-cancel/"
+        )
+        self.assertEqual(response.json()["data"]["cancelled"], 3)
+
+    def test_admin_bulk_status(self):
+        self.client.force_authenticate(self.admin)
+        response = self.assertQueryBudget(
+            12,
+            self.client.post,
+            "/api/orders/admin/bulk-status/",
+            {"order_ids": [order.id for order in self.orders], "status": "confirmed"},
+            format="json",
+        )
+        self.assertEqual(response.json()["data"]["updated"], 3)
+
+
+class BulkStatusTests(APITestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        self.user = UserProfile.objects.create_user("customer", password="secret")
+        self.product = Product.objects.create(
+            name="Book",
+            description="A book.",
+            category=Category.objects.create(name="Books"),
+            price=10,
+            stock_quantity=20,
+            sku="BOOK",
+        )
+        self.client.force_authenticate(self.admin)
+
+    def order(self, order_status):
+        order = Order.objects.create(
+            user=self.user,
+            status=order_status,
+            total_amount=20,
+            shipping_address="Somewhere",
+            payment_method="cod",
+        )
+        OrderItem.objects.create(
+            order=order, product=self.product, quantity=2, price=10, subtotal=20
+        )
+        return order
+
+    def move(self, order_ids, order_status):
+        return self.client.post(
+            "/api/orders/admin/bulk-status/",
+            {"order_ids": order_ids, "status": order_status},
+            format="json",
+        )
+
+    def test_moves_only_allowed_transitions(self):
+        shipped, pending = self.order("shipped"), self.order("pending")
+        response = self.move([shipped.id, pending.id, 999999], "delivered")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["data"],
+            {
+                "updated": 1,
+                "rejected": [{"id": pending.id, "status": "pending"}],
+                "not_found": [999999],
+            },
+        )
+        shipped.refresh_from_db()
+        self.assertEqual(shipped.status, "delivered")
+        self.assertIsNotNone(shipped.delivered_at)
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, "pending")
+
+    def test_cancelling_restores_stock(self):
+        confirmed = self.order("confirmed")
+        response = self.move([confirmed.id], "cancelled")
+
+        self.assertEqual(response.json()["data"]["updated"], 1)
+        self.assertEqual(available_stock([self.product.id])[self.product.id], 22)
+
+    def update(self, order_id, order_status):
+        return self.client.patch(
+            f"/api/orders/{order_id}/status/", {"status": order_status}
+        )
+
+    def test_single_update_follows_the_transitions(self):
+        pending = self.order("pending")
+        response = self.update(pending.id, "shipped")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["message"],
+            "Cannot change the status from pending to shipped.",
+        )
+        response = self.update(pending.id, "confirmed")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["status"], "confirmed")
+        self.assertEqual(self.update(pending.id, "confirmed").status_code, 400)
+
+    def test_single_update_is_logged_per_order(self):
+        pending = self.order("pending")
+        self.update(pending.id, "confirmed")
+        log = ActivityLog.objects.get(action="order_status_updated")
+        self.assertEqual(
+            (log.entity_type, log.entity_id, log.user, log.details),
+            (
+                "order",
+                str(pending.id),
+                self.admin,
+                {"old_status": "pending", "new_status": "confirmed"},
+            ),
+        )
+
+    def test_single_update_stamps_delivered_at(self):
+        shipped = self.order("shipped")
+        response = self.update(shipped.id, "delivered")
+        self.assertIsNotNone(response.json()["data"]["delivered_at"])
+
+    def test_single_cancel_restores_stock(self):
+        processing = self.order("processing")
+        self.assertEqual(self.update(processing.id, "cancelled").status_code, 200)
+        self.assertEqual(available_stock([self.product.id])[self.product.id], 22)
+        # A cancelled order cannot be cancelled, or restore its stock, again.
+        self.assertEqual(self.update(processing.id, "cancelled").status_code, 400)
+        self.assertEqual(available_stock([self.product.id])[self.product.id], 22)
+
+    def test_single_update_rejects_invalid_requests(self):
+        self.assertEqual(self.update(999999, "confirmed").status_code, 404)
+        pending = self.order("pending")
+        self.assertEqual(self.update(pending.id, "lost").status_code, 400)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.update(pending.id, "confirmed").status_code, 403)
+
+    def test_rejects_invalid_requests(self):
+        pending = self.order("pending")
+        self.assertEqual(self.move([pending.id], "lost").status_code, 400)
+        self.assertEqual(self.move([], "confirmed").status_code, 400)
+        too_many = list(range(1, MAX_BULK_STATUS_ORDERS + 2))
+        self.assertEqual(self.move(too_many, "confirmed").status_code, 400)
+        response = self.client.post(
+            "/api/orders/admin/bulk-cancel/", {"order_ids": too_many}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.move([pending.id], "confirmed").status_code, 403)
+
+
+class OrderCancelTests(APITestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user("customer", password="secret")
+        self.product = Product.objects.create(
+            name="Book",
+            category=Category.objects.create(name="Books"),
+            price=10,
+            stock_quantity=20,
+            sku="BOOK",
+        )
+        self.order = place_order(self.user, self.product)
+        self.client.force_authenticate(self.user)
+
+    def cancel(self, order_id=None):
+        return self.client.delete(f"/api/orders/{order_id or self.order.id}/cancel/")
+
+    def test_cancelling_twice_restores_the_stock_once(self):
+        self.assertEqual(self.cancel().status_code, 204)
+        self.assertEqual(self.cancel().status_code, 400)
+        self.assertEqual(available_stock([self.product.id])[self.product.id], 20)
+        counts = status_counts()
+        self.assertEqual((counts["pending"], counts["cancelled"]), (0, 1))
+
+    def test_only_the_owner_can_cancel(self):
+        self.client.force_authenticate(
+            UserProfile.objects.create_user("other", password="secret")
+        )
+        self.assertEqual(self.cancel().status_code, 403)
+        self.assertEqual(self.cancel(999999).status_code, 404)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "pending")
+
+
+@skipUnless(connection.vendor == "postgresql", "Row locks need PostgreSQL.")
+class ConcurrentCancelTests(TransactionTestCase):
+    def test_concurrent_cancels_restore_the_stock_once(self):
+        user = UserProfile.objects.create_user("customer", password="secret")
+        product = Product.objects.create(
+            name="Book",
+            category=Category.objects.create(name="Books"),
+            price=10,
+            stock_quantity=20,
+            sku="BOOK",
+        )
+        order = place_order(user, product)
+        barrier = threading.Barrier(2)
+        statuses = []
+
+        def cancel():
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                response = client.delete(f"/api/orders/{order.id}/cancel/")
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cancel) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [204, 400])
+        self.assertEqual(available_stock([product.id])[product.id], 20)
+        self.assertEqual(status_counts()["cancelled"], 1)
+
+
+class OrderNumberingTests(TestCase):
+    def test_numbers_follow_the_day_sequence(self):
+        day = datetime(2026, 3, 1, 12, tzinfo=UTC)
+        with mock.patch("orders.numbering.timezone.now", return_value=day):
+            numbers = [allocate_order_number() for _ in range(3)]
+        self.assertEqual(
+            numbers, ["ORD-20260301-001", "ORD-20260301-002", "ORD-20260301-003"]
+        )
+        with mock.patch(
+            "orders.numbering.timezone.now", return_value=day + timedelta(days=1)
+        ):
+            self.assertEqual(allocate_order_number(), "ORD-20260302-001")
+
+    def test_numbers_past_999_keep_every_digit(self):
+        OrderNumberSequence.objects.create(date=date(2026, 3, 1), last_value=999)
+        day = datetime(2026, 3, 1, 12, tzinfo=UTC)
+        with mock.patch("orders.numbering.timezone.now", return_value=day):
+            self.assertEqual(allocate_order_number(), "ORD-20260301-1000")
+
+    def test_reserve_hands_out_consecutive_ranges(self):
+        allocator = SequenceTableAllocator()
+        day = date(2026, 3, 1)
+        self.assertEqual(allocator.reserve(day, 5), 1)
+        self.assertEqual(allocator.reserve(day, 5), 6)
+        self.assertEqual(allocator.reserve(day), 11)
+        self.assertEqual(allocator.reserve(date(2026, 3, 2)), 1)
+
+
+class BlockAllocatorTests(TransactionTestCase):
+    def test_workers_never_share_a_number(self):
+        day = date(2026, 3, 1)
+        workers = [BlockAllocator(block_size=4), BlockAllocator(block_size=4)]
+        numbers = [workers[i % 2].allocate(day) for i in range(20)]
+        self.assertEqual(len(set(numbers)), 20)
+        # One reservation per block of four, per worker.
+        self.assertEqual(OrderNumberSequence.objects.get(date=day).last_value, 24)
+
+    def test_new_day_starts_a_new_block(self):
+        allocator = BlockAllocator(block_size=4)
+        self.assertEqual(allocator.allocate(date(2026, 3, 1)), 1)
+        self.assertEqual(allocator.allocate(date(2026, 3, 2)), 1)
+        self.assertEqual(allocator.allocate(date(2026, 3, 2)), 2)
+
+    def test_takes_single_numbers_inside_a_transaction(self):
+        allocator = BlockAllocator(block_size=4)
+        day = date(2026, 3, 1)
+        with transaction.atomic():
+            self.assertEqual(allocator.allocate(day), 1)
+            self.assertEqual(allocator.allocate(day), 2)
+        self.assertEqual(OrderNumberSequence.objects.get(date=day).last_value, 2)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        customer = UserProfile.objects.create_user("customer", password="secret")
+        Order.objects.bulk_create(
+            Order(
+                order_number=f"ORD-{number}",
+                user=customer,
+                total_amount=10,
+                shipping_address="Somewhere",
+                payment_method="cod",
+            )
+            for number in range(10)
+        )
+        # Seven orders share one ordered_at, so pages split inside the tie.
+        now = timezone.now()
+        ids = list(Order.objects.order_by("id").values_list("id", flat=True))
+        Order.objects.filter(id__in=ids[:7]).update(ordered_at=now)
+        for offset, order_id in enumerate(ids[7:], start=1):
+            Order.objects.filter(id=order_id).update(
+                ordered_at=now - timedelta(hours=offset)
+            )
+        self.expected = list(
+            Order.objects.order_by("-ordered_at", "-id").values_list("id", flat=True)
+        )
+        self.client.force_authenticate(self.admin)
+
+    def page(self, **params):
+        response = self.client.get("/api/orders/admin/all/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def test_walks_every_order_once_in_both_directions(self):
+        pages = [self.page(cursor="", page_size=3)]
+        while pages[-1]["next"]:
+            pages.append(self.page(cursor=pages[-1]["next"], page_size=3))
+        ids = [order["id"] for page in pages for order in page["results"]]
+        self.assertEqual(ids, self.expected)
+        self.assertIsNone(pages[0]["previous"])
+
+        back = [pages[-1]]
+        while back[-1]["previous"]:
+            back.append(self.page(cursor=back[-1]["previous"], page_size=3))
+        self.assertEqual(
+            [[order["id"] for order in page["results"]] for page in reversed(back)],
+            [[order["id"] for order in page["results"]] for page in pages],
+        )
+
+    def test_cursor_round_trips_the_position(self):
+        order = Order.objects.get(id=self.expected[0])
+        fields = [
+            (field.attname, field.to_python)
+            for field in (
+                Order._meta.get_field("ordered_at"),
+                Order._meta.get_field("id"),
+            )
+        ]
+        cursor = _encode_cursor([order.ordered_at, order.id], reverse=True)
+        self.assertEqual(
+            _decode_cursor(cursor, fields), ([order.ordered_at, order.id], True)
+        )
+
+    def test_rejects_invalid_cursors(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in (
+            "not base64!",
+            base64.urlsafe_b64encode(b"not json").decode(),
+            encode({"r": False}),
+            encode({"p": ["yesterday", 1]}),
+            encode({"p": [timezone.now().isoformat()]}),
+        ):
+            response = self.client.get("/api/orders/admin/all/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+
+    def test_page_size_is_bounded(self):
+        self.assertEqual(len(self.page(cursor="", page_size=0)["results"]), 1)
+        self.assertEqual(len(self.page(cursor="", page_size="x")["results"]), 10)
+        with mock.patch("utils.pagination.MAX_CURSOR_PAGE_SIZE", 4):
+            self.assertEqual(len(self.page(cursor="", page_size=50)["results"]), 4)
+
+    def test_count_only_when_asked(self):
+        self.assertNotIn("count", self.page(cursor=""))
+        self.assertEqual(self.page(cursor="", count="exact")["count"], 10)
+        self.assertEqual(self.page(cursor="", count="estimate")["count"], 10)
+
+
+class OrderExportTests(APITestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        self.user = UserProfile.objects.create_user("customer", password="secret")
+        product = Product.objects.create(
+            name="=HYPERLINK(1)",
+            category=Category.objects.create(name="Books"),
+            price=Decimal("2.50"),
+            sku="BOOK-1",
+        )
+        start = datetime(2025, 1, 1, 9, tzinfo=UTC)
+        self.orders = []
+        for number in range(5):
+            order = Order.objects.create(
+                user=self.user,
+                total_amount=Decimal("5.00"),
+                shipping_address=f"@{number} Main Street, Springfield",
+                payment_method="cod",
+            )
+            OrderItem.objects.create(
+                order=order,
+                product=product,
+                quantity=2,
+                price=Decimal("2.50"),
+                subtotal=Decimal("5.00"),
+            )
+            self.orders.append(order)
+        for number, order in enumerate(self.orders):
+            Order.objects.filter(id=order.id).update(
+                ordered_at=start + timedelta(hours=number)
+            )
+        self.client.force_authenticate(self.admin)
+
+    def export(self, **params):
+        response = self.client.get("/api/orders/admin/export/", params)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response, content = self.export()
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="orders.csv"'
+        )
+        header, *rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(tuple(header), EXPORT_COLUMNS)
+        self.assertEqual(
+            [int(row[0]) for row in rows], [order.id for order in self.orders[::-1]]
+        )
+        row = dict(zip(header, rows[0]))
+        self.assertEqual(row["total_amount"], "5.00")
+        self.assertEqual(row["ordered_at"], "2025-01-01T13:00:00+00:00")
+        self.assertEqual(row["delivered_at"], "")
+        # Text a spreadsheet would run as a formula is quoted.
+        self.assertEqual(row["shipping_address"], "'@4 Main Street, Springfield")
+        self.assertEqual(json.loads(row["items"])[0]["product_name"], "=HYPERLINK(1)")
+
+    def test_ndjson(self):
+        response, content = self.export(file_format="ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="orders.ndjson"'
+        )
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [line["id"] for line in lines], [order.id for order in self.orders[::-1]]
+        )
+        self.assertEqual(lines[0]["total_amount"], "5.00")
+        self.assertEqual(lines[0]["ordered_at"], "2025-01-01T13:00:00+00:00")
+        self.assertIsNone(lines[0]["delivered_at"])
+        # Only CSV cells are quoted.
+        self.assertEqual(lines[0]["shipping_address"], "@4 Main Street, Springfield")
+        self.assertEqual(
+            lines[0]["items"],
+            [
+                {
+                    "product": self.orders[0].items.get().product_id,
+                    "product_name": "=HYPERLINK(1)",
+                    "quantity": 2,
+                    "price": "2.50",
+                    "subtotal": "5.00",
+                }
+            ],
+        )
+
+    def test_rejects_unknown_file_format(self):
+        response = self.client.get("/api/orders/admin/export/", {"file_format": "xls"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters(self):
+        other = UserProfile.objects.create_user("other", password="secret")
+        first, second, third, *_ = self.orders
+        Order.objects.filter(id=first.id).update(user=other)
+        Order.objects.filter(id=second.id).update(status="confirmed")
+        Order.objects.filter(id=third.id).update(
+            ordered_at=datetime(2025, 1, 3, 9, tzinfo=UTC)
+        )
+        cases = [
+            ({"user_id": other.id}, [first.id]),
+            ({"status": "confirmed"}, [second.id]),
+            ({"start_date": "2025-01-02"}, [third.id]),
+            (
+                {"end_date": "2025-01-02", "user_id": self.user.id},
+                [self.orders[4].id, self.orders[3].id, second.id],
+            ),
+        ]
+        for params, expected in cases:
+            with self.subTest(params):
+                response = self.client.get("/api/orders/admin/all/", params)
+                self.assertEqual(
+                    [order["id"] for order in response.json()["data"]["results"]],
+                    expected,
+                )
+                _, content = self.export(file_format="ndjson", **params)
+                self.assertEqual(
+                    [json.loads(line)["id"] for line in content.splitlines()],
+                    expected,
+                )
+
+    def test_rejects_invalid_filters(self):
+        for params in (
+            {"user_id": "abc"},
+            {"status": "lost"},
+            {"start_date": "2025-02-30"},
+            {"end_date": "yesterday"},
+        ):
+            for url in ("/api/orders/admin/all/", "/api/orders/admin/export/"):
+                with self.subTest(params, url=url):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn(next(iter(params)), response.json()["errors"])
+
+    def test_reads_rows_in_chunks(self):
+        with mock.patch("orders.views.EXPORT_CHUNK_SIZE", 2):
+            # The orders, then the items and products of each chunk of two.
+            with self.assertNumQueries(7):
+                _, content = self.export(file_format="ndjson")
+        self.assertEqual(len(content.splitlines()), 5)
+
+    def test_csv_cells(self):
+        lines = _csv_lines(
+            [("-1", -1, "+cmd", "\tx", "a=b", None, True, date(2025, 1, 2))],
+            ["a", "b", "c", "d", "e", "f", "g", "h"],
+        )
+        self.assertEqual(list(lines)[1], "'-1,-1,'+cmd,'\tx,a=b,,True,2025-01-02\r\n")
+
+    def test_unknown_types_are_rejected(self):
+        for encode in (_csv_lines, _ndjson_lines):
+            with self.subTest(encode.__name__), self.assertRaises(TypeError):
+                list(encode([(object(),)], ["value"]))
@@ -1,6 +1,9 @@
 from django.urls import path
 
 from orders.views import (
+    AdminOrderBulkCancelAPIView,
+    AdminOrderBulkStatusAPIView,
+    AdminOrderExportAPIView,
     AdminOrderListAPIView,
     OrderCancelAPIView,
     OrderListCreateAPIView,
@@ -17,5 +20,16 @@ urlpatterns = [
         name="order-status-update",
     ),
     path("admin/all/", AdminOrderListAPIView.as_view(), name="admin-order-list"),
+    path("admin/export/", AdminOrderExportAPIView.as_view(), name="admin-order-export"),
+    path(
+        "admin/bulk-cancel/",
+        AdminOrderBulkCancelAPIView.as_view(),
+        name="admin-order-bulk-cancel",
+    ),
+    path(
+        "admin/bulk-status/",
+        AdminOrderBulkStatusAPIView.as_view(),
+        name="admin-order-bulk-status",
+    ),
     path("<int:id>/cancel/", OrderCancelAPIView.as_view(), name="order-cancel"),
 ]
@@ -0,0 +1,206 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from activity_logs.utils import log_activity
+from analytics.dashboard import invalidate_dashboard
+from analytics.product_sales import record_sales_changes
+from analytics.rollups import record_status_changes
+from analytics.status_counts import count_status_changes
+from orders.choices import OrderStatusChoices
+from orders.models import Order, OrderItem
+from products.stock import restore_stock
+from utils.filters import date_range_filter
+
+CANCEL_BATCH_SIZE = 500
+STALE_PENDING_HOURS = 24
+TRANSITION_BATCH_SIZE = 500
+
+# The statuses an order may move to from each status.
+STATUS_TRANSITIONS = {
+    OrderStatusChoices.PENDING: {
+        OrderStatusChoices.CONFIRMED,
+        OrderStatusChoices.CANCELLED,
+    },
+    OrderStatusChoices.CONFIRMED: {
+        OrderStatusChoices.PROCESSING,
+        OrderStatusChoices.CANCELLED,
+    },
+    OrderStatusChoices.PROCESSING: {
+        OrderStatusChoices.SHIPPED,
+        OrderStatusChoices.CANCELLED,
+    },
+    OrderStatusChoices.SHIPPED: {OrderStatusChoices.DELIVERED},
+    OrderStatusChoices.DELIVERED: set(),
+    OrderStatusChoices.CANCELLED: set(),
+}
+
+
+def filter_orders(queryset, params):
+    """
+    Apply the ``status``, ``start_date`` and ``end_date`` (inclusive, YYYY-MM-DD)
+    query parameters shared by the order list endpoints.
+    """
+    order_status = params.get("status")
+    if order_status:
+        if order_status not in OrderStatusChoices.values:
+            raise ValidationError({"status": "Invalid status provided."})
+        queryset = queryset.filter(status=order_status)
+
+    return queryset.filter(**date_range_filter(params, "ordered_at"))
+
+
+def filter_admin_orders(queryset, params):
+    """``filter_orders`` plus the admin-only ``user_id`` filter."""
+    queryset = filter_orders(queryset, params)
+    user_id = params.get("user_id")
+    if user_id:
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            raise ValidationError({"user_id": "Invalid user id provided."})
+        queryset = queryset.filter(user_id=user_id)
+    return queryset
+
+
+def item_quantities(order_ids):
+    """Total quantity per product over the items of the given orders."""
+    return dict(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_id", "total")
+    )
+
+
+def stale_pending_orders(hours=STALE_PENDING_HOURS):
+    """Orders still pending ``hours`` hours after they were placed."""
+    return Order.objects.filter(
+        status=OrderStatusChoices.PENDING,
+        ordered_at__lte=timezone.now() - timedelta(hours=hours),
+    )
+
+
+def cancel_orders(queryset, user=None, batch_size=CANCEL_BATCH_SIZE, request=None):
+    """
+    Cancel the pending orders in ``queryset`` and put their stock back,
+    ``batch_size`` orders per transaction with one activity log per batch.
+    Orders locked by a concurrent status change are skipped. Returns the
+    number of orders cancelled.
+    """
+    cancelled = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            orders = list(
+                queryset.filter(status=OrderStatusChoices.PENDING, id__gt=last_id)
+                .select_for_update(skip_locked=True)
+                .only("id", "order_number", "status", "total_amount", "ordered_at")
+                .order_by("id")[:batch_size]
+            )
+            if not orders:
+                break
+            order_ids = [order.id for order in orders]
+            Order.objects.filter(id__in=order_ids).update(
+                status=OrderStatusChoices.CANCELLED, updated_at=timezone.now()
+            )
+            for order in orders:
+                order.status = OrderStatusChoices.CANCELLED
+            changes = [(order, OrderStatusChoices.PENDING) for order in orders]
+            record_status_changes(changes)
+            record_sales_changes(changes)
+            count_status_changes(changes)
+            restore_stock(item_quantities(order_ids))
+
+        last_id = order_ids[-1]
+        cancelled += len(orders)
+        log_activity(
+            user=user,
+            action="orders_cancelled",
+            entity_type="order",
+            details={
+                "count": len(orders),
+                "order_numbers": [order.order_number for order in orders],
+            },
+            request=request,
+        )
+
+    if cancelled:
+        invalidate_dashboard()
+    return cancelled
+
+
+def transition_orders(
+    order_ids, new_status, user=None, batch_size=TRANSITION_BATCH_SIZE, request=None
+):
+    """
+    Move the orders in ``order_ids`` to ``new_status`` where
+    ``STATUS_TRANSITIONS`` allows it, ``batch_size`` orders per transaction
+    with one UPDATE and one activity log per batch; moving a single order
+    logs it with its old status instead. Other orders are left as they are.
+    Returns the ids of the orders moved.
+    """
+    sources = [
+        old_status
+        for old_status, targets in STATUS_TRANSITIONS.items()
+        if new_status in targets
+    ]
+    order_ids = sorted(set(order_ids))
+    moved = []
+    for start in range(0, len(order_ids), batch_size):
+        with transaction.atomic():
+            # Locked in id order so concurrent batches cannot deadlock.
+            orders = list(
+                Order.objects.filter(
+                    id__in=order_ids[start : start + batch_size], status__in=sources
+                )
+                .select_for_update()
+                .only("id", "order_number", "status", "total_amount", "ordered_at")
+                .order_by("id")
+            )
+            if not orders:
+                continue
+            batch_ids = [order.id for order in orders]
+            values = {"status": new_status, "updated_at": timezone.now()}
+            if new_status == OrderStatusChoices.DELIVERED:
+                values["delivered_at"] = values["updated_at"]
+            Order.objects.filter(id__in=batch_ids, status__in=sources).update(**values)
+            changes = [(order, order.status) for order in orders]
+            for order in orders:
+                order.status = new_status
+            record_status_changes(changes)
+            record_sales_changes(changes)
+            count_status_changes(changes)
+            if new_status == OrderStatusChoices.CANCELLED:
+                restore_stock(item_quantities(batch_ids))
+
+        moved += batch_ids
+        if len(order_ids) == 1:
+            # A single order keeps the entry the status endpoint always wrote.
+            log_activity(
+                user=user,
+                action="order_status_updated",
+                entity_type="order",
+                entity_id=orders[0].id,
+                details={"old_status": changes[0][1], "new_status": new_status},
+                request=request,
+            )
+        else:
+            log_activity(
+                user=user,
+                action="orders_status_updated",
+                entity_type="order",
+                details={
+                    "new_status": new_status,
+                    "count": len(orders),
+                    "order_numbers": [order.order_number for order in orders],
+                },
+                request=request,
+            )
+
+    if moved:
+        invalidate_dashboard()
+    return moved
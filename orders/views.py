@@ -1,28 +1,72 @@
 from django.db import transaction
+from django.http import Http404
 from rest_framework import status
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from activity_logs.utils import log_activity
+from analytics.dashboard import invalidate_dashboard
+from analytics.product_sales import record_sales_changes
+from analytics.rollups import record_status_changes
+from analytics.status_counts import count_status_changes
 from authentication.choices import UserType
 from orders.choices import OrderStatusChoices
 from orders.models import Order
-from orders.serializers import OrderSerializer
+from orders.serializers import (
+    BulkCancelSerializer,
+    BulkStatusSerializer,
+    OrderSerializer,
+)
+from orders.utils import (
+    cancel_orders,
+    filter_admin_orders,
+    filter_orders,
+    item_quantities,
+    stale_pending_orders,
+    transition_orders,
+)
+from products.stock import restore_stock
+from utils.exports import EXPORT_CHUNK_SIZE, export_response, get_file_format
+from utils.pagination import paginate_queryset
+
+EXPORT_COLUMNS = (
+    "id",
+    "order_number",
+    "user_id",
+    "status",
+    "total_amount",
+    "shipping_address",
+    "payment_method",
+    "payment_status",
+    "ordered_at",
+    "updated_at",
+    "delivered_at",
+    "items",
+)
 
 
 class OrderListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        orders = Order.objects.filter(user=request.user)
+        queryset = Order.objects.filter(user=request.user).prefetch_related(
+            "items__product"
+        )
+        queryset = filter_orders(queryset, request.query_params)
+
+        orders, pagination = paginate_queryset(
+            request, queryset, ordering=("-ordered_at", "-id")
+        )
         serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return Response({**pagination, "results": serializer.data})
 
     def post(self, request):
         serializer = OrderSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
+        invalidate_dashboard()
         log_activity(
             user=request.user,
             action="order_created",
@@ -39,12 +83,12 @@ class OrderRetrieveAPIView(APIView):
 
     def get_object(self, id, user):
         try:
-            order = Order.objects.get(id=id)
-            if order.user != user and not user.user_type == UserType.ADMIN.value:
-                raise status.HTTP_403_FORBIDDEN
+            order = Order.objects.prefetch_related("items__product").get(id=id)
+            if order.user_id != user.id and not user.user_type == UserType.ADMIN.value:
+                raise PermissionDenied
             return order
         except Order.DoesNotExist:
-            raise status.HTTP_404_NOT_FOUND
+            raise Http404
 
     def get(self, request, id):
         order = self.get_object(id, request.user)
@@ -61,12 +105,6 @@ class OrderStatusUpdateAPIView(APIView):
                 {"detail": "You do not have permission to perform this action."},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        try:
-            order = Order.objects.get(id=id)
-        except Order.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        old_status = order.status
         new_status = request.data.get("status")
         if new_status not in OrderStatusChoices.values:
             return Response(
@@ -74,18 +112,19 @@ class OrderStatusUpdateAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        order.status = new_status
-        order.save()
-        serializer = OrderSerializer(order)
-        log_activity(
-            user=request.user,
-            action="order_status_updated",
-            entity_type="order",
-            entity_id=order.id,
-            details={"old_status": old_status, "new_status": new_status},
-            request=request,
-        )
-        return Response(serializer.data)
+        # The same locked, STATUS_TRANSITIONS-checked change as the bulk update.
+        if not transition_orders([id], new_status, user=request.user, request=request):
+            current = (
+                Order.objects.filter(id=id).values_list("status", flat=True).first()
+            )
+            if current is None:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+            return Response(
+                {"detail": f"Cannot change the status from {current} to {new_status}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        order = Order.objects.prefetch_related("items__product").get(id=id)
+        return Response(OrderSerializer(order).data)
 
 
 class AdminOrderListAPIView(APIView):
@@ -97,39 +136,149 @@ class AdminOrderListAPIView(APIView):
                 {"detail": "You do not have permission to perform this action."},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        orders = Order.objects.all()
+        queryset = Order.objects.prefetch_related("items__product")
+
+        # Filtering
+        queryset = filter_admin_orders(queryset, request.query_params)
+
+        # Pagination
+        orders, pagination = paginate_queryset(
+            request, queryset, ordering=("-ordered_at", "-id")
+        )
         serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return Response({**pagination, "results": serializer.data})
 
 
-class OrderCancelAPIView(APIView):
+class AdminOrderBulkCancelAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def delete(self, request, id):
-        try:
-            order = Order.objects.get(id=id)
-        except Order.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+    def post(self, request):
+        """
+        Cancel the pending orders in ``order_ids``, or if it is not given every
+        order pending for at least ``older_than_hours`` hours (24 by default).
+        """
+        if not request.user.user_type == UserType.ADMIN.value:
+            return Response(
+                {"detail": "You do not have permission to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        serializer = BulkCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = serializer.validated_data.get("order_ids")
+        if order_ids:
+            queryset = Order.objects.filter(id__in=order_ids)
+        else:
+            queryset = stale_pending_orders(
+                serializer.validated_data["older_than_hours"]
+            )
+        cancelled = cancel_orders(queryset, user=request.user, request=request)
+        return Response({"cancelled": cancelled})
+
+
+class AdminOrderBulkStatusAPIView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        if order.user != request.user:
+    def post(self, request):
+        """
+        Move the orders in ``order_ids`` to ``status``. Orders whose current
+        status cannot move to it are left unchanged and returned under
+        ``rejected`` with that status.
+        """
+        if not request.user.user_type == UserType.ADMIN.value:
             return Response(
-                {"detail": "You do not have permission to cancel this order."},
+                {"detail": "You do not have permission to perform this action."},
                 status=status.HTTP_403_FORBIDDEN,
             )
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = set(serializer.validated_data["order_ids"])
+        moved = transition_orders(
+            order_ids,
+            serializer.validated_data["status"],
+            user=request.user,
+            request=request,
+        )
+        current = dict(
+            Order.objects.filter(id__in=order_ids.difference(moved)).values_list(
+                "id", "status"
+            )
+        )
+        return Response(
+            {
+                "updated": len(moved),
+                "rejected": [
+                    {"id": order_id, "status": order_status}
+                    for order_id, order_status in sorted(current.items())
+                ],
+                "not_found": sorted(order_ids.difference(moved, current)),
+            }
+        )
+
+
+class AdminOrderExportAPIView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        if order.status != OrderStatusChoices.PENDING:
+    def get(self, request):
+        if not request.user.user_type == UserType.ADMIN.value:
             return Response(
-                {"detail": "Only pending orders can be cancelled."},
-                status=status.HTTP_400_BAD_REQUEST,
+                {"detail": "You do not have permission to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        file_format = get_file_format(request.query_params)
+        queryset = filter_admin_orders(
+            Order.objects.prefetch_related("items__product"), request.query_params
+        ).order_by("-ordered_at", "-id")
+
+        # With a chunk size, iterator() runs the prefetch once per chunk.
+        rows = (
+            (
+                *(getattr(order, column) for column in EXPORT_COLUMNS[:-1]),
+                [
+                    {
+                        "product": item.product_id,
+                        "product_name": item.product.name,
+                        "quantity": item.quantity,
+                        "price": str(item.price),
+                        "subtotal": str(item.subtotal),
+                    }
+                    for item in order.items.all()
+                ],
             )
+            for order in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return export_response(rows, EXPORT_COLUMNS, file_format, "orders")
 
+
+class OrderCancelAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, id):
         with transaction.atomic():
+            # Locked before the status check, so of two concurrent cancels the
+            # second sees the first one's change and restores nothing.
+            order = Order.objects.select_for_update().filter(id=id).first()
+            if order is None:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+
+            if order.user_id != request.user.id:
+                return Response(
+                    {"detail": "You do not have permission to cancel this order."},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+
+            if order.status != OrderStatusChoices.PENDING:
+                return Response(
+                    {"detail": "Only pending orders can be cancelled."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
             order.status = OrderStatusChoices.CANCELLED
             order.save()
-            # Restore stock quantity
-            for item in order.items.all():
-                item.product.stock_quantity += item.quantity
-                item.product.save()
+            record_status_changes([(order, OrderStatusChoices.PENDING)])
+            record_sales_changes([(order, OrderStatusChoices.PENDING)])
+            count_status_changes([(order, OrderStatusChoices.PENDING)])
+            restore_stock(item_quantities([order.id]))
+        invalidate_dashboard()
         log_activity(
             user=request.user,
             action="order_cancelled",
@@ -0,0 +1,139 @@
+"""
+Read-through cache of serialized product payloads for the product detail view.
+
+Payloads live in the shared Django cache under a per-product version, with a
+small LRU in each process in front of it. Invalidating a product assigns it a
+new version, so every process stops serving its old payload on the next read;
+a lookup therefore costs one shared cache read for the version, and a second
+one only when the payload is not held locally.
+
+Invalidations only reach other processes through a cache they all share
+(``REDIS_URL``, see ``CACHES`` in the settings). With the per-process default,
+payloads held locally and in the process's own cache both expire after
+``PRODUCT_CACHE["TIMEOUT"]`` seconds, which bounds how long another process
+serves a product from before a change.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "products:detail:{id}:version"
+PAYLOAD_KEY = "products:detail:{id}:{version}"
+# Versions outlive the payloads stored under them by this factor, then expire
+# like the keys of deleted products do; an expired version costs one reload.
+VERSION_TIMEOUT_FACTOR = 10
+
+
+class ProductCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def options(self):
+        return settings.PRODUCT_CACHE
+
+    @property
+    def version_timeout(self):
+        return self.options["TIMEOUT"] * VERSION_TIMEOUT_FACTOR
+
+    def get(self, product_id, load):
+        """
+        Return the payload of ``product_id``, calling ``load()`` to build it on
+        a miss. ``load`` may raise (e.g. ``Http404``); nothing is cached then.
+        """
+        version_key = VERSION_KEY.format(id=product_id)
+        version = cache.get(version_key)
+        if version is not None:
+            with self._lock:
+                cached = self._local.get(product_id)
+                if (
+                    cached is not None
+                    and cached[0] == version
+                    and cached[2] > time.monotonic()
+                ):
+                    self._local.move_to_end(product_id)
+                    self.hits += 1
+                    return cached[1]
+
+            payload = cache.get(PAYLOAD_KEY.format(id=product_id, version=version))
+            if payload is not None:
+                self._remember(product_id, version, payload, "shared_hits")
+                return payload
+
+        payload = load()
+        if version is None:
+            # Only products that load get a version. If an invalidation set
+            # one meanwhile, the payload may predate it and is not cached.
+            version = uuid.uuid4().hex
+            if not cache.add(version_key, version, self.version_timeout):
+                with self._lock:
+                    self.misses += 1
+                return payload
+        cache.set(
+            PAYLOAD_KEY.format(id=product_id, version=version),
+            payload,
+            self.options["TIMEOUT"],
+        )
+        self._remember(product_id, version, payload, "misses")
+        return payload
+
+    def _remember(self, product_id, version, payload, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self._local[product_id] = (
+                version,
+                payload,
+                time.monotonic() + self.options["TIMEOUT"],
+            )
+            self._local.move_to_end(product_id)
+            while len(self._local) > self.options["LOCAL_SIZE"]:
+                self._local.popitem(last=False)
+
+    def invalidate(self, product_ids):
+        """
+        Give the products new versions once the current transaction commits,
+        so a concurrent read cannot cache the payload from before the change.
+        """
+        product_ids = list(product_ids)
+        if product_ids:
+            transaction.on_commit(lambda: self._bump(product_ids))
+
+    def _bump(self, product_ids):
+        cache.set_many(
+            {
+                VERSION_KEY.format(id=product_id): uuid.uuid4().hex
+                for product_id in product_ids
+            },
+            timeout=self.version_timeout,
+        )
+        with self._lock:
+            for product_id in product_ids:
+                self._local.pop(product_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "local_hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    round((self.hits + self.shared_hits) / lookups, 4)
+                    if lookups
+                    else None
+                ),
+                "local_size": len(self._local),
+            }
+
+
+product_cache = ProductCache()
@@ -0,0 +1,237 @@
+"""
+Bulk product import for the catalog sync.
+
+Rows come from a CSV or NDJSON stream and are processed in chunks: each chunk
+is validated without touching the database, categories and existing SKUs are
+looked up with one query each, new products get slugs from one prefix query,
+and everything is written with ``bulk_create`` upserting on ``sku``, once per
+set of columns: an existing product is only updated on the columns its row
+sets, the serializer defaults only apply to new ones.
+Every chunk is its own transaction and gets one summarized activity log.
+"""
+
+import codecs
+import csv
+import io
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from activity_logs.utils import log_activity
+from analytics.dashboard import invalidate_dashboard
+from products.cache import product_cache
+from products.models import Category, Product
+from products.search import update_search_vectors
+from products.slugs import allocate_slugs
+from products.stock import set_stock
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+UPDATE_FIELDS = [
+    "name",
+    "description",
+    "category",
+    "price",
+    "discount_price",
+    "stock_quantity",
+    "low_stock_threshold",
+    "image_url",
+    "is_active",
+    "updated_at",
+]
+
+
+class ProductImportSerializer(serializers.Serializer):
+    """
+    One import row. Unlike ``ProductSerializer`` it runs no per-row queries:
+    ``category`` (an id or a slug) is resolved per chunk and ``sku`` is the
+    upsert key rather than a uniqueness check.
+    """
+
+    sku = serializers.CharField(max_length=100)
+    name = serializers.CharField(max_length=200)
+    description = serializers.CharField(allow_blank=True, default="")
+    category = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    discount_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True, default=None
+    )
+    stock_quantity = serializers.IntegerField(default=0)
+    low_stock_threshold = serializers.IntegerField(default=10)
+    image_url = serializers.URLField(allow_null=True, allow_blank=True, default=None)
+    is_active = serializers.BooleanField(default=True)
+
+    def to_internal_value(self, data):
+        # CSV has no null: empty optional cells mean "not set".
+        data = {
+            key: value
+            for key, value in data.items()
+            if not (
+                value == "" and key in self.fields and not self.fields[key].required
+            )
+        }
+        return super().to_internal_value(data)
+
+
+def read_rows(stream, file_format):
+    """
+    Yield ``(line_number, row)`` from a binary or text stream. Rows that cannot
+    be decoded are yielded as ``(line_number, None)``.
+    """
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        # A StreamReader only needs read(), which the request object provides.
+        text = codecs.getreader("utf-8-sig")(stream)
+
+    if file_format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def import_products(rows, user=None, chunk_size=IMPORT_CHUNK_SIZE, request=None):
+    """
+    Upsert the products in ``rows`` (``(line_number, row)`` pairs, see
+    ``read_rows``). Invalid rows are skipped and reported; the rest are written.
+    Returns a summary with the created/updated/skipped counts and the first
+    ``MAX_REPORTED_ERRORS`` row errors.
+    """
+    summary = {"created": 0, "updated": 0, "skipped": 0, "errors": []}
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        created, updated, errors = _import_chunk(chunk)
+        summary["created"] += created
+        summary["updated"] += updated
+        summary["skipped"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(summary["errors"])
+        summary["errors"].extend(errors[:room])
+
+        log_activity(
+            user=user,
+            action="products_imported",
+            entity_type="product",
+            details={
+                "lines": [chunk[0][0], chunk[-1][0]],
+                "created": created,
+                "updated": updated,
+                "skipped": len(errors),
+            },
+            request=request,
+        )
+
+    if summary["created"] or summary["updated"]:
+        invalidate_dashboard()
+    return summary
+
+
+def _import_chunk(chunk):
+    errors = []
+    valid = {}
+    for line_number, row in chunk:
+        if row is None:
+            errors.append({"line": line_number, "errors": "Malformed row."})
+            continue
+        serializer = ProductImportSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({"line": line_number, "errors": serializer.errors})
+            continue
+        # A SKU repeated within a chunk: the last row wins.
+        valid[serializer.validated_data["sku"]] = (
+            line_number,
+            serializer.validated_data,
+            # The columns the row sets: all an existing product is updated on.
+            {key for key, value in row.items() if value != ""},
+        )
+
+    if not valid:
+        return 0, 0, errors
+
+    categories = _resolve_categories(data["category"] for _, data, _ in valid.values())
+    products = []
+    for sku, (line_number, data, _) in list(valid.items()):
+        category = categories.get(data["category"])
+        if category is None:
+            errors.append(
+                {"line": line_number, "errors": {"category": "Unknown category."}}
+            )
+            del valid[sku]
+            continue
+        products.append(Product(**{**data, "category": category}))
+
+    with transaction.atomic():
+        existing = dict(
+            Product.objects.filter(sku__in=valid).values_list("sku", "slug")
+        )
+        new_products = [product for product in products if product.sku not in existing]
+        slugs = allocate_slugs(Product, [product.name for product in new_products])
+        for product, slug in zip(new_products, slugs):
+            product.slug = slug
+        # New products are inserted whole, with defaults for the columns their
+        # row leaves out. Existing ones are only updated on the columns their
+        # row sets, with one upsert per set of columns.
+        batches = defaultdict(list)
+        for product in products:
+            fields = set(UPDATE_FIELDS)
+            if product.sku in existing:
+                # The insert conflicts on sku and the row keeps its slug, this
+                # only stops the proposed row from clashing with another slug.
+                product.slug = existing[product.sku]
+                fields &= valid[product.sku][2] | {"updated_at"}
+            batches[frozenset(fields)].append(product)
+        for fields, batch in batches.items():
+            Product.objects.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=["sku"],
+                update_fields=[field for field in UPDATE_FIELDS if field in fields],
+            )
+
+        if products:
+            imported = Product.objects.filter(sku__in=valid)
+            update_search_vectors(imported)
+            stocked = [
+                sku for sku, (_, _, given) in valid.items() if "stock_quantity" in given
+            ]
+            if stocked:
+                set_stock(
+                    dict(
+                        imported.filter(sku__in=stocked).values_list(
+                            "id", "stock_quantity"
+                        )
+                    )
+                )
+            product_cache.invalidate(imported.values_list("id", flat=True))
+
+    errors.sort(key=lambda error: error["line"])
+    return len(new_products), len(products) - len(new_products), errors
+
+
+def _resolve_categories(references):
+    """Map every category reference (id or slug) to its category, one query."""
+    references = set(references)
+    ids = {reference for reference in references if reference.isdigit()}
+    categories = Category.objects.filter(
+        Q(id__in=[int(reference) for reference in ids]) | Q(slug__in=references)
+    )
+    resolved = {}
+    for category in categories:
+        resolved[category.slug] = category
+        if str(category.id) in ids:
+            resolved[str(category.id)] = category
+    return resolved
@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import IMPORT_CHUNK_SIZE, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = "Upsert products by SKU from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, '-' for standard input.")
+        parser.add_argument(
+            "--file-format",
+            choices=["csv", "ndjson"],
+            help="Defaults to the file extension, csv for standard input.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"]
+        if file_format is None:
+            file_format = "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+        if path == "-":
+            summary = self.run(sys.stdin.buffer, file_format, options["chunk_size"])
+        else:
+            if not Path(path).is_file():
+                raise CommandError(f"{path} does not exist.")
+            with open(path, "rb") as stream:
+                summary = self.run(stream, file_format, options["chunk_size"])
+
+        for error in summary["errors"]:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {summary['created']}, updated {summary['updated']}, "
+                f"skipped {summary['skipped']} product(s)."
+            )
+        )
+
+    def run(self, stream, file_format, chunk_size):
+        return import_products(read_rows(stream, file_format), chunk_size=chunk_size)
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "is_active"], name="product_category_active_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(
+                    ("stock_quantity__lte", models.F("low_stock_threshold"))
+                ),
+                fields=["id"],
+                name="product_low_stock_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="category",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="products",
+                to="products.category",
+            ),
+        ),
+    ]
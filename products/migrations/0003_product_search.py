@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:20
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+TABLE = "products_product"
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Enable pg_trgm, index the search vector and the product name, and fill in
+    the vectors of the existing products. Index types outside Django's
+    portable ones are created here so the migration still runs on SQLite.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    from django.conf import settings
+
+    config = settings.PRODUCT_SEARCH_CONFIG
+    execute = schema_editor.execute
+    execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    execute(
+        f'CREATE INDEX "product_search_vector_idx" ON "{TABLE}" '
+        'USING gin ("search_vector")'
+    )
+    execute(
+        f'CREATE INDEX "product_name_trgm_idx" ON "{TABLE}" '
+        'USING gin ("name" gin_trgm_ops)'
+    )
+    execute(
+        f"""
+        UPDATE "{TABLE}" p SET "search_vector" =
+            setweight(to_tsvector(%s::regconfig, coalesce(p."name", '')), 'A')
+            || setweight(to_tsvector(%s::regconfig, coalesce(c."name", '')), 'B')
+            || setweight(to_tsvector(%s::regconfig, coalesce(p."description", '')), 'C')
+        FROM "products_category" c
+        WHERE c."id" = p."category_id"
+        """,
+        [config, config, config],
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS "product_name_trgm_idx"')
+    schema_editor.execute('DROP INDEX IF EXISTS "product_search_vector_idx"')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0002_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_stock_shards(apps, schema_editor):
+    """Spread the current stock of every product over its shards."""
+    from django.conf import settings
+
+    Product = apps.get_model("products", "Product")
+    StockShard = apps.get_model("products", "StockShard")
+    shards = settings.STOCK_SHARDS
+    batch = []
+    for product_id, quantity in Product.objects.values_list(
+        "id", "stock_quantity"
+    ).iterator():
+        share, remainder = divmod(max(quantity, 0), shards)
+        batch.extend(
+            StockShard(
+                product_id=product_id,
+                shard=shard,
+                quantity=share + (shard < remainder),
+            )
+            for shard in range(shards)
+        )
+        if len(batch) >= 5000:
+            StockShard.objects.bulk_create(batch)
+            batch = []
+    StockShard.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0004_category_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockReservation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hold", models.UUIDField(db_index=True)),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("quantity", models.PositiveIntegerField()),
+                ("expires_at", models.DateTimeField(db_index=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_reservations",
+                        to="products.product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StockShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_shards",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "shard"), name="stock_shard_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_stock_shards, migrations.RunPython.noop),
+    ]
@@ -1,19 +1,28 @@
-from django.db import models
-from django.utils.text import slugify
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+
+from products.slugs import allocate_slugs
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        from products.search import update_search_vectors
+
+        adding = self._state.adding
+        with transaction.atomic():
+            if not self.slug:
+                self.slug = allocate_slugs(Category, [self.name])[0]
+            super().save(*args, **kwargs)
+        if not adding:
+            update_search_vectors(self.products.all())
 
 
 class Product(models.Model):
@@ -21,8 +30,9 @@ class Product(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField()
 
+    # Indexed through Meta.indexes, where it leads the (category, is_active) index.
     category = models.ForeignKey(
-        Category, on_delete=models.CASCADE, related_name="products"
+        Category, on_delete=models.CASCADE, related_name="products", db_index=False
     )
 
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -30,6 +40,8 @@ class Product(models.Model):
         max_digits=10, decimal_places=2, null=True, blank=True
     )
 
+    # Set by admins; between edits a snapshot of the summed StockShard rows
+    # (see products.stock).
     stock_quantity = models.IntegerField(default=0)
     low_stock_threshold = models.IntegerField(default=10)
 
@@ -40,10 +52,97 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Maintained by products.search; its GIN index is created in migration 0003.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["category", "is_active"], name="product_category_active_idx"
+            ),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(stock_quantity__lte=models.F("low_stock_threshold")),
+                name="product_low_stock_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+    # stock_quantity as loaded from the database, see save().
+    _loaded_stock_quantity = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_stock_quantity = instance.__dict__.get("stock_quantity")
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        if fields is None or "stock_quantity" in fields:
+            self._loaded_stock_quantity = self.__dict__.get("stock_quantity")
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        from products.search import update_search_vectors
+        from products.stock import set_stock
+
+        update_fields = kwargs.get("update_fields")
+        stock_quantity = self.__dict__.get("stock_quantity")
+        with transaction.atomic():
+            if not self.slug:
+                self.slug = allocate_slugs(Product, [self.name])[0]
+            super().save(*args, **kwargs)
+            # Between edits stock_quantity is only a snapshot of the stock
+            # shards, so they are reset only when it was set: saved by name,
+            # changed, or given by an admin (see ProductSerializer.update).
+            if stock_quantity is not None and (
+                "stock_quantity" in (update_fields or ())
+                or (
+                    update_fields is None
+                    and stock_quantity != self._loaded_stock_quantity
+                )
+            ):
+                set_stock({self.pk: stock_quantity})
+                self._loaded_stock_quantity = stock_quantity
+        if update_fields is None or {"name", "description", "category"} & set(
+            update_fields
+        ):
+            update_search_vectors(Product.objects.filter(pk=self.pk))
+
+
+class StockShard(models.Model):
+    """One of the rows a product's available stock is split across."""
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_shards"
+    )
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "shard"], name="stock_shard_unique"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}/{self.shard}: {self.quantity}"
+
+
+class StockReservation(models.Model):
+    """Stock taken from a shard for a checkout until it is confirmed or expires."""
+
+    hold = models.UUIDField(db_index=True)
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_reservations"
+    )
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.hold}: {self.product_id} x {self.quantity}"
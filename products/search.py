@@ -0,0 +1,155 @@
+"""
+Ranked product search.
+
+On PostgreSQL every product keeps a weighted ``search_vector`` (name, then
+category name, then description) that is refreshed whenever a product or its
+category is saved. Queries use ``websearch_to_tsquery`` against its GIN index,
+and a trigram index on the name catches misspelt queries. Other databases
+(SQLite in tests and local development) fall back to an in-process inverted
+index with the same weights, rebuilt lazily after products change.
+"""
+
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Value, When
+
+from products.models import Category, Product
+
+# Relative weights of the name, category and description, matching the
+# default PostgreSQL ts_rank weights for A, B and C.
+WEIGHTS = (("name", 1.0), ("category__name", 0.4), ("description", 0.2))
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def search_products(queryset, query):
+    """
+    Filter ``queryset`` to the products matching ``query`` and annotate them
+    with a ``rank`` (higher is more relevant) to order by.
+    """
+    if connection.vendor == "postgresql":
+        return _search_postgres(queryset, query)
+    return _search_fallback(queryset, query)
+
+
+def update_search_vectors(queryset):
+    """Refresh the search vectors of the products in ``queryset``."""
+    if connection.vendor != "postgresql":
+        inverted_index.invalidate()
+        return
+    config = settings.PRODUCT_SEARCH_CONFIG
+    category_name = Category.objects.filter(id=OuterRef("category_id")).values("name")
+    queryset.update(
+        search_vector=SearchVector("name", weight="A", config=config)
+        + SearchVector(Subquery(category_name), weight="B", config=config)
+        + SearchVector("description", weight="C", config=config)
+    )
+
+
+def _search_postgres(queryset, query):
+    search_query = SearchQuery(
+        query, search_type="websearch", config=settings.PRODUCT_SEARCH_CONFIG
+    )
+    return queryset.annotate(
+        rank=SearchRank(F("search_vector"), search_query)
+        + TrigramSimilarity("name", query)
+    ).filter(Q(search_vector=search_query) | Q(name__trigram_similar=query))
+
+
+def _search_fallback(queryset, query):
+    scores = inverted_index.search(query)
+    if not scores:
+        return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(id__in=scores).annotate(
+        rank=Case(
+            *(
+                When(id=product_id, then=Value(score))
+                for product_id, score in scores.items()
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+class InvertedIndex:
+    """
+    Maps every token to the products containing it and their weighted term
+    frequency. A query matches the products containing every query term, as a
+    whole token or a token prefix, and ranks them by the summed weights.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._tokens = []
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._postings = None
+
+    def search(self, query):
+        terms = tokenize(query)
+        if not terms:
+            return {}
+        postings, tokens = self._load()
+
+        scores = None
+        for term in terms:
+            matches = defaultdict(float)
+            position = bisect_left(tokens, term)
+            while position < len(tokens) and tokens[position].startswith(term):
+                for product_id, weight in postings[tokens[position]].items():
+                    matches[product_id] += weight
+                position += 1
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    product_id: score + matches[product_id]
+                    for product_id, score in scores.items()
+                    if product_id in matches
+                }
+            if not scores:
+                return {}
+        return scores
+
+    def _load(self):
+        with self._lock:
+            if self._postings is not None:
+                return self._postings, self._tokens
+            generation = self._generation
+
+        postings = defaultdict(lambda: defaultdict(float))
+        fields = [name for name, _ in WEIGHTS]
+        for row in Product.objects.values_list("id", *fields).iterator():
+            for text, (_, weight) in zip(row[1:], WEIGHTS):
+                for token in tokenize(text):
+                    postings[token][row[0]] += weight
+        tokens = sorted(postings)
+
+        with self._lock:
+            # Keep the result only if no product changed while building it.
+            if generation == self._generation:
+                self._postings, self._tokens = postings, tokens
+        return postings, tokens
+
+
+inverted_index = InvertedIndex()
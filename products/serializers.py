@@ -13,5 +13,12 @@ class CategorySerializer(serializers.ModelSerializer):
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ("search_vector",)
         read_only_fields = ("slug",)  # Slug will be auto-generated
+
+    def update(self, instance, validated_data):
+        if "stock_quantity" in validated_data:
+            # Stock set by an admin replaces the shards even when it equals
+            # the snapshot, which may lag behind them.
+            instance._loaded_stock_quantity = None
+        return super().update(instance, validated_data)
@@ -0,0 +1,64 @@
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.text import slugify
+
+# Room kept for numeric suffixes when a base slug fills the whole column; the
+# prefix query is shortened by as much so truncated candidates are covered.
+SUFFIX_RESERVE = 8
+
+
+def allocate_slugs(model, names, field="slug"):
+    """
+    ``unique_slugs`` for rows about to be inserted in the current transaction.
+    On PostgreSQL it first takes a transaction-scoped advisory lock per table,
+    so concurrent writers allocate one after the other and each sees the
+    slugs the previous one committed. Other databases serialize writes anyway.
+    """
+    if not connection.in_atomic_block:
+        raise RuntimeError("allocate_slugs() must be called inside a transaction.")
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(%s))",
+                [f"slugs:{model._meta.db_table}"],
+            )
+    return unique_slugs(model, names, field)
+
+
+def unique_slugs(model, names, field="slug"):
+    """
+    Return one unused slug per name in ``names``, in order, for ``model``.
+    Existing slugs sharing a base are fetched with a single prefix query, and
+    collisions (with the table or within ``names``) get a ``-2``, ``-3``, ...
+    suffix, so a whole batch costs one round trip.
+    """
+    max_length = model._meta.get_field(field).max_length
+    bases = [slugify(name)[:max_length] or model._meta.model_name for name in names]
+    if not bases:
+        return []
+
+    taken = set(
+        model.objects.filter(
+            reduce(or_, (_candidates(field, base, max_length) for base in set(bases)))
+        ).values_list(field, flat=True)
+    )
+    slugs = []
+    for base in bases:
+        slug, number = base, 1
+        while slug in taken:
+            number += 1
+            suffix = f"-{number}"
+            slug = f"{base[: max_length - len(suffix)]}{suffix}"
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _candidates(field, base, max_length):
+    """Lookup matching ``base`` and every ``base-N`` it could be suffixed to."""
+    if len(base) > max_length - SUFFIX_RESERVE:
+        return Q(**{f"{field}__startswith": base[: max_length - SUFFIX_RESERVE]})
+    return Q(**{field: base}) | Q(**{f"{field}__startswith": f"{base}-"})
@@ -0,0 +1,397 @@
+"""
+Stock reservations over sharded stock counters.
+
+A product's available stock is split across ``STOCK_SHARDS`` ``StockShard``
+rows and is their sum, so concurrent checkouts of the same product usually
+update different rows instead of queueing on one. ``Product.stock_quantity``
+is what admins set; between edits it is a snapshot of the shards that the
+stock reservation job refreshes. Everything that shows or filters products by
+stock reads the snapshot, so a product shows the same figure everywhere; only
+checkouts work on the shards.
+
+A checkout reserves its stock first: ``reserve_stock`` takes the quantities
+from the shards and records them under a hold that expires after
+``STOCK_HOLD_TTL`` seconds. Placing the order confirms the hold. A released
+or expired hold gives its stock back to the shards it was taken from.
+"""
+
+import random
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.cache import product_cache
+from products.models import Product, StockReservation, StockShard
+
+RELEASE_BATCH_SIZE = 1000
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product, available):
+        self.product = product
+        self.available = available
+        super().__init__(
+            f"Not enough stock for product {product.name}. Available: {available}"
+        )
+
+
+class ReservationExpired(Exception):
+    def __init__(self, hold):
+        self.hold = hold
+        super().__init__("The stock reservation expired before the order was placed.")
+
+
+class ShardShortage(Exception):
+    """A randomly picked shard cannot cover its product's quantity."""
+
+
+def split_stock(quantity, shards):
+    """Spread ``quantity`` over ``shards`` shards as evenly as possible."""
+    share, remainder = divmod(max(quantity, 0), shards)
+    return [share + (shard < remainder) for shard in range(shards)]
+
+
+def stock_total(product="pk"):
+    """Expression summing the shards of the product referenced by ``product``."""
+    totals = (
+        StockShard.objects.filter(product=OuterRef(product))
+        .values("product")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return Coalesce(Subquery(totals), 0)
+
+
+def available_stock(product_ids):
+    """Return the available stock of the given products, keyed by id."""
+    totals = dict(
+        StockShard.objects.filter(product_id__in=product_ids)
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_id", "total")
+    )
+    return {product_id: totals.get(product_id, 0) for product_id in product_ids}
+
+
+@transaction.atomic
+def set_stock(quantities):
+    """
+    Make ``quantities`` ({product_id: quantity}) the stock of the products.
+    Open reservations have already taken part of it from the shards, so the
+    shards get the rest: releasing a hold brings the stock back to the
+    quantity set, not above it. Holds over a quantity lowered below them are
+    cut down to it, and fail to confirm.
+    """
+    shards = settings.STOCK_SHARDS
+    # Lock in the order releases do, the reservations first. Waiting for the
+    # shards then waits for checkouts taking stock from them right now.
+    reservations = list(
+        StockReservation.objects.select_for_update()
+        .filter(product_id__in=quantities)
+        .order_by("id")
+    )
+    list(
+        StockShard.objects.select_for_update()
+        .filter(product_id__in=quantities)
+        .order_by("product_id", "shard")
+        .values_list("id", flat=True)
+    )
+    # Read once the shards are locked, so holds placed meanwhile are counted.
+    held = dict(
+        StockReservation.objects.filter(product_id__in=quantities)
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_id", "total")
+    )
+    _trim_holds(
+        reservations,
+        {
+            product_id: total - quantities[product_id]
+            for product_id, total in held.items()
+            if total > quantities[product_id]
+        },
+    )
+    StockShard.objects.filter(product_id__in=quantities, shard__gte=shards).delete()
+    StockShard.objects.bulk_create(
+        [
+            StockShard(product_id=product_id, shard=shard, quantity=share)
+            for product_id, quantity in quantities.items()
+            for shard, share in enumerate(
+                split_stock(quantity - held.get(product_id, 0), shards)
+            )
+        ],
+        update_conflicts=True,
+        unique_fields=["product", "shard"],
+        update_fields=["quantity"],
+    )
+
+
+def _trim_holds(reservations, excess):
+    """Take ``excess`` ({product_id: quantity}) off the newest ``reservations``."""
+    if not excess:
+        return
+    trimmed, emptied = [], []
+    for reservation in reversed(reservations):
+        cut = min(excess.get(reservation.product_id, 0), reservation.quantity)
+        if not cut:
+            continue
+        excess[reservation.product_id] -= cut
+        reservation.quantity -= cut
+        (trimmed if reservation.quantity else emptied).append(reservation)
+    StockReservation.objects.filter(
+        id__in=[reservation.id for reservation in emptied]
+    ).delete()
+    StockReservation.objects.bulk_update(trimmed, ["quantity"])
+
+
+@transaction.atomic
+def reserve_stock(quantities, ttl=None):
+    """
+    Take ``quantities`` ({product_id: quantity}) from the shards and hold them
+    for ``ttl`` seconds (``STOCK_HOLD_TTL`` by default). Returns the hold to
+    confirm or release. Raises ``InsufficientStock`` (rolling back) if any
+    product cannot cover its quantity.
+    """
+    hold = uuid.uuid4()
+    expires_at = timezone.now() + timedelta(seconds=ttl or settings.STOCK_HOLD_TTL)
+    try:
+        with transaction.atomic():
+            taken = _take_from_random_shards(quantities)
+    except ShardShortage:
+        # Rolling back the savepoint released its locks. Products are taken in
+        # id order, so two checkouts never wait on each other in a cycle.
+        taken = {
+            product_id: _take(product_id, quantities[product_id])
+            for product_id in sorted(quantities)
+        }
+    StockReservation.objects.bulk_create(
+        StockReservation(
+            hold=hold,
+            product_id=product_id,
+            shard=shard,
+            quantity=quantity,
+            expires_at=expires_at,
+        )
+        for product_id, shares in taken.items()
+        for shard, quantity in shares
+    )
+    return hold
+
+
+def _take_from_random_shards(quantities):
+    """
+    Take each quantity from one random shard of its product, with one query
+    locking the shards and one UPDATE whatever the number of products. Raises
+    ``ShardShortage`` if any of the shards falls short.
+    """
+    shards = {
+        product_id: random.randrange(settings.STOCK_SHARDS) for product_id in quantities
+    }
+    # An UPDATE locks rows in no particular order, lock them in product order.
+    list(
+        StockShard.objects.select_for_update()
+        .filter(_shards(shards.items()))
+        .order_by("product_id")
+        .values_list("id", flat=True)
+    )
+    updated = StockShard.objects.filter(
+        reduce(
+            or_,
+            (
+                Q(
+                    product_id=product_id,
+                    shard=shard,
+                    quantity__gte=quantities[product_id],
+                )
+                for product_id, shard in shards.items()
+            ),
+        )
+    ).update(
+        quantity=F("quantity")
+        - Case(
+            *[
+                When(product_id=product_id, then=Value(quantities[product_id]))
+                for product_id in shards
+            ],
+            default=Value(0),
+        )
+    )
+    if updated != len(shards):
+        raise ShardShortage
+    return {
+        product_id: [(shard, quantities[product_id])]
+        for product_id, shard in shards.items()
+    }
+
+
+def _take(product_id, quantity):
+    """Take ``quantity`` of a product, returning the ``(shard, quantity)`` taken."""
+    # Another random shard may still cover the quantity on its own.
+    shard = random.randrange(settings.STOCK_SHARDS)
+    if StockShard.objects.filter(
+        product_id=product_id, shard=shard, quantity__gte=quantity
+    ).update(quantity=F("quantity") - quantity):
+        return [(shard, quantity)]
+
+    # Otherwise lock all of the product's shards and drain them in order.
+    shards = list(
+        StockShard.objects.select_for_update()
+        .filter(product_id=product_id)
+        .order_by("shard")
+    )
+    available = sum(stock_shard.quantity for stock_shard in shards)
+    if available < quantity:
+        raise InsufficientStock(Product.objects.get(id=product_id), available)
+
+    taken = []
+    remaining = quantity
+    for stock_shard in shards:
+        share = min(stock_shard.quantity, remaining)
+        if share:
+            taken.append((stock_shard.shard, share))
+            remaining -= share
+    StockShard.objects.filter(
+        product_id=product_id, shard__in=[shard for shard, _ in taken]
+    ).update(
+        quantity=F("quantity")
+        - Case(*[When(shard=shard, then=Value(share)) for shard, share in taken])
+    )
+    return taken
+
+
+@transaction.atomic
+def confirm_reservation(hold, quantities):
+    """
+    Turn the hold into a sale: its stock stays taken and the hold is deleted.
+    Raises ``ReservationExpired`` unless the hold still covers ``quantities``.
+    """
+    held = defaultdict(int)
+    reservations = StockReservation.objects.select_for_update().filter(
+        hold=hold, expires_at__gt=timezone.now()
+    )
+    for product_id, quantity in reservations.values_list("product_id", "quantity"):
+        held[product_id] += quantity
+    if held != quantities:
+        raise ReservationExpired(hold)
+    StockReservation.objects.filter(hold=hold).delete()
+
+
+@transaction.atomic
+def release_reservation(hold):
+    """Give the stock of ``hold`` back. Returns the number of rows released."""
+    return _release(StockReservation.objects.select_for_update().filter(hold=hold))
+
+
+def release_expired_reservations(batch_size=RELEASE_BATCH_SIZE):
+    """
+    Give the stock of every expired hold back, ``batch_size`` reservations per
+    transaction. Reservations being confirmed right now are skipped. Returns
+    the number released.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = (
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=timezone.now())
+                .order_by("id")[:batch_size]
+            )
+            count = _release(expired)
+        released += count
+        if count < batch_size:
+            return released
+
+
+@transaction.atomic
+def restore_stock(quantities):
+    """Put ``quantities`` ({product_id: quantity}) back, on a random shard each."""
+    _add_to_shards(
+        {
+            (product_id, random.randrange(settings.STOCK_SHARDS)): quantity
+            for product_id, quantity in quantities.items()
+        }
+    )
+
+
+def refresh_stock_snapshots():
+    """
+    Copy the summed shards into ``stock_quantity`` for the products where they
+    differ. Returns the number of products updated.
+    """
+    stale = Product.objects.alias(available=stock_total()).exclude(
+        stock_quantity=F("available")
+    )
+    product_ids = list(stale.values_list("id", flat=True))
+    if not product_ids:
+        return 0
+    updated = stale.filter(id__in=product_ids).update(
+        stock_quantity=stock_total(), updated_at=timezone.now()
+    )
+    product_cache.invalidate(product_ids)
+    return updated
+
+
+def _release(reservations):
+    """Give the stock of the locked ``reservations`` back and delete them."""
+    rows = list(reservations.values_list("id", "product_id", "shard", "quantity"))
+    if not rows:
+        return 0
+    amounts = defaultdict(int)
+    for _, product_id, shard, quantity in rows:
+        amounts[product_id, shard] += quantity
+    _add_to_shards(amounts)
+    StockReservation.objects.filter(id__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def _add_to_shards(amounts):
+    """Add ``amounts`` ({(product_id, shard): quantity}) with one UPDATE."""
+    if not amounts:
+        return
+    # An UPDATE locks rows in no particular order; lock them in the order
+    # reserve_stock uses first.
+    existing = set(
+        StockShard.objects.select_for_update()
+        .filter(_shards(amounts))
+        .order_by("product_id", "shard")
+        .values_list("product_id", "shard")
+    )
+    # Shards missing since STOCK_SHARDS was raised are created on first use.
+    StockShard.objects.bulk_create(
+        [
+            StockShard(product_id=product_id, shard=shard, quantity=quantity)
+            for (product_id, shard), quantity in amounts.items()
+            if (product_id, shard) not in existing
+        ]
+    )
+    if not existing:
+        return
+    StockShard.objects.filter(_shards(existing)).update(
+        quantity=F("quantity")
+        + Case(
+            *[
+                When(
+                    product_id=product_id,
+                    shard=shard,
+                    then=Value(amounts[product_id, shard]),
+                )
+                for product_id, shard in existing
+            ],
+            default=Value(0),
+        )
+    )
+
+
+def _shards(keys):
+    """Lookup matching the shards in ``keys`` ((product_id, shard) pairs)."""
+    return reduce(
+        or_, (Q(product_id=product_id, shard=shard) for product_id, shard in keys)
+    )
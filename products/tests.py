@@ -1,2 +1,788 @@
+import time as clock
+import uuid
+from copy import deepcopy
+from datetime import UTC, date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.http import Http404
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone as django_timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient, APITestCase
+
+from activity_logs.models import ActivityLog
+from authentication.choices import UserType
+from authentication.models import UserProfile
+from benchmarks.renderer import order_list, product_list, sales_rows
+from products.cache import (
+    PAYLOAD_KEY,
+    VERSION_KEY,
+    VERSION_TIMEOUT_FACTOR,
+    ProductCache,
+)
+from products.importer import import_products, read_rows
+from products.models import Category, Product, StockReservation, StockShard
+from products.slugs import unique_slugs
+from products.stock import (
+    InsufficientStock,
+    ReservationExpired,
+    available_stock,
+    confirm_reservation,
+    refresh_stock_snapshots,
+    release_expired_reservations,
+    release_reservation,
+    reserve_stock,
+    restore_stock,
+    set_stock,
+    split_stock,
+)
+from utils.custom_renderer import CustomJSONRenderer, FastJSONRenderer, orjson
+from utils.testing import QueryBudgetMixin, QueryPlanAssertionsMixin
+
+
+class ProductIndexTests(QueryPlanAssertionsMixin, APITestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        self.category = Category.objects.create(name="Books")
+        Product.objects.create(
+            name="Novel",
+            description="A novel.",
+            category=self.category,
+            price=10,
+            stock_quantity=2,
+            sku="BOOK-1",
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_product_list_filters_use_category_active_index(self):
+        self.assertSelectUsesIndex(
+            "products_product",
+            "product_category_active_idx",
+            self.client.get,
+            "/api/products/",
+            {"is_active": "true", "category": self.category.id},
+        )
+
+    def test_low_stock_list_uses_partial_index(self):
+        self.assertSelectUsesIndex(
+            "products_product",
+            "product_low_stock_idx",
+            self.client.get,
+            "/api/products/low-stock/",
+        )
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        shoes = Category.objects.create(name="Shoes")
+        Product.objects.create(
+            name="Trail Runner",
+            description="Grippy sole, cotton laces.",
+            category=shoes,
+            price=80,
+            sku="SHOE-1",
+        )
+        Product.objects.create(
+            name="Cotton Shirt",
+            description="Breathable, good for running.",
+            category=Category.objects.create(name="Shirts"),
+            price=20,
+            sku="SHIRT-1",
+        )
+
+    def search(self, query):
+        response = self.client.get("/api/products/search/", {"q": query})
+        return [product["name"] for product in response.json()["data"]["results"]]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search("cotton"), ["Cotton Shirt", "Trail Runner"])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search("shoes runner"), ["Trail Runner"])
+        self.assertEqual(self.search("shoes breathable"), [])
+
+    def test_saved_changes_are_searchable(self):
+        product = Product.objects.get(sku="SHIRT-1")
+        product.name = "Linen Shirt"
+        product.save()
+        self.assertEqual(self.search("linen"), ["Linen Shirt"])
+        self.assertEqual(self.search("cotton"), ["Trail Runner"])
+
+
+class SlugAllocationTests(APITestCase):
+    def test_duplicate_names_get_numbered_slugs(self):
+        category = Category.objects.create(name="Books")
+        self.assertEqual(Category.objects.create(name="books").slug, "books-2")
+        slugs = [
+            Product.objects.create(
+                name="Notebook", category=category, price=5, sku=f"NOTE-{number}"
+            ).slug
+            for number in range(3)
+        ]
+        self.assertEqual(slugs, ["notebook", "notebook-2", "notebook-3"])
+
+    def test_batch_allocation_takes_one_query(self):
+        category = Category.objects.create(name="Pens")
+        Product.objects.create(name="Pen", category=category, price=1, sku="PEN-1")
+        with self.assertNumQueries(1):
+            slugs = unique_slugs(Product, ["Pen", "Pen", "Pencil"])
+        self.assertEqual(slugs, ["pen-2", "pen-3", "pencil"])
+
+
+class ProductQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Query budgets per endpoint; lists hold enough rows to expose an N+1."""
+
+    def setUp(self):
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        self.categories = [
+            Category.objects.create(name=name) for name in ("Books", "Games", "Music")
+        ]
+        self.products = [
+            Product.objects.create(
+                name=f"Item {number}",
+                description="Something.",
+                category=self.categories[number % 3],
+                price=10,
+                stock_quantity=number,
+                sku=f"ITEM-{number}",
+            )
+            for number in range(6)
+        ]
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def test_category_list(self):
+        self.assertQueryBudget(2, self.client.get, "/api/products/categories/")
+
+    def test_category_create(self):
+        response = self.assertQueryBudget(
+            6, self.client.post, "/api/products/categories/", {"name": "Books"}
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_product_list(self):
+        self.assertQueryBudget(3, self.client.get, "/api/products/")
+
+    def test_product_list_search(self):
+        self.assertQueryBudget(4, self.client.get, "/api/products/", {"search": "item"})
+
+    def test_product_create(self):
+        response = self.assertQueryBudget(
+            14,
+            self.client.post,
+            "/api/products/",
+            {
+                "name": "Item 1",
+                "description": "Another.",
+                "category": self.categories[0].id,
+                "price": "5.00",
+                "stock_quantity": 4,
+                "sku": "ITEM-X",
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_product_import(self):
+        rows = "sku,name,category,price,stock_quantity\n" + "".join(
+            f"IMPORT-{number},Import {number},books,3.00,5\n" for number in range(3)
+        )
+        response = self.assertQueryBudget(
+            16,
+            self.client.post,
+            "/api/products/import/?file_format=csv",
+            rows,
+            content_type="text/csv",
+        )
+        self.assertEqual(response.json()["data"]["created"], 3)
+
+    def test_product_detail(self):
+        url = f"/api/products/{self.products[0].id}/"
+        self.assertQueryBudget(1, self.client.get, url)
+        # Served from the cache, ETag included.
+        self.assertQueryBudget(0, self.client.get, url)
+
+    def test_product_update(self):
+        response = self.assertQueryBudget(
+            6,
+            self.client.put,
+            f"/api/products/{self.products[0].id}/",
+            {"name": "Renamed"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_product_delete(self):
+        response = self.assertQueryBudget(
+            7, self.client.delete, f"/api/products/{self.products[0].id}/"
+        )
+        self.assertEqual(response.status_code, 204)
+
+    def test_product_search(self):
+        self.assertQueryBudget(
+            3, self.client.get, "/api/products/search/", {"q": "item"}
+        )
+
+    def test_low_stock_list(self):
+        self.assertQueryBudget(2, self.client.get, "/api/products/low-stock/")
+
+    def test_cache_stats(self):
+        self.assertQueryBudget(0, self.client.get, "/api/products/cache-stats/")
+
+
+class ProductCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = ProductCache()
+        self.load = mock.Mock(
+            side_effect=lambda: {"id": 1, "loads": self.load.call_count}
+        )
+
+    def test_read_through(self):
+        self.assertEqual(self.cache.get(1, self.load), {"id": 1, "loads": 1})
+        self.assertEqual(self.cache.get(1, self.load), {"id": 1, "loads": 1})
+        # Another process has nothing held locally but finds the shared payload.
+        other = ProductCache()
+        self.assertEqual(other.get(1, self.load), {"id": 1, "loads": 1})
+        self.assertEqual(self.load.call_count, 1)
+        self.assertEqual(
+            (self.cache.hits, self.cache.shared_hits, self.cache.misses), (1, 0, 1)
+        )
+        self.assertEqual((other.hits, other.shared_hits, other.misses), (0, 1, 0))
+
+    def test_load_errors_are_not_cached(self):
+        load = mock.Mock(side_effect=Http404)
+        with self.assertRaises(Http404):
+            self.cache.get(1, load)
+        # Missing products leave no keys behind.
+        self.assertIsNone(cache.get(VERSION_KEY.format(id=1)))
+        self.assertEqual(self.cache.get(1, self.load), {"id": 1, "loads": 1})
+
+    def test_invalidation_while_loading_is_not_cached_over(self):
+        def load():
+            self.cache._bump([1])
+            return self.load()
+
+        self.assertEqual(self.cache.get(1, load), {"id": 1, "loads": 1})
+        self.assertEqual(self.cache.get(1, self.load), {"id": 1, "loads": 2})
+        self.assertEqual(self.cache.get(1, self.load), {"id": 1, "loads": 2})
+
+    @override_settings(PRODUCT_CACHE={"LOCAL_SIZE": 8, "TIMEOUT": 300})
+    def test_versions_expire(self):
+        self.cache.get(1, self.load)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cache.invalidate([2])
+        later = clock.time() + 300 * VERSION_TIMEOUT_FACTOR + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time") as now:
+            now.return_value = later - 2
+            self.assertIsNotNone(cache.get(VERSION_KEY.format(id=1)))
+            now.return_value = later
+            self.assertIsNone(cache.get(VERSION_KEY.format(id=1)))
+            self.assertIsNone(cache.get(VERSION_KEY.format(id=2)))
+
+    def test_invalidate_after_commit(self):
+        other = ProductCache()
+        self.cache.get(1, self.load)
+        other.get(1, self.load)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cache.invalidate([1])
+            # Nothing changes before the transaction commits.
+            self.assertEqual(other.get(1, self.load), {"id": 1, "loads": 1})
+        self.assertEqual(self.cache.get(1, self.load), {"id": 1, "loads": 2})
+        # The other process sees the new version and drops its local copy.
+        self.assertEqual(other.get(1, self.load), {"id": 1, "loads": 2})
+        self.assertEqual(self.load.call_count, 2)
+
+    @override_settings(PRODUCT_CACHE={"LOCAL_SIZE": 2, "TIMEOUT": 300})
+    def test_local_lru_eviction(self):
+        for product_id in (1, 2):
+            self.cache.get(product_id, self.load)
+        self.cache.get(1, self.load)  # 2 is now the least recently used
+        self.cache.get(3, self.load)
+        self.assertEqual(list(self.cache._local), [1, 3])
+        self.assertEqual(self.cache.stats()["local_size"], 2)
+
+    @override_settings(PRODUCT_CACHE={"LOCAL_SIZE": 8, "TIMEOUT": 300})
+    def test_local_entries_expire(self):
+        with mock.patch("products.cache.time.monotonic", return_value=1000.0):
+            self.cache.get(1, self.load)
+        cache.delete(
+            PAYLOAD_KEY.format(id=1, version=cache.get(VERSION_KEY.format(id=1)))
+        )
+        with mock.patch("products.cache.time.monotonic", return_value=1299.0):
+            self.assertEqual(self.cache.get(1, self.load), {"id": 1, "loads": 1})
+        # Past TIMEOUT the local copy is not trusted even if the version, which
+        # a per-process cache never sees change, still matches.
+        with mock.patch("products.cache.time.monotonic", return_value=1301.0):
+            self.assertEqual(self.cache.get(1, self.load), {"id": 1, "loads": 2})
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = UserProfile.objects.create_user(
+            "admin", password="secret", user_type=UserType.ADMIN
+        )
+        self.category = Category.objects.create(name="Books")
+        self.product = Product.objects.create(
+            name="Novel",
+            category=self.category,
+            price=10,
+            stock_quantity=5,
+            sku="NOVEL",
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_detail_not_modified(self):
+        url = f"/api/products/{self.product.id}/"
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(
+            response["Last-Modified"], http_date(self.product.updated_at.timestamp())
+        )
+
+    def test_detail_etag_follows_edits_and_stock_snapshot(self):
+        url = f"/api/products/{self.product.id}/"
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(url, {"name": "Renamed"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["name"], "Renamed")
+        self.assertNotEqual(response["ETag"], etag)
+
+        # Checkouts leave the snapshot every view shows until it is refreshed.
+        etag = response["ETag"]
+        restore_stock({self.product.id: 2})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_stock_snapshots()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["stock_quantity"], 7)
+
+    def test_detail_missing_product(self):
+        response = self.client.get("/api/products/999999/")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_list_validators(self):
+        response = self.client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        self.assertEqual(last_modified, http_date(self.product.updated_at.timestamp()))
+
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            "/api/products/", HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+        # The ETag covers the query string.
+        response = self.client.get(
+            "/api/products/", {"is_active": "true"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_changes_after_delete(self):
+        Product.objects.create(name="Atlas", category=self.category, price=3, sku="A")
+        etag = self.client.get("/api/products/")["ETag"]
+        # The latest edit stays the same, the count catches the deletion.
+        self.product.delete()
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_modified_since_older_date(self):
+        since = http_date((self.product.updated_at - timedelta(days=1)).timestamp())
+        response = self.client.get("/api/products/", HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+
+    def test_category_list_not_modified(self):
+        etag = self.client.get("/api/products/categories/")["ETag"]
+        response = self.client.get("/api/products/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Category.objects.create(name="Games")
+        response = self.client.get("/api/products/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]), 2)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """FastJSONRenderer must render exactly what the stdlib renderer does."""
+
+    def render(self, renderer, data, status_code=200):
+        response = SimpleNamespace(status_code=status_code, status_text="Status")
+        return renderer.render(data, "application/json", {"response": response})
+
+    def assertSameOutput(self, data, status_code=200):
+        expected = self.render(CustomJSONRenderer(), deepcopy(data), status_code)
+        actual = self.render(FastJSONRenderer(), deepcopy(data), status_code)
+        self.assertEqual(actual, expected)
+
+    def test_api_payloads(self):
+        payloads = {
+            "products": product_list(50),
+            "orders": order_list(20),
+            "sales": sales_rows(50),
+        }
+        for label, payload in payloads.items():
+            with self.subTest(label):
+                self.assertSameOutput(payload)
+
+    def test_edge_values(self):
+        self.assertSameOutput(
+            {
+                "text": 'quote " slash \\ ünïcode 🚀 \u2028 \u2029 \x00',
+                "utc": datetime(2025, 1, 1, 12, 30, 0, 123456, tzinfo=UTC),
+                "offset": datetime(2025, 1, 1, tzinfo=timezone(timedelta(hours=2))),
+                "naive": datetime(2025, 1, 1),
+                "day": date(2025, 1, 1),
+                "time": time(8, 15),
+                "decimal": Decimal("12.50"),
+                "uuid": uuid.UUID(int=1),
+                "keys": {1: "int key", "nested": [None, True, 1.5, -0.25]},
+                "big": 2**70,
+            }
+        )
+
+    def test_envelopes(self):
+        self.assertSameOutput({"message": "Done", "data": []})
+        self.assertSameOutput("plain message")
+        self.assertSameOutput([1, 2, 3])
+        self.assertSameOutput({"name": ["This field is required."]}, status_code=400)
+        self.assertSameOutput({"detail": "Not found."}, status_code=404)
+        self.assertSameOutput(None)
+
+    def test_encodes_with_orjson(self):
+        with mock.patch.object(orjson, "dumps", wraps=orjson.dumps) as dumps:
+            self.render(FastJSONRenderer(), {"id": 1})
+        dumps.assert_called_once()
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        self.books = Category.objects.create(name="Books")
+        self.games = Category.objects.create(name="Games")
+        self.novel = Product.objects.create(
+            name="Novel",
+            category=self.books,
+            price=10,
+            stock_quantity=1,
+            sku="NOVEL",
+        )
+
+    def run_import(self, content, file_format="csv", **kwargs):
+        stream = BytesIO(content.encode("utf-8-sig"))
+        return import_products(read_rows(stream, file_format), **kwargs)
+
+    def test_inserts_and_updates_by_sku(self):
+        summary = self.run_import(
+            "sku,name,category,price,stock_quantity\n"
+            f"NOVEL,Great Novel,{self.games.id},12.50,7\n"
+            "ATLAS,Atlas,books,30,4\n"
+        )
+        self.assertEqual(
+            summary, {"created": 1, "updated": 1, "skipped": 0, "errors": []}
+        )
+
+        novel = Product.objects.get(sku="NOVEL")
+        self.assertEqual(novel.id, self.novel.id)
+        self.assertEqual(
+            (novel.name, novel.category, novel.price, novel.stock_quantity),
+            ("Great Novel", self.games, Decimal("12.50"), 7),
+        )
+        atlas = Product.objects.get(sku="ATLAS")
+        self.assertEqual((atlas.category, atlas.is_active), (self.books, True))
+        self.assertEqual(
+            available_stock([novel.id, atlas.id]), {novel.id: 7, atlas.id: 4}
+        )
+
+    def test_partial_rows_leave_other_fields_unchanged(self):
+        Product.objects.filter(id=self.novel.id).update(
+            description="keep me",
+            discount_price=5,
+            low_stock_threshold=3,
+            is_active=False,
+        )
+        self.novel.refresh_from_db()
+        self.novel.stock_quantity = 50
+        self.novel.save()
+        summary = self.run_import(
+            "sku,name,category,price,description,stock_quantity\n"
+            "NOVEL,Novel 2,books,11,,\n"
+            "FRESH,Fresh,books,1,,\n"
+        )
+        self.assertEqual((summary["created"], summary["updated"]), (1, 1))
+
+        novel = Product.objects.get(sku="NOVEL")
+        self.assertEqual((novel.name, novel.price), ("Novel 2", Decimal("11.00")))
+        self.assertEqual(
+            (
+                novel.description,
+                novel.discount_price,
+                novel.stock_quantity,
+                novel.low_stock_threshold,
+                novel.is_active,
+            ),
+            ("keep me", Decimal("5.00"), 50, 3, False),
+        )
+        self.assertEqual(available_stock([novel.id]), {novel.id: 50})
+        # New products get the defaults.
+        fresh = Product.objects.get(sku="FRESH")
+        self.assertEqual(
+            (fresh.description, fresh.stock_quantity, fresh.low_stock_threshold),
+            ("", 0, 10),
+        )
+
+        # A row giving the stock does reset it.
+        self.run_import(
+            "sku,name,category,price,stock_quantity\nNOVEL,Novel,books,11,8\n"
+        )
+        self.assertEqual(available_stock([novel.id]), {novel.id: 8})
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        summary = self.run_import(
+            "sku,name,category,price\n"
+            "GOOD,Good,books,1\n"
+            "BAD-PRICE,Bad,books,free\n"
+            ",No Sku,books,1\n"
+            "LOST,Lost,poetry,1\n"
+        )
+        self.assertEqual((summary["created"], summary["skipped"]), (1, 3))
+        self.assertEqual([error["line"] for error in summary["errors"]], [3, 4, 5])
+        self.assertIn("price", summary["errors"][0]["errors"])
+        self.assertIn("sku", summary["errors"][1]["errors"])
+        self.assertEqual(
+            summary["errors"][2]["errors"], {"category": "Unknown category."}
+        )
+        self.assertEqual(
+            set(Product.objects.values_list("sku", flat=True)), {"NOVEL", "GOOD"}
+        )
+
+    def test_ndjson(self):
+        summary = self.run_import(
+            '{"sku": "A", "name": "A", "category": "books", "price": "1"}\n'
+            "\n"
+            "not json\n"
+            '["not", "an", "object"]\n'
+            '{"sku": "B", "name": "B", "category": "games", "price": "2",'
+            ' "discount_price": null}\n',
+            file_format="ndjson",
+        )
+        self.assertEqual((summary["created"], summary["skipped"]), (2, 2))
+        self.assertEqual(
+            summary["errors"],
+            [
+                {"line": 3, "errors": "Malformed row."},
+                {"line": 4, "errors": "Malformed row."},
+            ],
+        )
+
+    def test_chunks(self):
+        rows = "sku,name,category,price\n" + "".join(
+            f"SKU-{number},Item {number},books,1\n" for number in range(5)
+        )
+        # The repeated SKU lands in a later chunk and updates the row.
+        rows += "SKU-0,Item zero,books,2\nbroken\n"
+        summary = self.run_import(rows, chunk_size=2)
+        self.assertEqual(
+            (summary["created"], summary["updated"], summary["skipped"]), (5, 1, 1)
+        )
+        self.assertEqual(Product.objects.get(sku="SKU-0").name, "Item zero")
+        logs = ActivityLog.objects.filter(action="products_imported").order_by("id")
+        self.assertEqual(
+            [log.details["lines"] for log in logs], [[2, 3], [4, 5], [6, 7], [8, 8]]
+        )
+
+    def test_repeated_sku_in_a_chunk_keeps_the_last_row(self):
+        summary = self.run_import(
+            "sku,name,category,price\nDUP,First,books,1\nDUP,Second,books,2\n"
+        )
+        self.assertEqual((summary["created"], summary["updated"]), (1, 0))
+        self.assertEqual(Product.objects.get(sku="DUP").name, "Second")
+
+    def test_slugs(self):
+        summary = self.run_import(
+            "sku,name,category,price\n"
+            "NOVEL-2,Novel,books,1\n"
+            "NOVEL-3,Novel,books,1\n"
+            "NOVEL,Renamed,books,1\n"
+        )
+        self.assertEqual((summary["created"], summary["updated"]), (2, 1))
+        self.assertEqual(
+            dict(Product.objects.values_list("sku", "slug")),
+            # An updated product keeps its slug.
+            {"NOVEL": "novel", "NOVEL-2": "novel-2", "NOVEL-3": "novel-3"},
+        )
+
+    def test_reported_errors_are_capped(self):
+        rows = "sku,name,category,price\n" + "x,x,books,nope\n" * 5
+        with mock.patch("products.importer.MAX_REPORTED_ERRORS", 2):
+            summary = self.run_import(rows, chunk_size=2)
+        self.assertEqual(summary["skipped"], 5)
+        self.assertEqual([error["line"] for error in summary["errors"]], [2, 3])
+
+    def test_endpoint(self):
+        client = APIClient()
+        url = "/api/products/import/?file_format=ndjson"
+        row = '{"sku": "A", "name": "A", "category": "books", "price": "1"}\n'
+        client.force_authenticate(UserProfile.objects.create_user("customer"))
+        response = client.post(url, row, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 403)
+
+        client.force_authenticate(
+            UserProfile.objects.create_user("admin", user_type=UserType.ADMIN)
+        )
+        response = client.post(url, row, content_type="application/x-ndjson")
+        self.assertEqual(
+            response.json()["data"],
+            {"created": 1, "updated": 0, "skipped": 0, "errors": []},
+        )
+        response = client.post(
+            "/api/products/import/?file_format=xml", row, content_type="text/xml"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(STOCK_SHARDS=4)
+class StockTests(APITestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Novel",
+            category=Category.objects.create(name="Books"),
+            price=10,
+            stock_quantity=10,
+            sku="NOVEL",
+        )
+        self.id = self.product.id
+
+    def available(self):
+        return available_stock([self.id])[self.id]
+
+    def shards(self):
+        return list(
+            StockShard.objects.filter(product=self.product)
+            .order_by("shard")
+            .values_list("quantity", flat=True)
+        )
+
+    def test_split_stock(self):
+        self.assertEqual(split_stock(10, 4), [3, 3, 2, 2])
+        self.assertEqual(split_stock(-1, 2), [0, 0])
+        self.assertEqual(self.shards(), [3, 3, 2, 2])
+
+    def test_reserve_confirm_release(self):
+        hold = reserve_stock({self.id: 3})
+        self.assertEqual(self.available(), 7)
+        confirm_reservation(hold, {self.id: 3})
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(self.available(), 7)
+
+        hold = reserve_stock({self.id: 2})
+        self.assertEqual(release_reservation(hold), 1)
+        self.assertEqual(self.available(), 7)
+        self.assertEqual(release_reservation(hold), 0)
+
+    def test_expired_holds(self):
+        first = reserve_stock({self.id: 1}, ttl=60)
+        reserve_stock({self.id: 2}, ttl=60)
+        later = django_timezone.now() + timedelta(seconds=61)
+        with mock.patch("products.stock.timezone.now", return_value=later):
+            with self.assertRaises(ReservationExpired):
+                confirm_reservation(first, {self.id: 1})
+            self.assertEqual(release_expired_reservations(batch_size=1), 2)
+        self.assertEqual(self.available(), 10)
+
+    def test_oversell(self):
+        hold = reserve_stock({self.id: 8})
+        with self.assertRaises(InsufficientStock) as raised:
+            reserve_stock({self.id: 3})
+        self.assertEqual(raised.exception.available, 2)
+        self.assertEqual(self.available(), 2)
+        self.assertEqual(
+            sum(
+                StockReservation.objects.filter(hold=hold).values_list(
+                    "quantity", flat=True
+                )
+            ),
+            8,
+        )
+
+    def test_quantity_no_shard_covers_is_taken_across_shards(self):
+        # No shard holds 5, so the hold drains the shards in order.
+        hold = reserve_stock({self.id: 5})
+        self.assertEqual(self.shards(), [0, 1, 2, 2])
+        self.assertEqual(
+            list(
+                StockReservation.objects.filter(hold=hold)
+                .order_by("shard")
+                .values_list("shard", "quantity")
+            ),
+            [(0, 3), (1, 2)],
+        )
+        release_reservation(hold)
+        self.assertEqual(self.shards(), [3, 3, 2, 2])
+
+    def test_take_retries_another_shard(self):
+        # The first pick (shard 2) cannot cover 3, the second (shard 0) can.
+        with mock.patch("products.stock.random.randrange", side_effect=[2, 0]):
+            reserve_stock({self.id: 3})
+        self.assertEqual(self.shards(), [0, 3, 2, 2])
+
+    def test_set_stock_nets_out_holds(self):
+        hold = reserve_stock({self.id: 3})
+        set_stock({self.id: 20})
+        self.assertEqual(self.available(), 17)
+        release_reservation(hold)
+        self.assertEqual(self.available(), 20)
+
+    def test_set_stock_below_the_held_stock_trims_the_newest_holds(self):
+        first = reserve_stock({self.id: 3})
+        second = reserve_stock({self.id: 4})
+        set_stock({self.id: 5})
+        self.assertEqual(self.available(), 0)
+        self.assertEqual(StockReservation.objects.get(hold=second).quantity, 2)
+        with self.assertRaises(ReservationExpired):
+            confirm_reservation(second, {self.id: 4})
+        confirm_reservation(first, {self.id: 3})
+        release_reservation(second)
+        self.assertEqual(self.available(), 2)
+
+    def test_admin_stock_is_always_pushed_to_the_shards(self):
+        confirm_reservation(reserve_stock({self.id: 4}), {self.id: 4})
+        self.assertEqual(self.available(), 6)
+
+        # Saving other fields keeps the stock checkouts left.
+        self.product.name = "Renamed"
+        self.product.save()
+        self.assertEqual(self.available(), 6)
+
+        # An admin setting the figure the stale snapshot still shows.
+        self.client.force_authenticate(
+            UserProfile.objects.create_user("admin", user_type=UserType.ADMIN)
+        )
+        self.client.put(f"/api/products/{self.id}/", {"stock_quantity": 10})
+        self.assertEqual(self.available(), 10)
+
+    def test_every_view_shows_the_snapshot(self):
+        confirm_reservation(reserve_stock({self.id: 4}), {self.id: 4})
+        self.assertEqual(refresh_stock_snapshots(), 1)
+        self.assertEqual(refresh_stock_snapshots(), 0)
+        self.client.force_authenticate(
+            UserProfile.objects.create_user("admin", user_type=UserType.ADMIN)
+        )
+        figures = [
+            self.client.get(url).json()["data"]["results"][0]["stock_quantity"]
+            for url in ("/api/products/", "/api/products/low-stock/")
+        ]
+        detail = self.client.get(f"/api/products/{self.id}/").json()["data"]
+        self.assertEqual(figures + [detail["stock_quantity"]], [6, 6, 6])
@@ -3,6 +3,8 @@ from django.urls import path
 from products.views import (
     CategoryListCreateAPIView,
     LowStockProductsAPIView,
+    ProductCacheStatsAPIView,
+    ProductImportAPIView,
     ProductListCreateAPIView,
     ProductRetrieveUpdateDestroyAPIView,
     ProductSearchAPIView,
@@ -19,5 +21,9 @@ urlpatterns = [
         name="product-detail",
     ),
     path("search/", ProductSearchAPIView.as_view(), name="product-search"),
+    path("import/", ProductImportAPIView.as_view(), name="product-import"),
     path("low-stock/", LowStockProductsAPIView.as_view(), name="product-low-stock"),
+    path(
+        "cache-stats/", ProductCacheStatsAPIView.as_view(), name="product-cache-stats"
+    ),
 ]
@@ -1,16 +1,23 @@
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.db import models
-from django.db.models import Q
+from django.db.models import Count, Max
 from django.http import Http404
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from activity_logs.utils import log_activity
+from analytics.dashboard import invalidate_dashboard
 from authentication.choices import UserType
+from products.cache import product_cache
+from products.importer import import_products, read_rows
 from products.models import Category, Product
+from products.search import search_products
 from products.serializers import CategorySerializer, ProductSerializer
+from utils.conditional import conditional_get, make_etag
+from utils.exports import get_file_format
+from utils.pagination import paginate_queryset
 
 
 class CategoryListCreateAPIView(APIView):
@@ -18,8 +25,13 @@ class CategoryListCreateAPIView(APIView):
 
     def get(self, request):
         queryset = Category.objects.all()
-        serializer = CategorySerializer(queryset, many=True)
-        return Response(serializer.data)
+        validators = queryset.aggregate(count=Count("id"), last=Max("updated_at"))
+        return conditional_get(
+            request,
+            make_etag(request.get_full_path(), validators["count"], validators["last"]),
+            validators["last"],
+            lambda: Response(CategorySerializer(queryset, many=True).data),
+        )
 
     def post(self, request):
         if not request.user.user_type == UserType.ADMIN.value:
@@ -56,35 +68,26 @@ class ProductListCreateAPIView(APIView):
             queryset = queryset.filter(is_active=is_active.lower() == "true")
 
         # Searching
+        ordering = ("id",)
         search_query = request.query_params.get("search")
         if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query)
-                | Q(description__icontains=search_query)
-                | Q(category__name__icontains=search_query)
-            )
+            queryset = search_products(queryset, search_query)
+            ordering = ("-rank", "id")
 
-        # Pagination
-        page = request.query_params.get("page", 1)
-        page_size = request.query_params.get("page_size", 10)
-        paginator = Paginator(queryset, page_size)
+        # Conditional GET: the count catches deletions, max(updated_at) edits.
+        validators = queryset.aggregate(count=Count("id"), last=Max("updated_at"))
+        etag = make_etag(
+            request.get_full_path(), validators["count"], validators["last"]
+        )
 
-        try:
-            products = paginator.page(page)
-        except PageNotAnInteger:
-            products = paginator.page(1)
-        except EmptyPage:
-            products = paginator.page(paginator.num_pages)
+        def build_response():
+            products, pagination = paginate_queryset(
+                request, queryset, ordering=ordering
+            )
+            serializer = ProductSerializer(products, many=True)
+            return Response({**pagination, "results": serializer.data})
 
-        serializer = ProductSerializer(products, many=True)
-        return Response(
-            {
-                "count": paginator.count,
-                "num_pages": paginator.num_pages,
-                "current_page": products.number,
-                "results": serializer.data,
-            }
-        )
+        return conditional_get(request, etag, validators["last"], build_response)
 
     def post(self, request):
         if not request.user.user_type == UserType.ADMIN.value:
@@ -95,6 +98,7 @@ class ProductListCreateAPIView(APIView):
         serializer = ProductSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         product = serializer.save()
+        invalidate_dashboard()
         log_activity(
             user=request.user,
             action="product_created",
@@ -106,6 +110,32 @@ class ProductListCreateAPIView(APIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class ProductImportAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Upsert products by SKU from a CSV or NDJSON request body
+        (``?file_format=csv|ndjson``). The body is read as a stream, so large
+        catalogs are processed chunk by chunk.
+        """
+        if not request.user.user_type == UserType.ADMIN.value:
+            return Response(
+                {"detail": "You do not have permission to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        file_format = get_file_format(request.query_params)
+        if request.stream is None:
+            return Response(
+                {"detail": "The request body is empty."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        summary = import_products(
+            read_rows(request.stream, file_format), user=request.user, request=request
+        )
+        return Response(summary)
+
+
 class ProductRetrieveUpdateDestroyAPIView(APIView):
     permission_classes = [AllowAny]  # Public for GET, Admin for PUT/DELETE
 
@@ -116,9 +146,18 @@ class ProductRetrieveUpdateDestroyAPIView(APIView):
             raise Http404
 
     def get(self, request, id):
-        product = self.get_object(id)
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
+        def load():
+            return ProductSerializer(self.get_object(id)).data
+
+        payload = product_cache.get(id, load)
+        # The validators come from the cached payload, so a cache hit runs no
+        # query. Refreshing the stock snapshot moves updated_at too.
+        return conditional_get(
+            request,
+            make_etag(id, payload["updated_at"], payload["stock_quantity"]),
+            parse_datetime(payload["updated_at"]),
+            lambda: Response(payload),
+        )
 
     def put(self, request, id):
         if not request.user.user_type == UserType.ADMIN.value:
@@ -130,6 +169,8 @@ class ProductRetrieveUpdateDestroyAPIView(APIView):
         serializer = ProductSerializer(product, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         product = serializer.save()
+        invalidate_dashboard()
+        product_cache.invalidate([product.id])
         log_activity(
             user=request.user,
             action="product_updated",
@@ -149,6 +190,8 @@ class ProductRetrieveUpdateDestroyAPIView(APIView):
         product = self.get_object(id)
         product_data = ProductSerializer(product).data
         product.delete()
+        invalidate_dashboard()
+        product_cache.invalidate([id])
         log_activity(
             user=request.user,
             action="product_deleted",
@@ -165,34 +208,15 @@ class ProductSearchAPIView(APIView):
 
     def get(self, request):
         search_query = request.query_params.get("q", "")
+        queryset = Product.objects.all()
+        ordering = ("id",)
         if search_query:
-            queryset = Product.objects.filter(
-                Q(name__icontains=search_query)
-                | Q(category__name__icontains=search_query)
-            )
-        else:
-            queryset = Product.objects.all()
-
-        page = request.query_params.get("page", 1)
-        page_size = request.query_params.get("page_size", 10)
-        paginator = Paginator(queryset, page_size)
-
-        try:
-            products = paginator.page(page)
-        except PageNotAnInteger:
-            products = paginator.page(1)
-        except EmptyPage:
-            products = paginator.page(paginator.num_pages)
+            queryset = search_products(queryset, search_query)
+            ordering = ("-rank", "id")
 
+        products, pagination = paginate_queryset(request, queryset, ordering=ordering)
         serializer = ProductSerializer(products, many=True)
-        return Response(
-            {
-                "count": paginator.count,
-                "num_pages": paginator.num_pages,
-                "current_page": products.number,
-                "results": serializer.data,
-            }
-        )
+        return Response({**pagination, "results": serializer.data})
 
 
 class LowStockProductsAPIView(APIView):
@@ -208,23 +232,19 @@ class LowStockProductsAPIView(APIView):
             stock_quantity__lte=models.F("low_stock_threshold")
         )
 
-        page = request.query_params.get("page", 1)
-        page_size = request.query_params.get("page_size", 10)
-        paginator = Paginator(queryset, page_size)
+        products, pagination = paginate_queryset(request, queryset, ordering=("id",))
+        serializer = ProductSerializer(products, many=True)
+        return Response({**pagination, "results": serializer.data})
 
-        try:
-            products = paginator.page(page)
-        except PageNotAnInteger:
-            products = paginator.page(1)
-        except EmptyPage:
-            products = paginator.page(paginator.num_pages)
 
-        serializer = ProductSerializer(products, many=True)
-        return Response(
-            {
-                "count": paginator.count,
-                "num_pages": paginator.num_pages,
-                "current_page": products.number,
-                "results": serializer.data,
-            }
-        )
+class ProductCacheStatsAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.user_type == UserType.ADMIN.value:
+            return Response(
+                {"detail": "You do not have permission to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        # Counters are per process, since each worker has its own local cache.
+        return Response(product_cache.stats())
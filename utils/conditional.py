@@ -0,0 +1,31 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Weak ETag over ``parts``, e.g. the request path and a max(updated_at)."""
+    digest = hashlib.md5(
+        "|".join(str(part) for part in parts).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def conditional_get(request, etag, last_modified, build_response):
+    """
+    Answer a GET with 304 Not Modified when the client's ``If-None-Match`` or
+    ``If-Modified-Since`` still matches ``etag``/``last_modified``; otherwise
+    call ``build_response()``. The validators are set on either response, so
+    views only need the cheap queries that produce them before serializing.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = (
+        get_conditional_response(request, etag=etag, last_modified=timestamp)
+        or build_response()
+    )
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+    return response
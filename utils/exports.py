@@ -0,0 +1,82 @@
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+# Spreadsheets evaluate a cell starting with one of these as a formula.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def get_file_format(params):
+    """
+    The ``file_format`` query parameter (``csv`` or ``ndjson``, default csv).
+    ``format`` itself is taken by DRF's content negotiation.
+    """
+    file_format = params.get("file_format", "csv")
+    if file_format not in EXPORT_FORMATS:
+        raise ValidationError(
+            {"file_format": f"Choose from {', '.join(map(repr, EXPORT_FORMATS))}."}
+        )
+    return file_format
+
+
+def export_response(rows, columns, file_format, filename):
+    """
+    Stream ``rows`` (an iterable of tuples matching ``columns``) as a CSV or
+    NDJSON download. Rows are encoded one at a time as the client reads them,
+    so memory stays flat when ``rows`` comes from ``QuerySet.iterator()``.
+    """
+    encode = _csv_lines if file_format == "csv" else _ndjson_lines
+    response = StreamingHttpResponse(
+        encode(rows, columns), content_type=EXPORT_FORMATS[file_format]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+class _Echo:
+    """File-like object whose write() returns the line for csv.writer to yield."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _ndjson_lines(rows, columns):
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_plain)
+        yield line + "\n"
+
+
+def _csv_cell(value):
+    if isinstance(value, str):
+        # A leading quote makes spreadsheets show the text instead of running it.
+        return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=_plain)
+    return _plain(value)
+
+
+def _plain(value):
+    """JSON-compatible form of the non-JSON values export rows hold."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot export a value of type {type(value).__name__}.")
@@ -0,0 +1,39 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+
+def date_range_filter(params, field):
+    """
+    Turn the ``start_date`` and ``end_date`` (inclusive, YYYY-MM-DD) query
+    parameters into lookups on the datetime ``field``. Comparing against
+    datetime bounds rather than ``field__date`` keeps indexes usable and lets
+    PostgreSQL prune partitions.
+    """
+    lookups = {}
+    start_date = parse_date_param(params, "start_date")
+    if start_date:
+        lookups[f"{field}__gte"] = start_of_day(start_date)
+    end_date = parse_date_param(params, "end_date")
+    if end_date:
+        lookups[f"{field}__lt"] = start_of_day(end_date + timedelta(days=1))
+    return lookups
+
+
+def parse_date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Invalid date, expected YYYY-MM-DD."})
+    return parsed
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
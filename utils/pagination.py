@@ -0,0 +1,164 @@
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_PAGE_SIZE = 10
+MAX_CURSOR_PAGE_SIZE = 100
+
+
+def paginate_queryset(request, queryset, ordering):
+    """
+    Paginate ``queryset`` for a list view and return ``(objects, meta)``, where
+    ``meta`` holds the pagination keys of the response body.
+
+    By default the classic page-number style is used (``page``/``page_size``),
+    which costs a COUNT(*) plus an OFFSET scan. Passing ``cursor`` (empty for the
+    first page) or ``pagination=cursor`` switches to keyset pagination on
+    ``ordering``, which must end in a unique field (e.g. ``("-timestamp", "-id")``).
+    In that mode ``count`` is only computed when asked for with ``count=exact``
+    or ``count=estimate``.
+    """
+    queryset = queryset.order_by(*ordering)
+    params = request.query_params
+    if "cursor" in params or params.get("pagination") == "cursor":
+        return _cursor_paginate(params, queryset, ordering)
+    return _page_paginate(params, queryset)
+
+
+def _page_paginate(params, queryset):
+    page = params.get("page", 1)
+    page_size = params.get("page_size", DEFAULT_PAGE_SIZE)
+    paginator = Paginator(queryset, page_size)
+
+    try:
+        objects = paginator.page(page)
+    except PageNotAnInteger:
+        objects = paginator.page(1)
+    except EmptyPage:
+        objects = paginator.page(paginator.num_pages)
+
+    return objects, {
+        "count": paginator.count,
+        "num_pages": paginator.num_pages,
+        "current_page": objects.number,
+    }
+
+
+def _cursor_paginate(params, queryset, ordering):
+    try:
+        page_size = int(params.get("page_size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    page_size = min(max(page_size, 1), MAX_CURSOR_PAGE_SIZE)
+
+    fields = [_ordering_field(queryset, name) for name in ordering]
+    meta = {}
+    count = params.get("count")
+    if count == "exact":
+        meta["count"] = queryset.count()
+    elif count == "estimate":
+        meta["count"] = estimate_count(queryset)
+
+    position, reverse = _decode_cursor(params.get("cursor"), fields)
+    if reverse:
+        queryset = queryset.reverse()
+    if position is not None:
+        queryset = queryset.filter(_after(ordering, position, reverse))
+
+    objects = list(queryset[: page_size + 1])
+    has_more = len(objects) > page_size
+    objects = objects[:page_size]
+    if reverse:
+        objects.reverse()
+
+    next_cursor = previous_cursor = None
+    if objects:
+        first = [getattr(objects[0], attname) for attname, _ in fields]
+        last = [getattr(objects[-1], attname) for attname, _ in fields]
+        if reverse:
+            next_cursor = _encode_cursor(last, reverse=False)
+            previous_cursor = _encode_cursor(first, reverse=True) if has_more else None
+        else:
+            next_cursor = _encode_cursor(last, reverse=False) if has_more else None
+            if position is not None:
+                previous_cursor = _encode_cursor(first, reverse=True)
+
+    meta["next"] = next_cursor
+    meta["previous"] = previous_cursor
+    return objects, meta
+
+
+def estimate_count(queryset):
+    """
+    Row count estimated by the query planner on PostgreSQL, so no rows are
+    scanned. Other databases fall back to an exact COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _ordering_field(queryset, name):
+    """``(attribute, to_python)`` of an ordering entry, a model field or an annotation."""
+    name = name.lstrip("-")
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return name, annotation.output_field.to_python
+    field = queryset.model._meta.get_field(name)
+    return field.attname, field.to_python
+
+
+def _after(ordering, position, reverse):
+    """Keyset condition selecting the rows strictly after ``position``."""
+    conditions = []
+    for index, name in enumerate(ordering):
+        descending = name.startswith("-") != reverse
+        lookup = "lt" if descending else "gt"
+        equal = {ordering[i].lstrip("-"): position[i] for i in range(index)}
+        conditions.append(
+            Q(**equal, **{f"{name.lstrip('-')}__{lookup}": position[index]})
+        )
+    return reduce(or_, conditions)
+
+
+def _encode_cursor(position, reverse):
+    # isoformat() rather than DjangoJSONEncoder, which truncates datetimes to
+    # milliseconds and would make the cursor skip or repeat rows.
+    position = [
+        value.isoformat() if hasattr(value, "isoformat") else value
+        for value in position
+    ]
+    payload = json.dumps({"p": position, "r": reverse}, cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor, fields):
+    if not cursor:
+        return None, False
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        position = [
+            to_python(value) for (_, to_python), value in zip(fields, payload["p"])
+        ]
+        if len(position) != len(fields):
+            raise ValueError
+        return position, bool(payload.get("r"))
+    except (binascii.Error, ValueError, KeyError, TypeError, DjangoValidationError):
+        raise ValidationError({"cursor": "Invalid cursor."})
@@ -0,0 +1,123 @@
+"""
+Per-request query accounting.
+
+``QueryRecorder`` counts the queries run on the current thread's database
+connections, their total time, and how often each query shape repeats. A
+shape is the SQL with its literals and parameter lists folded. A shape that
+repeats once per row of a list is the usual sign of an N+1.
+``QueryBudgetMiddleware`` reports these figures for every request in debug.
+``utils.testing.QueryBudgetMixin`` asserts them per endpoint.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_TRANSACTION_RE = re.compile(
+    r"\s*(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK|BEGIN|COMMIT)\b", re.IGNORECASE
+)
+
+
+def query_shape(sql):
+    """``sql`` with literals and IN lists folded, e.g. ``id IN (...)``."""
+    shape = _LIST_RE.sub("(...)", _LITERAL_RE.sub("?", sql))
+    return " ".join(shape.split())
+
+
+class QueryRecorder:
+    """
+    Context manager recording ``(sql, seconds)`` for every query run inside it
+    on any database connection of the current thread.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def duplicates(self, threshold=None):
+        """
+        Shapes run at least ``threshold`` times (``DUPLICATE_THRESHOLD`` by
+        default), most repeated first. Transaction statements are ignored.
+        """
+        threshold = threshold or settings.QUERY_BUDGET["DUPLICATE_THRESHOLD"]
+        shapes = Counter(
+            query_shape(sql)
+            for sql, _ in self.queries
+            if not _TRANSACTION_RE.match(sql)
+        )
+        return {
+            shape: times for shape, times in shapes.most_common() if times >= threshold
+        }
+
+
+class QueryBudgetMiddleware:
+    """
+    Adds ``X-Query-Count``, ``X-Query-Time-Ms`` and ``X-Query-Duplicates`` to
+    every response and logs them, with a warning per repeated query shape.
+    Queries run while a streaming response is consumed are not included.
+    Installed when ``QUERY_BUDGET["ENABLED"]`` is true, or is None and DEBUG on.
+    """
+
+    def __init__(self, get_response):
+        enabled = settings.QUERY_BUDGET["ENABLED"]
+        if not (settings.DEBUG if enabled is None else enabled):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        duplicates = recorder.duplicates()
+        milliseconds = round(recorder.duration * 1000, 1)
+        response["X-Query-Count"] = recorder.count
+        response["X-Query-Time-Ms"] = milliseconds
+        response["X-Query-Duplicates"] = len(duplicates)
+
+        log = logger.warning if duplicates else logger.debug
+        log(
+            f"{request.method} {request.path}: {recorder.count} queries "
+            f"in {milliseconds} ms, {len(duplicates)} repeated",
+            extra={
+                "query_count": recorder.count,
+                "query_time_ms": milliseconds,
+                "duplicate_queries": len(duplicates),
+            },
+        )
+        for shape, times in duplicates.items():
+            logger.warning(f"Query repeated {times} times: {shape}")
+        return response
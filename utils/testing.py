@@ -0,0 +1,61 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from utils.query_budget import QueryRecorder
+
+
+def explain(sql):
+    """
+    Return the query plan of ``sql`` as text. Sequential scans are disabled on
+    PostgreSQL, otherwise the planner never picks an index for the handful of
+    rows a test creates.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}")
+        else:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return "\n".join(" ".join(map(str, row)) for row in cursor.fetchall())
+
+
+class QueryPlanAssertionsMixin:
+    def assertSelectUsesIndex(self, table, index_name, func, *args, **kwargs):
+        """Call ``func`` and assert one of its SELECTs on ``table`` uses the index."""
+        with CaptureQueriesContext(connection) as context:
+            func(*args, **kwargs)
+
+        plans = [
+            explain(query["sql"])
+            for query in context.captured_queries
+            if query["sql"].startswith("SELECT") and f'FROM "{table}"' in query["sql"]
+        ]
+        self.assertTrue(plans, f"No SELECT on {table} was executed.")
+        self.assertTrue(
+            any(index_name in plan for plan in plans),
+            f"No query on {table} used {index_name}:\n" + "\n\n".join(plans),
+        )
+
+
+class QueryBudgetMixin:
+    def assertQueryBudget(self, budget, func, *args, **kwargs):
+        """
+        Call ``func`` and assert it runs at most ``budget`` queries and repeats
+        no query shape ``DUPLICATE_THRESHOLD`` times. Returns its result.
+        """
+        with QueryRecorder() as recorder:
+            result = func(*args, **kwargs)
+
+        duplicates = recorder.duplicates()
+        self.assertFalse(
+            duplicates,
+            "Repeated queries:\n"
+            + "\n".join(f"{times}x {shape}" for shape, times in duplicates.items()),
+        )
+        self.assertLessEqual(
+            recorder.count,
+            budget,
+            f"{recorder.count} queries, budget {budget}:\n"
+            + "\n".join(sql for sql, _ in recorder.queries),
+        )
+        return result